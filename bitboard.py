@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Bitboard engine of the board.
+
+The position is stored as twelve 64-bit masks, one for every piece type and team, and all the attacks,
+danger zones and legal moves are calculated with bit operations. The BitBoard is selected with
+Board(bitboard=True) and keeps the interface of the Board, so it can be used as a drop in replacement.
+
+The legal moves are generated from the masks of the pieces, one kind after the other, so no square has to be
+looked up to find the kind of its piece. Unless the king can castle, its steps are tested square by square
+with the attackers of the square, which is cheaper than the whole danger zone of the other team.
+"""
+
+from typing import Dict, Tuple
+
+from pieces import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+from board import Board
+from bits import (WHITE, BLACK, TEAM_INDEX, FULL, POSITIONS, BIT, lsb, iter_bits, KNIGHT_ATTACKS, KING_ATTACKS,
+                  PAWN_ATTACKS, PAWN_PUSHES, ROOK_RAYS, BISHOP_RAYS, BETWEEN, LINE, CASTLINGS, pawn_attacks)
+from sliders import ROOK_TABLE, ROOK_MASK, BISHOP_TABLE, BISHOP_MASK
+from zobrist import PIECE_KEYS
+from evaluation import PST_SCORES, evaluate_squares
+
+
+class BitBoard(Board):
+    """Board which stores the position as twelve occupancy masks.
+
+    The index of a piece in the list of masks is 6*team + kind, see pieces.piece_index. Next to the masks the
+    squares of the Board with the code of the piece on each square are kept, such that the piece on a square
+    can be looked up without scanning all twelve masks.
+    """
+    def __init__(self, board=None, bitboard=True) -> None:
+        self.bbs = [0]*12
+        self.occupancy = [0, 0]
+        super().__init__(board)
+
+    def _rebuild(self):
+        self.bbs = [0]*12
+        self.occupancy = [0, 0]
+        for sq, code in enumerate(self.squares):
+            if code:
+                self.bbs[code - 1] |= BIT[sq]
+                self.occupancy[(code - 1) // 6] |= BIT[sq]
+        self.occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+        self._rehash()
+        self.score = evaluate_squares(self.squares)
+
+    def _copy_state(self, source: Board, share: bool):
+        super()._copy_state(source, share)
+        self.bbs = source.bbs if share else source.bbs.copy()
+        self.occupancy = source.occupancy if share else source.occupancy.copy()
+
+    def _put(self, sq: int, code: int):
+        idx = code - 1
+        self.bbs[idx] |= BIT[sq]
+        self.occupancy[idx // 6] |= BIT[sq]
+        self.occupied |= BIT[sq]
+        self.squares[sq] = code
+        self.zobrist ^= PIECE_KEYS[idx][sq]
+        self.score += PST_SCORES[code][sq]
+
+    def _take(self, sq: int) -> int:
+        code = self.squares[sq]
+        idx = code - 1
+        self.bbs[idx] ^= BIT[sq]
+        self.occupancy[idx // 6] ^= BIT[sq]
+        self.occupied ^= BIT[sq]
+        self.squares[sq] = 0
+        self.zobrist ^= PIECE_KEYS[idx][sq]
+        self.score -= PST_SCORES[code][sq]
+        return code
+
+    def _attackers(self, sq: int, team: int, occ: int) -> int:
+        """Returns the mask of the pieces of team which attack sq for the occupancy occ."""
+        bbs, o = self.bbs, 6*team
+        return ((PAWN_ATTACKS[1 - team][sq] & bbs[o + PAWN])
+                | (KNIGHT_ATTACKS[sq] & bbs[o + KNIGHT])
+                | (KING_ATTACKS[sq] & bbs[o + KING])
+                | (ROOK_TABLE[sq][occ & ROOK_MASK[sq]] & (bbs[o + ROOK] | bbs[o + QUEEN]))
+                | (BISHOP_TABLE[sq][occ & BISHOP_MASK[sq]] & (bbs[o + BISHOP] | bbs[o + QUEEN])))
+
+    def _attacks(self, team: int, occ: int) -> int:
+        """Returns the mask of all squares the team attacks for the occupancy occ."""
+        bbs, o = self.bbs, 6*team
+        attacks = pawn_attacks(bbs[o + PAWN], team)
+        for sq in iter_bits(bbs[o + KNIGHT]):
+            attacks |= KNIGHT_ATTACKS[sq]
+        for sq in iter_bits(bbs[o + BISHOP] | bbs[o + QUEEN]):
+            attacks |= BISHOP_TABLE[sq][occ & BISHOP_MASK[sq]]
+        for sq in iter_bits(bbs[o + ROOK] | bbs[o + QUEEN]):
+            attacks |= ROOK_TABLE[sq][occ & ROOK_MASK[sq]]
+        if bbs[o + KING]:
+            attacks |= KING_ATTACKS[lsb(bbs[o + KING])]
+        return attacks
+
+    def is_check(self, team, danger_zone=None):
+        """Returns True if the king of the given team is in check.
+        You can pass the danger zone of the other team if you have calculated it earlier.
+
+        Args:
+            team (pieces.Team): Team of the king which shall be checked
+            danger_zone (Set[Position], optional): A set of positions of the enemy team. Defaults to None.
+
+        Returns:
+            bool: Condition if king has been checked.
+        """
+        t = TEAM_INDEX[str(team)]
+        ksq = lsb(self.bbs[6*t + KING])
+        if danger_zone is not None:
+            return POSITIONS[ksq] in danger_zone
+        return self._attackers(ksq, 1 - t, self.occupancy[WHITE] | self.occupancy[BLACK]) != 0
+
+    def _danger(self, t: int) -> int:
+        # The king of the other team does not block the attacks, see Board._xray.
+        occ = self.occupied & ~self.bbs[6*(1 - t) + KING]
+        return self._attacks(t, occ)
+
+    def _checkers(self, t: int, ksq: int) -> int:
+        return self._attackers(ksq, 1 - t, self.occupied)
+
+    def _occupancy(self, t: int) -> int:
+        return self.occupancy[t]
+
+    def _king_can_move(self, t: int, ksq: int, own: int) -> bool:
+        # The king may not step back along the ray of a slider, therefore it is removed from the occupancy.
+        without_king = self.occupied ^ BIT[ksq]
+        for b in iter_bits(KING_ATTACKS[ksq] & ~own):
+            if not self._attackers(b, 1 - t, without_king):
+                return True
+        return False
+
+    def _king_masks(self, t: int, ksq: int, own: int) -> Tuple[int, int, Dict[int, int]]:
+        # The same pass as the one of the Board, the pieces are taken from their masks instead of the squares.
+        bbs, occ, o = self.bbs, self.occupied, 6*(1 - t)
+        queens = bbs[o + QUEEN]
+        checkers = (KNIGHT_ATTACKS[ksq] & bbs[o + KNIGHT]) | (PAWN_ATTACKS[t][ksq] & bbs[o + PAWN])
+        pins = dict()
+        snipers = (ROOK_RAYS[ksq] & (bbs[o + ROOK] | queens)) | (BISHOP_RAYS[ksq] & (bbs[o + BISHOP] | queens))
+        while snipers:
+            b = snipers & -snipers
+            snipers ^= b
+            s = b.bit_length() - 1
+            between = BETWEEN[ksq][s] & occ
+            if not between:
+                checkers |= b
+            elif not between & (between - 1) and between & own:
+                pins[between.bit_length() - 1] = LINE[ksq][s]
+        if not checkers:
+            target = FULL ^ own
+        elif checkers & (checkers - 1):
+            target = 0
+        else:
+            target = checkers | BETWEEN[ksq][lsb(checkers)]
+        return checkers, target, pins
+
+    def _legal_masks(self, t: int) -> Dict[int, int]:
+        bbs, occ, o = self.bbs, self.occupied, 6*t
+        own = self.occupancy[t]
+        enemy = occ ^ own
+        ksq = lsb(bbs[o + KING])
+        checkers, target, pins = self._king_masks(t, ksq, own)
+
+        if self._castling and not checkers and any(self._castling & right and not occ & empty
+                                                   for right, _, _, _, _, empty, _ in CASTLINGS[t]):
+            # The danger zone looks through the king, it holds the steps of the king and of the castlings.
+            danger = self._danger(1 - t)
+            king = KING_ATTACKS[ksq] & ~own & ~danger | self._castlings(t, occ, danger)
+        else:
+            # The king may not step back along the ray of a slider, therefore it is removed from the occupancy.
+            without_king, king = occ ^ BIT[ksq], 0
+            steps = KING_ATTACKS[ksq] & ~own
+            while steps:
+                b = steps & -steps
+                steps ^= b
+                if not self._attackers(b.bit_length() - 1, 1 - t, without_king):
+                    king |= b
+        moves = {ksq: king}
+
+        free = ~occ
+        pushes, attacks = PAWN_PUSHES[t], PAWN_ATTACKS[t]
+        start = 0xFF00 if t == WHITE else 0xFF000000000000
+        pawns = bbs[o + PAWN]
+        while pawns:
+            b = pawns & -pawns
+            pawns ^= b
+            sq = b.bit_length() - 1
+            ms = pushes[sq] & free
+            if ms and b & start:
+                ms |= pushes[ms.bit_length() - 1] & free
+            ms = (ms | attacks[sq] & enemy) & target
+            if ms and sq in pins:
+                ms &= pins[sq]
+            moves[sq] = ms
+        knights = bbs[o + KNIGHT]
+        while knights:
+            b = knights & -knights
+            knights ^= b
+            sq = b.bit_length() - 1
+            # A pinned knight can never stay on the line of its pin.
+            moves[sq] = 0 if sq in pins else KNIGHT_ATTACKS[sq] & target
+        queens = bbs[o + QUEEN]
+        for sliders, table, masks in ((bbs[o + BISHOP] | queens, BISHOP_TABLE, BISHOP_MASK),
+                                      (bbs[o + ROOK] | queens, ROOK_TABLE, ROOK_MASK)):
+            while sliders:
+                b = sliders & -sliders
+                sliders ^= b
+                sq = b.bit_length() - 1
+                ms = table[sq][occ & masks[sq]] & target
+                if ms and sq in pins:
+                    ms &= pins[sq]
+                # A queen is visited as a bishop and as a rook.
+                moves[sq] = moves.get(sq, 0) | ms if b & queens else ms
+        if target:
+            for sq in self._ep_pawns(t, own):
+                if self._en_passant(t, ksq, sq):
+                    moves[sq] |= BIT[self._ep]
+        return moves
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Square and bit helpers for the bitboard engine.
+
+A square is an integer between 0 and 63. The square of the position (col, row) is col + 8*row,
+that is, a1 is 0, h1 is 7 and h8 is 63. A set of squares is stored as a 64-bit integer mask where
+bit i is set if square i is part of the set.
+"""
+
+from typing import Iterator, List, Set, Tuple
+
+RAN8 = range(8)
+RAN64 = range(64)
+
+WHITE, BLACK = 0, 1
+TEAM_INDEX = {'w': WHITE, 'b': BLACK}
+
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_8 = RANK_1 << 56
+
+# Position (col, row) of every square and the bit of every square.
+POSITIONS: List[Tuple[int, int]] = [(sq & 7, sq >> 3) for sq in RAN64]
+BIT: List[int] = [1 << sq for sq in RAN64]
+
+
+def square(col: int, row: int) -> int:
+    """Returns the square index of the normal coordinate (col, row)."""
+    return col + 8*row
+
+
+def lsb(mask: int) -> int:
+    """Returns the lowest square of a non empty mask."""
+    return (mask & -mask).bit_length() - 1
+
+
+def msb(mask: int) -> int:
+    """Returns the highest square of a non empty mask."""
+    return mask.bit_length() - 1
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Iterates over the squares of the mask from the lowest to the highest square."""
+    while mask:
+        b = mask & -mask
+        yield b.bit_length() - 1
+        mask ^= b
+
+
+def to_positions(mask: int) -> Set[Tuple[int, int]]:
+    """Converts a mask to a set of normal coordinates."""
+    res = set()
+    while mask:
+        b = mask & -mask
+        res.add(POSITIONS[b.bit_length() - 1])
+        mask ^= b
+    return res
+
+
+def to_mask(positions) -> int:
+    """Converts an iterable of normal coordinates to a mask."""
+    mask = 0
+    for c, r in positions:
+        mask |= BIT[c + 8*r]
+    return mask
+
+
+def _leaper(steps) -> List[int]:
+    """Builds the attack masks of a piece which jumps by the given steps."""
+    table = []
+    for sq in RAN64:
+        c, r = POSITIONS[sq]
+        mask = 0
+        for dc, dr in steps:
+            if c + dc in RAN8 and r + dr in RAN8:
+                mask |= BIT[square(c + dc, r + dr)]
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper([(2, 1), (2, -1), (1, 2), (1, -2), (-2, 1), (-2, -1), (-1, 2), (-1, -2)])
+KING_ATTACKS = _leaper([(v, h) for v in (-1, 0, 1) for h in (-1, 0, 1) if v != 0 or h != 0])
+# PAWN_ATTACKS[team][sq] are the squares a pawn of the team on sq attacks.
+PAWN_ATTACKS = [_leaper([(1, 1), (-1, 1)]), _leaper([(1, -1), (-1, -1)])]
+# PAWN_PUSHES[team][sq] is the square in front of a pawn of the team on sq.
+PAWN_PUSHES = [_leaper([(0, 1)]), _leaper([(0, -1)])]
+
+
+def pawn_attacks(pawns: int, team: int) -> int:
+    """Returns the squares attacked by all the pawns of the mask at once."""
+    if team == WHITE:
+        return (((pawns & ~FILE_A) << 7) | ((pawns & ~FILE_H) << 9)) & FULL
+    return ((pawns & ~FILE_A) >> 9) | ((pawns & ~FILE_H) >> 7)
+
+
+# The eight sliding directions. The first four increase the square index, the last four decrease it.
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (-1, 1), (0, -1), (-1, 0), (-1, -1), (1, -1)]
+ROOK_DIRECTIONS = [0, 1, 4, 5]
+BISHOP_DIRECTIONS = [2, 3, 6, 7]
+
+
+def _ray(sq, dc, dr) -> int:
+    c, r = POSITIONS[sq]
+    mask = 0
+    c, r = c + dc, r + dr
+    while c in RAN8 and r in RAN8:
+        mask |= BIT[square(c, r)]
+        c, r = c + dc, r + dr
+    return mask
+
+
+# RAYS[d][sq] are the squares from sq (exclusive) to the edge of the board in direction d.
+RAYS = [[_ray(sq, dc, dr) for sq in RAN64] for dc, dr in DIRECTIONS]
+
+ROOK_RAYS = [RAYS[0][sq] | RAYS[1][sq] | RAYS[4][sq] | RAYS[5][sq] for sq in RAN64]
+BISHOP_RAYS = [RAYS[2][sq] | RAYS[3][sq] | RAYS[6][sq] | RAYS[7][sq] for sq in RAN64]
+
+
+def _between(a, b) -> int:
+    for d in range(8):
+        if RAYS[d][a] & BIT[b]:
+            return RAYS[d][a] & ~RAYS[d][b] & ~BIT[b]
+    return 0
+
+
+# BETWEEN[a][b] are the squares strictly between a and b if they share a line, otherwise 0.
+BETWEEN = [[_between(a, b) for b in RAN64] for a in RAN64]
+
+
+def _line(a, b) -> int:
+    for d in range(8):
+        if RAYS[d][a] & BIT[b]:
+            return RAYS[d][a] | RAYS[(d + 4) % 8][a] | BIT[a]
+    return 0
+
+
+# LINE[a][b] is the whole line through a and b from edge to edge if they share one, otherwise 0. A pinned piece
+# may only move along the line through its king and itself.
+LINE = [[_line(a, b) for b in RAN64] for a in RAN64]
+
+# The castling rights, one bit for each team and side.
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+# The castlings of each team: (right, king from, king to, rook from, rook to, mask of the squares which
+# have to be empty, mask of the squares the king passes which may not be attacked).
+CASTLINGS = [
+    [(WHITE_KINGSIDE, 4, 6, 7, 5, 0x60, 0x70), (WHITE_QUEENSIDE, 4, 2, 0, 3, 0x0E, 0x1C)],
+    [(BLACK_KINGSIDE, 60, 62, 63, 61, 0x60 << 56, 0x70 << 56), (BLACK_QUEENSIDE, 60, 58, 56, 59, 0x0E << 56, 0x1C << 56)],
+]
+# The rights are and-ed with CASTLING_MASK of both squares of every move, a move of the king or a rook (or
+# the capture of a rook) loses the corresponding rights.
+CASTLING_MASK = [15]*64
+for _team in CASTLINGS:
+    for _right, _king, _, _rook, *_ in _team:
+        CASTLING_MASK[_king] &= ~_right
+        CASTLING_MASK[_rook] &= ~_right
+
+
+def _ray_attacks(sq, occ, dirs) -> int:
+    attacks = 0
+    for d in dirs:
+        ray = RAYS[d][sq]
+        blockers = ray & occ
+        if blockers:
+            # The first blocker is the nearest square, which depends on the direction of the ray.
+            b = (blockers & -blockers).bit_length() - 1 if d < 4 else blockers.bit_length() - 1
+            ray ^= RAYS[d][b]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq: int, occ: int) -> int:
+    """Returns the squares a rook on sq attacks for the occupancy occ, blockers included."""
+    return _ray_attacks(sq, occ, ROOK_DIRECTIONS)
+
+
+def bishop_attacks(sq: int, occ: int) -> int:
+    """Returns the squares a bishop on sq attacks for the occupancy occ, blockers included."""
+    return _ray_attacks(sq, occ, BISHOP_DIRECTIONS)
+
+
+def queen_attacks(sq: int, occ: int) -> int:
+    """Returns the squares a queen on sq attacks for the occupancy occ, blockers included."""
+    return _ray_attacks(sq, occ, ROOK_DIRECTIONS) | _ray_attacks(sq, occ, BISHOP_DIRECTIONS)
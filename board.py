@@ -5,157 +5,682 @@ Created on Thu Nov 24 20:10:32 2022
 @author: anton
 """
 
-from typing import List, Tuple, Union
-import json
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple, Union
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 import pieces
-from pieces import Team, Queen, Pawn, King, Bishop, Rook, Knight
-from misc import chess_to_coord, get_json_file, coord_to_chess, to_both_coord, to_coord, ls2chess
+from pieces import (Team, Queen, Pawn, King, Bishop, Rook, Knight, FLYWEIGHTS, PROMOTIONS, PAWN, KNIGHT, BISHOP, ROOK,
+                    QUEEN, KING)
+from misc import chess_to_coord, coord_to_chess, to_both_coord, to_coord, ls2chess
+from bits import (WHITE, BLACK, TEAM_INDEX, FULL, POSITIONS, BIT, square, lsb, iter_bits, to_positions,
+                  KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, PAWN_PUSHES, ROOK_RAYS, BISHOP_RAYS, BETWEEN, LINE,
+                  CASTLINGS, CASTLING_MASK)
+from sliders import ROOK_TABLE, ROOK_MASK, BISHOP_TABLE, BISHOP_MASK
+from zobrist import PIECE_KEYS, EP_KEYS, SIDE_KEY, CASTLING_KEYS, hash_position
+from fen import parse_fen, format_fen
+from evaluation import PST_SCORES, evaluate_squares
+from movecache import thaw
+from movecodes import CAPTURE, DOUBLE_PUSH, EN_PASSANT, KING_CASTLE, QUEEN_CASTLE, PROMOTION, PROMOTION_FLAGS
 
 RAN8 = range(8)
+TEAMS = ('w', 'b')
+# The states of the game for a team, see Board.status.
+ONGOING, CHECK, CHECKMATE, STALEMATE = 'ongoing', 'check', 'checkmate', 'stalemate'
+# Translation of the piece codes to the binary digit of a square in the occupancy of each team.
+_CAPTURE = CAPTURE << 12  # The capture flag in its place in an encoded move, see movecodes.
+_TEAM_DIGITS = [b''.join(b'1' if 6*t < code <= 6*t + 6 else b'0' for code in range(256)) for t in (WHITE, BLACK)]
+
+
+class Snapshot(NamedTuple):
+    """An immutable copy of the position, in the order taken by Board.set_position. It is hashable and
+    pickled as a few bytes, e.g. to keep positions or send them to other processes, see Board.snapshot."""
+    squares: bytes  # The piece codes of the 64 squares, see pieces.FLYWEIGHTS.
+    turn: int
+    ep: int
+    castling: int
+
+
+def _targets(kind: int, t: int, sq: int, occ: int, enemy: int) -> int:
+    """Returns the mask of the squares the piece of the kind and team t on sq can move to if its king is safe.
+    The squares of its own team are not removed, en passant and castling are not included."""
+    if kind == PAWN:
+        ms = PAWN_PUSHES[t][sq] & ~occ
+        if ms and (sq >> 3) == (1 if t == WHITE else 6):
+            ms |= PAWN_PUSHES[t][lsb(ms)] & ~occ
+        return ms | PAWN_ATTACKS[t][sq] & enemy
+    if kind == KNIGHT:
+        return KNIGHT_ATTACKS[sq]
+    if kind == BISHOP:
+        return BISHOP_TABLE[sq][occ & BISHOP_MASK[sq]]
+    if kind == ROOK:
+        return ROOK_TABLE[sq][occ & ROOK_MASK[sq]]
+    if kind == QUEEN:
+        return ROOK_TABLE[sq][occ & ROOK_MASK[sq]] | BISHOP_TABLE[sq][occ & BISHOP_MASK[sq]]
+    return KING_ATTACKS[sq]
 
 
 class Board:
     """Defines the board of the chess game.
 
+    The position is stored as a bytearray with the code of the piece on each of the 64 squares (see
+    pieces.FLYWEIGHTS), the square of a position (col, row) is col + 8*row. The pieces themselves are shared
+    immutable flyweights, hence a board only takes a few hundred bytes.
+
+    The board also keeps the number of pieces of each team attacking each square. Every change of a square
+    updates the counts of the piece on it and of the sliders whose rays pass through the square, so the
+    danger zone and checks are read from the counts instead of being calculated from all pieces. In the
+    same way the score of the material and the piece-square tables is kept (see evaluate).
+
+    With Board(bitboard=True) the bitboard engine (bitboard.BitBoard) is created instead, which has the
+    same interface but stores the position in occupancy masks and is a lot faster in calculating moves.
     """
-    def __init__(self, board=None) -> None:
+    __slots__ = ('squares', 'occupied', 'attack_counts', '_ep', '_castling', '_turn', '_stack', 'zobrist', 'score', 'move_cache',
+                 '_shared')
+
+    def __new__(cls, board=None, bitboard=False):
+        if bitboard and cls is Board:
+            from bitboard import BitBoard
+            cls = BitBoard
+        return super().__new__(cls)
+
+    def __init__(self, board=None, bitboard=False) -> None:
         # TODO Change the argument board to pieces.
-        self.board = np.zeros((8, 8), dtype=pieces.Piece)
+        self.squares = bytearray(64)  # The code of the piece on every square, 0 if it is empty.
+        self.occupied = 0  # The mask of the occupied squares.
+        # attack_counts[64*team + sq] is the number of pieces of the team attacking sq.
+        self.attack_counts = bytearray(128)
+        self._ep = -1  # The square a pawn skipped in the last move, -1 if the last move was no double step.
+        self._castling = 0  # The castling rights, see bits.CASTLINGS.
+        self._turn = WHITE  # The team which is to move, changes with every move.
+        self._stack = []  # Undo records of the moves made with push, see pop.
+        self.zobrist = 0  # Zobrist hash of the position, see key.
+        self.score = 0  # The score of the pieces from the view of white, see evaluate.
+        self.move_cache = None  # The opt-in cache of legal_moves, see movecache.MoveCache.
+        self._shared = False  # Whether the squares, counts and undo records are shared with a clone.
         if board is not None:
-            self.board[:] = board
-        self._pieces = dict()
+            board = np.asarray(board, dtype=object)
+            for c, r in POSITIONS:
+                if board[c, r] != 0:
+                    self._put(square(c, r), board[c, r].code)
+
+    @classmethod
+    def from_fen(cls, fen: str, bitboard: bool = False) -> 'Board':
+        """Creates a board with the position of the FEN string, see set_fen."""
+        board = cls(bitboard=bitboard)
+        board.set_fen(fen)
+        return board
+
+    def set_fen(self, fen: str):
+        """Replaces the position by the placement, the team to move, the castling rights and the en passant field
+        of the FEN string. Reusing a board this way is a lot faster than placing the pieces one by one.
+        """
+        self.set_position(*parse_fen(fen))
+
+    def to_fen(self) -> str:
+        """Returns the FEN string of the position."""
+        return format_fen(self.squares, self._turn, self._ep, self._castling)
+
+    def clone(self, copy_on_write: bool = False) -> 'Board':
+        """Returns a copy of the board, with the moves made with push, such that they can be taken back with pop.
+
+        Only the compact state of the position is copied: the squares (64 bytes), the attack counts (128
+        bytes) and the list of undo records (the records themselves are immutable tuples), and the masks of
+        the bitboard engine. The pieces and tables are immutable and shared, and so is the move_cache.
+
+        Args:
+            copy_on_write (bool, optional): Whether even the state is shared until the board or the clone
+                changes, then the one which changes copies the state first. This makes a clone almost free,
+                e.g. for looking at many positions without making a move. Defaults to False.
+
+        Returns:
+            Board: The copy, of the same engine as the board.
+        """
+        other = object.__new__(type(self))
+        other._copy_state(self, copy_on_write)
+        if copy_on_write:
+            self._shared = other._shared = True
+        return other
+
+    __copy__ = clone
+
+    def _copy_state(self, source: 'Board', share: bool):
+        """Takes the position of the source board, the mutable state is only referenced if share is True."""
+        self.squares = source.squares if share else bytearray(source.squares)
+        self.attack_counts = source.attack_counts if share else bytearray(source.attack_counts)
+        self._stack = source._stack if share else source._stack.copy()
+        self.occupied, self.zobrist, self.score = source.occupied, source.zobrist, source.score
+        self._ep, self._castling, self._turn = source._ep, source._castling, source._turn
+        self.move_cache = source.move_cache
+        self._shared = share
+
+    def _unshare(self):
+        """Copies the state shared with a clone (see clone), before the board changes."""
+        self._copy_state(self, False)
+
+    def snapshot(self) -> Snapshot:
+        """Returns the position as an immutable Snapshot, which Board.set_position takes to restore it:
+        board.set_position(*snapshot). Unlike clone, the moves made with push are not kept."""
+        return Snapshot(bytes(self.squares), self._turn, self._ep, self._castling)
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot, bitboard: bool = False) -> 'Board':
+        """Creates a board with the position of the snapshot, see snapshot."""
+        board = cls(bitboard=bitboard)
+        board.set_position(*snapshot)
+        return board
+
+    def set_position(self, squares: bytes, turn: int = WHITE, ep: int = -1, castling: int = 0):
+        """Replaces the position without checking it, e.g. by one parsed with fen.parse_fen. The moves made
+        with push are forgotten.
+
+        Args:
+            squares (bytes): The piece codes of the 64 squares, see pieces.FLYWEIGHTS.
+            turn (int, optional): The team to move, 0 for white and 1 for black. Defaults to WHITE.
+            ep (int, optional): The en passant square, -1 if there is none. Defaults to -1.
+            castling (int, optional): The castling rights, see bits.CASTLINGS. Defaults to 0.
+        """
+        if self._shared:
+            self._unshare()
+        self.squares[:] = bytes(squares)
+        self._turn, self._ep, self._castling = int(turn), int(ep), int(castling)
+        self._stack.clear()
+        self._rebuild()
+
+    def _rebuild(self):
+        """Calculates everything derived from the squares (hash, occupancy and attack counts) from scratch."""
+        occ = 0
+        for sq, code in enumerate(self.squares):
+            if code:
+                occ |= BIT[sq]
+        self.occupied = occ
+        self.attack_counts[:] = bytes(128)
+        for sq, code in enumerate(self.squares):
+            if code:
+                self._count(code, sq, 1)
+        self._rehash()
+        self.score = evaluate_squares(self.squares)
+
+    def _rehash(self):
+        key = (SIDE_KEY if self._turn else 0) ^ CASTLING_KEYS[self._castling]
+        if self._ep >= 0:
+            key ^= EP_KEYS[self._ep]
+        for sq, code in enumerate(self.squares):
+            if code:
+                key ^= PIECE_KEYS[code - 1][sq]
+        self.zobrist = key
+
+    def _put(self, sq: int, code: int):
+        occ = self.occupied
+        self._shadow(sq, occ, occ | BIT[sq], -1)
+        self.occupied = occ | BIT[sq]
+        self.squares[sq] = code
+        self._count(code, sq, 1)
+        self.zobrist ^= PIECE_KEYS[code - 1][sq]
+        self.score += PST_SCORES[code][sq]
+
+    def _take(self, sq: int) -> int:
+        code = self.squares[sq]
+        self._count(code, sq, -1)
+        self.squares[sq] = 0
+        occ = self.occupied
+        self.occupied = occ ^ BIT[sq]
+        self._shadow(sq, occ, occ ^ BIT[sq], 1)
+        self.zobrist ^= PIECE_KEYS[code - 1][sq]
+        self.score -= PST_SCORES[code][sq]
+        return code
+
+    def _count(self, code: int, sq: int, sign: int):
+        """Adds (sign=1) or removes (sign=-1) the attacks of the piece with the code on sq to the attack counts."""
+        idx = code - 1
+        kind, occ = idx % 6, self.occupied
+        if kind == PAWN:
+            attacks = PAWN_ATTACKS[idx // 6][sq]
+        elif kind == KNIGHT:
+            attacks = KNIGHT_ATTACKS[sq]
+        elif kind == BISHOP:
+            attacks = BISHOP_TABLE[sq][occ & BISHOP_MASK[sq]]
+        elif kind == ROOK:
+            attacks = ROOK_TABLE[sq][occ & ROOK_MASK[sq]]
+        elif kind == QUEEN:
+            attacks = ROOK_TABLE[sq][occ & ROOK_MASK[sq]] | BISHOP_TABLE[sq][occ & BISHOP_MASK[sq]]
+        else:
+            attacks = KING_ATTACKS[sq]
+        counts, o = self.attack_counts, 64*(idx // 6) - 1
+        while attacks:
+            b = attacks & -attacks
+            counts[o + b.bit_length()] += sign
+            attacks ^= b
+
+    def _shadow(self, sq: int, old: int, new: int, sign: int):
+        """Updates the attack counts of the sliders which see sq, if the occupancy changes from old to new
+        on sq. Filling sq (sign=-1) shortens their rays, emptying it (sign=1) lengthens them."""
+        squares, counts = self.squares, self.attack_counts
+        for b in iter_bits(ROOK_TABLE[sq][old & ROOK_MASK[sq]] & old):
+            idx = squares[b] - 1
+            if idx % 6 == ROOK or idx % 6 == QUEEN:
+                o = 64*(idx // 6) - 1
+                diff = ROOK_TABLE[b][old & ROOK_MASK[b]] ^ ROOK_TABLE[b][new & ROOK_MASK[b]]
+                while diff:
+                    d = diff & -diff
+                    counts[o + d.bit_length()] += sign
+                    diff ^= d
+        for b in iter_bits(BISHOP_TABLE[sq][old & BISHOP_MASK[sq]] & old):
+            idx = squares[b] - 1
+            if idx % 6 == BISHOP or idx % 6 == QUEEN:
+                o = 64*(idx // 6) - 1
+                diff = BISHOP_TABLE[b][old & BISHOP_MASK[b]] ^ BISHOP_TABLE[b][new & BISHOP_MASK[b]]
+                while diff:
+                    d = diff & -diff
+                    counts[o + d.bit_length()] += sign
+                    diff ^= d
+
+    def _xray(self, t: int) -> int:
+        """Returns the mask of the squares the sliders of team t attack through the king of the other team.
+        The danger zone looks through the king, as the king cannot step back along the ray of a slider."""
+        squares, occ = self.squares, self.occupied
+        ksq = squares.find(6*(1 - t) + KING + 1)
+        if ksq < 0:
+            return 0
+        after = occ ^ BIT[ksq]
+        o = 6*t + 1
+        xray = 0
+        for b in iter_bits(ROOK_TABLE[ksq][occ & ROOK_MASK[ksq]] & occ):
+            if squares[b] == o + ROOK or squares[b] == o + QUEEN:
+                xray |= ROOK_TABLE[b][after & ROOK_MASK[b]]
+        for b in iter_bits(BISHOP_TABLE[ksq][occ & BISHOP_MASK[ksq]] & occ):
+            if squares[b] == o + BISHOP or squares[b] == o + QUEEN:
+                xray |= BISHOP_TABLE[b][after & BISHOP_MASK[b]]
+        return xray
+
+    def _danger(self, t: int) -> int:
+        """Returns the mask of the squares team t attacks, see get_danger_zone."""
+        counts, o = self.attack_counts, 64*t
+        danger = self._xray(t)
+        for sq in range(64):
+            if counts[o + sq]:
+                danger |= BIT[sq]
+        return danger
 
-        self.kings = {pieces.Team('w'): None, pieces.Team('b'): None}
-        self.en_passant = None, None # Saves the last pawn move. If the pawn moves two fields it stores only the next field. 
+    def _piece(self, sq: int) -> pieces.Piece:
+        """Returns the piece on sq, 0 if the square is empty."""
+        return FLYWEIGHTS[self.squares[sq]][sq]
 
     def __getitem__(self, pos) -> pieces.Piece:
         col, row = chess_to_coord(*pos)
-        return self.board[col, row]
+        return self._piece(square(col, row))
 
     def __setitem__(self, pos, val) -> pieces.Piece:
         """Saves the value (piece) with the given position."""
         col, row = chess_to_coord(*pos)
-        if self.board[col, row] != 0 or self._pieces.get((col, row)):
+        sq = square(col, row)
+        if self.squares[sq]:
             raise ValueError(
-                f"On {pos=} is already '{repr(self.board[col, row])}'. If you want to replace a piece use the move method instead.")
-        self.board[col, row] = val
-        self._pieces[col, row] = val
+                f"On {pos=} is already '{repr(self._piece(sq))}'. If you want to replace a piece use the move method instead.")
+        if self._shared:
+            self._unshare()
+        self._put(sq, val.code)
 
     def __repr__(self) -> str:
-        return f"Board({repr(self.board)})"
+        return f"{type(self).__name__}({repr(self.board)})"
 
     def __str__(self) -> str:
         # TODO. This is not hübsch.
-        board = np.zeros_like(self.board, dtype=object)
+        board = np.zeros((8, 8), dtype=object)
         for i in RAN8:
             for j in RAN8:
-                if self.board[i, j] != 0:
-                    board[i, j] = str(self.board[i, j])
-                else:
-                    board[i, j] = ""
+                piece = self._piece(square(i, j))
+                board[i, j] = str(piece) if piece != 0 else ""
         return str(board)
 
-    def get_pieces(self) -> List[pieces.Piece]:
-        """Returns an iterable of the present pieces on the table."""
+    @property
+    def board(self) -> np.ndarray:
+        """The 8x8 array of the pieces (0 on the empty fields), indexed by the normal coordinates."""
+        board = np.zeros((8, 8), dtype=pieces.Piece)
+        for sq, code in enumerate(self.squares):
+            if code:
+                board[POSITIONS[sq]] = FLYWEIGHTS[code][sq]
+        return board
+
+    @property
+    def _pieces(self) -> Dict[Tuple[int, int], pieces.Piece]:
+        return {POSITIONS[sq]: FLYWEIGHTS[code][sq] for sq, code in enumerate(self.squares) if code}
+
+    def get_pieces(self) -> Dict[Tuple[int, int], pieces.Piece]:
+        """Returns a dictionary mapping the positions to the present pieces on the table."""
         return self._pieces
 
     def get_board(self) -> str:
         return self.board
 
+    @property
+    def kings(self) -> Dict[Team, King]:
+        kings = dict()
+        for t in (WHITE, BLACK):
+            ksq = self.squares.find(6*t + KING + 1)
+            kings[Team(TEAMS[t])] = FLYWEIGHTS[6*t + KING + 1][ksq] if ksq >= 0 else None
+        return kings
+
+    @property
+    def en_passant(self):
+        """The field a pawn skipped in the last move together with the pawn, (None, None) if the last move was
+        not a double step of a pawn."""
+        if self._ep < 0:
+            return None, None
+        return POSITIONS[self._ep], self._piece(self._ep ^ 8)
+
+    @en_passant.setter
+    def en_passant(self, value):
+        pos = value[0]
+        self._set_ep(-1 if pos is None else square(*pos))
+
+    def _set_ep(self, ep: int):
+        if self._ep >= 0:
+            self.zobrist ^= EP_KEYS[self._ep]
+        if ep >= 0:
+            self.zobrist ^= EP_KEYS[ep]
+        self._ep = ep
+
+    @property
+    def turn(self) -> Team:
+        """The team which is to move."""
+        return Team(TEAMS[self._turn])
+
+    @turn.setter
+    def turn(self, team):
+        t = TEAM_INDEX[str(team)]
+        if t != self._turn:
+            self.zobrist ^= SIDE_KEY
+        self._turn = t
+
+    @property
+    def castling(self) -> int:
+        """The castling rights, see bits.CASTLINGS. A right only says that the king and the rook have not moved,
+        the legal moves check if the castling is possible."""
+        return self._castling
+
+    @castling.setter
+    def castling(self, rights: int):
+        self._set_castling(rights)
+
+    def _set_castling(self, rights: int):
+        self.zobrist ^= CASTLING_KEYS[self._castling] ^ CASTLING_KEYS[rights]
+        self._castling = rights
+
+    def key(self, recompute=False) -> int:
+        """Returns the 64-bit Zobrist hash of the position, that is of the pieces, the team to move, the
+        castling rights and the en passant field. The hash is updated with every change of the board, so this is free.
+
+        Args:
+            recompute (bool, optional): Calculates the hash from scratch instead, e.g. to verify the
+                incremental updates. Defaults to False.
+
+        Returns:
+            int: The hash of the position.
+        """
+        if recompute:
+            return hash_position(self.get_pieces(), self.turn, self.en_passant[0], self._castling)
+        return self.zobrist
+
+    def evaluate(self, recompute=False) -> int:
+        """Returns the score of the material and the piece-square tables (see evaluation.PST) in centipawns
+        from the view of the team which is to move. The score is updated with every change of the board, so
+        this is free.
+
+        Args:
+            recompute (bool, optional): Calculates the score from scratch instead, e.g. to verify the
+                incremental updates. Defaults to False.
+
+        Returns:
+            int: The score of the position.
+        """
+        score = evaluate_squares(self.squares) if recompute else self.score
+        return -score if self._turn else score
+
     def remove(self, pos):
-        self._pieces.pop(pos)
-        self.board[pos] = 0
+        if self._shared:
+            self._unshare()
+        self._take(square(*pos))
 
     def destroy(self, piece):
         self.remove(piece.position)
-        piece.destroy()
-    
-    def move(self, piece: pieces.Piece, new_position: pieces.Position):
+
+    def move(self, piece: pieces.Piece, new_position: pieces.Position, promotion: type = None):
         """Moves the piece to the new position. It is not checked whether the new_position is a legal move.
-        If on the new position is another piece it is removed from the list of pieces.
+        If on the new position is another piece it is captured. If the king moves two fields it castles, that is
+        the rook is moved as well, and a pawn which reaches the last row is promoted.
 
         The position should be given in chess coordinates. That is, e.g. ('h', 8) instead of (7,7).
+        The pieces are immutable, afterwards the moved piece is board[new_position].
+
+        Args:
+            promotion (type, optional): The class of the piece a pawn is promoted to. Defaults to Queen.
         """
         npos = to_coord(*new_position)
-        
-        if isinstance(piece, Pawn):
-            if npos == self.en_passant[0]:
-                self.destroy(self.en_passant[1])
-            
-            # Save the possible en_passant move and the piece which made it.
-            ms = piece.move_set[piece.position]
-            self.en_passant = next(iter(ms), None) 
-            self.en_passant = self.en_passant, piece
-        else: 
-            self.en_passant = None, None
-            if self._pieces.get(npos) is not None:
-                self.destroy(self._pieces[npos])
-        self.remove(piece.position)
-        piece.set_position(npos)
-        self[new_position] = piece
+        if self._shared:
+            self._unshare()
+        self._make(square(*piece.position), square(*npos), QUEEN if promotion is None else promotion.kind)
+
+    def _make(self, frm: int, to: int, promotion: int = QUEEN) -> int:
+        """Moves the piece on frm to the square to, captures, castling and promotions included.
+
+        Returns:
+            int: The square of the captured piece, -1 if nothing has been captured.
+        """
+        squares = self.squares
+        code = squares[frm]
+        kind = (code - 1) % 6
+        csq = -1
+        if kind == PAWN and to == self._ep:
+            # The captured pawn is next to the moving pawn, on the row it moved from.
+            csq = to ^ 8
+        elif squares[to]:
+            csq = to
+        if csq >= 0:
+            self._take(csq)
+        self._take(frm)
+        if kind == PAWN and (to < 8 or to >= 56):
+            code += promotion - PAWN
+        self._put(to, code)
+        if kind == KING and abs(to - frm) == 2:
+            # Castling, the rook jumps over the king.
+            if to > frm:
+                self._put(frm + 1, self._take(frm + 3))
+            else:
+                self._put(frm - 1, self._take(frm - 4))
+        if self._castling:
+            self._set_castling(self._castling & CASTLING_MASK[frm] & CASTLING_MASK[to])
+        # Save the field the pawn skipped, it can be captured en passant on this field.
+        self._set_ep((frm + to) // 2 if kind == PAWN and abs(to - frm) == 16 else -1)
+        self._turn ^= 1
+        self.zobrist ^= SIDE_KEY
+        return csq
+
+    def push(self, move: Union[int, Tuple[pieces.Position, ...]]):
+        """Makes the move and saves everything needed to take it back with pop.
+
+        Args:
+            move (Union[int, Tuple[Position, Position]]): The move encoded as integer (see movecodes and
+                generate), or the position of the moving piece and its new position. Both chess and normal
+                coordinates are accepted. A third element is the class of the piece a pawn is promoted to,
+                Queen if it is missing (see iter_moves).
+        """
+        if isinstance(move, tuple):
+            frm, to = square(*to_coord(*move[0])), square(*to_coord(*move[1]))
+            promotion = QUEEN if len(move) < 3 or move[2] is None else move[2].kind
+        else:
+            move = int(move)
+            frm, to = move & 63, move >> 6 & 63
+            promotion = (move >> 12 & 3) + KNIGHT if move >> 12 & PROMOTION else QUEEN
+        if self._shared:
+            self._unshare()
+        record = self.squares[frm], self._ep, self._castling, self.zobrist
+        captured = self.squares[to]
+        csq = self._make(frm, to, promotion)
+        if csq >= 0 and not captured:
+            captured = 6*self._turn + PAWN + 1  # en passant, the pawn of the team which is to move now
+        self._stack.append((frm, to, csq, captured) + record)
+
+    def pop(self) -> Tuple[pieces.Position, pieces.Position]:
+        """Takes back the last move made with push and restores the position as it was before.
+
+        Returns:
+            Tuple[Position, Position]: The move which was taken back in normal coordinates.
+        """
+        if self._shared:
+            self._unshare()
+        frm, to, csq, captured, code, self._ep, self._castling, key = self._stack.pop()
+        self._take(to)
+        self._put(frm, code)
+        if (code - 1) % 6 == KING and abs(to - frm) == 2:
+            if to > frm:
+                self._put(frm + 3, self._take(frm + 1))
+            else:
+                self._put(frm - 4, self._take(frm - 1))
+        if csq >= 0:
+            self._put(csq, captured)
+        self._turn ^= 1
+        self.zobrist = key
+        return POSITIONS[frm], POSITIONS[to]
+
+    def _castlings(self, t: int, occ: int, danger: int) -> int:
+        """Returns the mask of the squares the king of team t can castle to. The king may not be in check,
+        which the caller has to make sure.
+
+        Args:
+            t (int): The team.
+            occ (int): The mask of the occupied squares.
+            danger (int): The mask of the squares attacked by the other team, at least on the back row.
+        """
+        targets = 0
+        squares, king, rook = self.squares, 6*t + KING + 1, 6*t + ROOK + 1
+        for right, kfrm, kto, rfrm, _, empty, safe in CASTLINGS[t]:
+            if (self._castling & right and not occ & empty and not danger & safe
+                    and squares[kfrm] == king and squares[rfrm] == rook):
+                targets |= BIT[kto]
+        return targets
+
+    def iter_moves(self, team=None) -> Iterator[Tuple[pieces.Position, ...]]:
+        """Yields the legal moves as they are taken by push: (from, to) in normal coordinates, the moves of a
+        pawn to the last row once for every piece it can promote to as (from, to, piece class).
+
+        Args:
+            team (Union[str, pieces.Team], optional): The team to move. Defaults to the team which is to move.
+        """
+        t = self._turn if team is None else TEAM_INDEX[str(team)]
+        squares = self.squares
+        for frm, mask in self._masks(t):
+            pos = POSITIONS[frm]
+            if squares[frm] == 6*t + PAWN + 1:
+                for to in iter_bits(mask):
+                    if to < 8 or to >= 56:
+                        for piece in PROMOTIONS:
+                            yield pos, POSITIONS[to], piece
+                    else:
+                        yield pos, POSITIONS[to]
+            else:
+                for to in iter_bits(mask):
+                    yield pos, POSITIONS[to]
+
+    def count_moves(self, team=None) -> int:
+        """Returns the number of legal moves, as many as iter_moves yields, without making a move object.
+
+        Args:
+            team (Union[str, pieces.Team], optional): The team to move. Defaults to the team which is to move.
+        """
+        t = self._turn if team is None else TEAM_INDEX[str(team)]
+        squares, pawn = self.squares, 6*t + PAWN + 1
+        # A pawn on the second last row promotes with every move, to one of four pieces.
+        last = 0xFF00000000000000 if t == WHITE else 0xFF
+        n = 0
+        for frm, mask in self._masks(t):
+            n += mask.bit_count()
+            if squares[frm] == pawn and mask & last:
+                n += (len(PROMOTIONS) - 1)*mask.bit_count()
+        return n
+
+    def generate(self, out, team=None, start: int = 0) -> int:
+        """Writes the legal moves encoded as 16-bit integers (see movecodes) into the buffer out, e.g. from
+        movecodes.new_buffer or a NumPy array of uint16. Unlike legal_moves and iter_moves, no object is
+        created for a move, and the moves can be made with push.
+
+        Args:
+            out (MutableSequence[int]): The buffer, which has to hold the moves from start on. There are at
+                most movecodes.MAX_MOVES.
+            team (Union[str, pieces.Team], optional): The team to move. Defaults to the team which is to move.
+            start (int, optional): The index of the first move in the buffer. Defaults to 0.
+
+        Returns:
+            int: The number of moves written.
+        """
+        t = self._turn if team is None else TEAM_INDEX[str(team)]
+        squares, ep, occ = self.squares, self._ep, self.occupied
+        pawn, king = 6*t + PAWN + 1, 6*t + KING + 1
+        n = start
+        for frm, mask in self._masks(t):
+            code = squares[frm]
+            if code == pawn or code == king:
+                while mask:
+                    b = mask & -mask
+                    mask ^= b
+                    to = b.bit_length() - 1
+                    move = frm | to << 6 | (_CAPTURE if occ & b else 0)
+                    if code == pawn:
+                        if to < 8 or to >= 56:
+                            for flags in PROMOTION_FLAGS:
+                                out[n] = move | flags
+                                n += 1
+                            continue
+                        if to == ep:
+                            move |= EN_PASSANT << 12
+                        elif to - frm == 16 or frm - to == 16:
+                            move |= DOUBLE_PUSH << 12
+                    elif to - frm == 2 or frm - to == 2:
+                        move |= (KING_CASTLE if to > frm else QUEEN_CASTLE) << 12
+                    out[n] = move
+                    n += 1
+                continue
+            # The other pieces only capture or move quietly.
+            captures = mask & occ
+            mask ^= captures
+            while captures:
+                b = captures & -captures
+                captures ^= b
+                out[n] = frm | (b.bit_length() - 1) << 6 | _CAPTURE
+                n += 1
+            while mask:
+                b = mask & -mask
+                mask ^= b
+                out[n] = frm | (b.bit_length() - 1) << 6
+                n += 1
+        return n - start
 
     def plot_chessboard(self, highlighted=None):
-        """Plots the chessboard with the current pieces.
+        """Plots the chessboard with the current pieces into a new pyplot figure.
         If highlighted is given then these fields are also depicted with the highlighted color.
+        To draw many positions use a render.BoardRenderer, which keeps its figure and updates only the
+        squares that changed.
 
         Args:
-            highlighted (_type_, optional): A list of highlighted fields. Defaults to None.
+            highlighted (Iterable[Position], optional): The positions of the highlighted fields in normal
+                coordinates. Defaults to None.
+
+        Returns:
+            matplotlib.figure.Figure: The figure.
         """
-        # Declare color values
-        cdict = get_json_file()
-        cBlack = cdict['colors']['black_field']
-        cWhite = cdict['colors']['white_field']
-        cHighlightWhite = cdict['colors']['white_highlighted']
-        cHighlightBlack = cdict['colors']['black_highlighted']
-        cBPiece = np.array(cdict['colors']['black_pieces'])/255
-        cWPiece = np.array(cdict['colors']['white_pieces'])/255
+        # matplotlib is only imported for plotting, the rules do not need it (see diagram.py for text and SVG).
+        import matplotlib.pyplot as plt
+        from render import BoardRenderer
 
         fig, ax = plt.subplots(1, 1)
-        res = np.add.outer(range(8), range(8)) % 2
-
-        if highlighted is not None:
-            for h in highlighted:
-                hy, hx = h
-                hx = 7 - hx
-                if res[hx, hy] == 0:
-                    res[hx, hy] = 2
-                else:
-                    res[hx, hy] = 3
-
-        img = np.zeros((8, 8, 3))
-        img[res == 0] = cWhite
-        img[res == 1] = cBlack
-        img[res == 2] = cHighlightWhite
-        img[res == 3] = cHighlightBlack
-        img /= 255
-        ax.imshow(img)
-
-        ax.set_xticks([i-1 for i in range(1, 9)])
-        ax.set_yticks([i-2 for i in range(9, 1, -1)])
-
-        ax.set_xticklabels(list("abcdefgh"))
-        ax.set_yticklabels([i for i in range(1, 9)])
-
-        for k in self._pieces:
-            piece = self._pieces[k]
-            x, y = piece.position
-            y = 7 - y
-            x -= 0.45
-            y += 0.33
-            ax.text(x, y, piece.icon_text, color=cBPiece if piece.team == 'b' else cWPiece,
-                    fontsize=26)
-
-        fig.suptitle("Chess Board")
-        # plt.show()
+        BoardRenderer(ax=ax).update(self, highlighted)
+        return fig
 
     def get_danger_zone(self, team):
         """Returns the danger zone of the selected teamm, that is, all positions, that the selected team can attack.
         Returns a set of positions.
-        Mainly here to get the dangerous positions for the king.
+        Mainly here to get the dangerous positions for the king, therefore the sliders look through the king of
+        the other team.
 
         Args:
             team (pieces.Teeam): The team to select the danger zone from.
@@ -163,13 +688,7 @@ class Board:
         Returns:
             Set[Positions]: A set of positions the given team can attack on.
         """
-        danger = set()
-        for pos in self._pieces:
-            piece = self._pieces[pos]
-            if piece.team == team:
-                dngzone = piece.danger_zone(self._pieces)
-                danger.update(dngzone)
-        return danger
+        return to_positions(self._danger(TEAM_INDEX[str(team)]))
 
     def is_check(self, team, danger_zone=None):
         """Returns True if the king of the given team is in check. 
@@ -183,105 +702,232 @@ class Board:
         Returns:
             bool: Condition if king has been checked.
         """
-        if danger_zone is None:
-            danger_zone = self.get_danger_zone(~team)
-        return self.kings[team].position in danger_zone
+        t = TEAM_INDEX[str(team)]
+        ksq = self.squares.find(6*t + KING + 1)
+        if danger_zone is not None:
+            return POSITIONS[ksq] in danger_zone
+        return self.attack_counts[64*(1 - t) + ksq] > 0
 
     def get_attackers(self, team):
-        """Returns the number of pieces threatening the king of the given team.
+        """Returns the pieces threatening the king of the given team.
 
         Args:
-            team (pieces.Team): Team of the king which shall be checked 
+            team (pieces.Team): Team of the king which shall be checked
 
         Returns:
-            List[Tuple[Piece, Set[Position]]]: 
-                A list containing tuples with pieces and the corresponding move set of this piece.
-            The pieces which check the king. The king is checked if the list is not empty.
+            List[Tuple[Piece, Set[Position]]]:
+                A list containing the checking pieces and the positions between the piece and the king.
+                For knights and pawns the set contains the position of the piece itself.
+            The king is checked if the list is not empty.
         """
-        kingpos = self.kings[team].position
-        rook = pieces.Rook(team, kingpos)
-        bishop = pieces.Bishop(team, kingpos)
-        knight = pieces.Knight(team, kingpos)
-        pawn = pieces.Pawn(team, kingpos)
-
-        rdng = rook.danger_zone(self._pieces)
-        bdng = bishop.danger_zone(self._pieces)
-        kdng = knight.danger_zone(self._pieces)
-        pdng = pawn.danger_zone(self._pieces)
-
+        t = TEAM_INDEX[str(team)]
+        ksq = self.squares.find(6*t + KING + 1)
         attackers = []
-        for pos in self._pieces:
-            piece = self._pieces[pos]
-            if piece.team == team or isinstance(piece, King):
-                continue
-            # Checks if a fitting piece is on a dangerous position.
-            elif isinstance(piece, (Bishop, Queen)) and pos in bdng:
-                attackers.append((piece, bdng & Bishop(
-                    ~team, pos).get_moves(self._pieces)))
-            elif isinstance(piece, (Rook, Queen)) and pos in rdng:
-                attackers.append(
-                    (piece, rdng & Rook(~team, pos).get_moves(self._pieces)))
-            elif isinstance(piece, Knight) and pos in kdng:
-                attackers.append((piece, {pos}))
-            elif isinstance(piece, Pawn) and pos in pdng:
-                attackers.append((piece, {pos}))
-
-            if len(attackers) >= 2:
-                # In a normal chess game it is not possible that more than 2 pieces simultaneously check the king
-                return attackers
+        for sq in iter_bits(self._checkers(t, ksq)):
+            if (self.squares[sq] - 1) % 6 in (KNIGHT, PAWN):
+                attackers.append((self._piece(sq), {POSITIONS[sq]}))
+            else:
+                attackers.append((self._piece(sq), to_positions(BETWEEN[ksq][sq])))
         return attackers
 
+    def _attackers(self, sq: int, team: int, occ: int) -> int:
+        """Returns the mask of the pieces of team which attack sq for the occupancy occ."""
+        squares, o = self.squares, 6*team + 1
+        attackers = 0
+        for b in iter_bits(ROOK_TABLE[sq][occ & ROOK_MASK[sq]] & occ):
+            if squares[b] == o + ROOK or squares[b] == o + QUEEN:
+                attackers |= BIT[b]
+        for b in iter_bits(BISHOP_TABLE[sq][occ & BISHOP_MASK[sq]] & occ):
+            if squares[b] == o + BISHOP or squares[b] == o + QUEEN:
+                attackers |= BIT[b]
+        for b in iter_bits(KNIGHT_ATTACKS[sq] & occ):
+            if squares[b] == o + KNIGHT:
+                attackers |= BIT[b]
+        for b in iter_bits(PAWN_ATTACKS[1 - team][sq] & occ):
+            if squares[b] == o + PAWN:
+                attackers |= BIT[b]
+        for b in iter_bits(KING_ATTACKS[sq] & occ):
+            if squares[b] == o + KING:
+                attackers |= BIT[b]
+        return attackers
+
+    def _checkers(self, t: int, ksq: int) -> int:
+        """Returns the mask of the pieces which attack the king of team t on ksq."""
+        if not self.attack_counts[64*(1 - t) + ksq]:
+            # The attack counts tell that nothing checks the king.
+            return 0
+        return self._attackers(ksq, 1 - t, self.occupied)
+
+    def _occupancy(self, t: int) -> int:
+        """Returns the mask of the squares occupied by team t."""
+        # The codes are translated to the binary digits of the mask, the first square is the lowest bit.
+        return int(self.squares.translate(_TEAM_DIGITS[t])[::-1], 2)
+
+    def _king_can_move(self, t: int, ksq: int, own: int) -> bool:
+        """Returns True if the king of team t on ksq has a safe square to step to, see _has_move."""
+        counts, e = self.attack_counts, 64*(1 - t)
+        free = [b for b in iter_bits(KING_ATTACKS[ksq] & ~own) if not counts[e + b]]
+        if not free:
+            return False
+        # The counts do not see through the king, the squares behind it on the ray of a slider are not safe.
+        xray = self._xray(1 - t)
+        return any(not xray & BIT[b] for b in free)
+
+    def status(self, team) -> str:
+        """Returns the state of the game for the given team: ONGOING, CHECK (the king is attacked but the team
+        can move), CHECKMATE or STALEMATE.
+
+        Unlike legal_moves, the moves are not collected: the search stops at the first legal move, and the
+        moves of the king are tried first. So this is a lot faster than looking for an empty legal_moves.
+
+        Args:
+            team (Union[str, pieces.Team]): The team to look at, usually the team which is to move.
+
+        Returns:
+            str: One of ONGOING, CHECK, CHECKMATE and STALEMATE.
+        """
+        t = TEAM_INDEX[str(team)]
+        ksq = self.squares.find(6*t + KING + 1)
+        checkers = self._checkers(t, ksq)
+        if self._has_move(t, ksq, checkers):
+            return CHECK if checkers else ONGOING
+        return CHECKMATE if checkers else STALEMATE
+
+    def _has_move(self, t: int, ksq: int, checkers: int) -> bool:
+        """Returns True as soon as a legal move of team t is found, see status.
+
+        Args:
+            t (int): The team.
+            ksq (int): The square of the king of the team.
+            checkers (int): The mask of the pieces which attack the king.
+        """
+        squares, occ = self.squares, self.occupied
+        own = self._occupancy(t)
+        # Castling is not needed: if the king can castle, it can also step to the square it passes.
+        if self._king_can_move(t, ksq, own):
+            return True
+        if checkers & (checkers - 1):
+            # Double check, only the king can move.
+            return False
+        enemy, o = occ & ~own, 6*t + 1
+        _, target, pins = self._king_masks(t, ksq, own)
+        for sq in iter_bits(own ^ BIT[ksq]):
+            ms = _targets(squares[sq] - o, t, sq, occ, enemy) & target
+            if ms and sq in pins:
+                ms &= pins[sq]
+            if ms:
+                return True
+        return any(self._en_passant(t, ksq, sq) for sq in self._ep_pawns(t, own))
+
+    def _king_masks(self, t: int, ksq: int, own: int) -> Tuple[int, int, Dict[int, int]]:
+        """Looks at the king of team t on ksq in a single pass over the lines and the knight and pawn squares
+        around it.
+
+        Args:
+            t (int): The team.
+            ksq (int): The square of the king.
+            own (int): The mask of the squares occupied by the team.
+
+        Returns:
+            Tuple[int, int, Dict[int, int]]: The mask of the pieces which check the king, the mask of the
+                squares the other pieces may move to (capture the checker or block its ray, all squares but the
+                own ones if there is no check, none in a double check), and the pinned pieces mapped to the
+                line through the king they may move along.
+        """
+        squares, occ = self.squares, self.occupied
+        enemy, o = occ & ~own, 6*(1 - t) + 1
+        rays = ROOK_RAYS[ksq]
+        checkers, pins = 0, dict()
+        for s in iter_bits((rays | BISHOP_RAYS[ksq]) & enemy):
+            code = squares[s]
+            if code == o + QUEEN or code == (o + ROOK if rays & BIT[s] else o + BISHOP):
+                # A slider checks if nothing is in between and pins if only a piece of the team is in between.
+                between = BETWEEN[ksq][s] & occ
+                if not between:
+                    checkers |= BIT[s]
+                elif not between & (between - 1) and between & own:
+                    pins[between.bit_length() - 1] = LINE[ksq][s]
+        for s in iter_bits(KNIGHT_ATTACKS[ksq] & enemy):
+            if squares[s] == o + KNIGHT:
+                checkers |= BIT[s]
+        for s in iter_bits(PAWN_ATTACKS[t][ksq] & enemy):
+            if squares[s] == o + PAWN:
+                checkers |= BIT[s]
+        if not checkers:
+            target = FULL ^ own
+        elif checkers & (checkers - 1):
+            target = 0
+        else:
+            target = checkers | BETWEEN[ksq][lsb(checkers)]
+        return checkers, target, pins
+
+    def _ep_pawns(self, t: int, own: int) -> Iterator[int]:
+        """Yields the squares of the pawns of team t which can capture en passant, if the king is safe."""
+        if self._ep >= 0 and t == self._turn:
+            pawn = 6*t + PAWN + 1
+            for sq in iter_bits(PAWN_ATTACKS[1 - t][self._ep] & own):
+                if self.squares[sq] == pawn:
+                    yield sq
+
+    def _en_passant(self, t: int, ksq: int, sq: int) -> bool:
+        """Returns True if the pawn of team t on sq may capture en passant.
+
+        En passant removes two pieces from the board, which the pins and checks do not cover (e.g. both pawns
+        leave the row of the king). Therefore the capture is made on the occupancy and the king is checked
+        afterwards."""
+        ep, occ = self._ep, self.occupied
+        after = occ ^ BIT[sq] ^ BIT[ep ^ 8] | BIT[ep]
+        return not self._attackers(ksq, 1 - t, after) & after
+
     def legal_moves(self, team):
-        """Calculates the legal moves of the given team.
+        """Calculates the legal moves of the given team. If the board has a move_cache, the moves of the
+        positions seen before are taken from it.
 
         Args:
-            team (Dict[Position, Set[Position]]): A dictionary which maps the position to the legal move sets.
+            team (Union[str, pieces.Team]): The team to calculate the legal moves for.
+
+        Returns:
+            Dict[Position, Set[Position]]: A dictionary which maps the position to the legal move sets.
         """
-        team = Team(team)
-        king = self.kings[team]
-
-        # First, calculate all possible moves the current team can make.
-        pmoves = dict()  # All moves from the team.
-        dzone = set()  # Danger zone of the enemy pieces for the king.
-        for pos in self._pieces:
-            piece = self._pieces[pos]
-            if piece.team != team:
-                dzone.update(piece.danger_zone(self._pieces))
-            else:
-                pmoves[pos] = piece.get_moves(self._pieces, en_passant = self.en_passant[0])
-
-        # Tackle the pinning.
-        pins = king.check_pins(self._pieces)
-        for piece, rs in pins: 
-            pmoves[piece.position] &= rs
-
-        # Tackle Checks
-        attackers = self.get_attackers(team)
-        if len(attackers) > 0:
-            # Check!
-            capture_moves = set()  # Saves the positions which t
-            # Saves the positions on which the given team can move.
-            block_moves = set()
-
-            if len(attackers) == 1:
-                # You can only capture the attacker if there is only one.
-                # This is also the only situation where you can block the attacker.
-                capture_moves.add(attackers[0][0].position)
-                block_moves.update(attackers[0][1])
-                
-            block_moves |= capture_moves
-            for pos in pmoves:
-                # The moves of the king are handled later.
-                if pos != king.position:
-                    pmoves[pos] &= block_moves
-                    if self.en_passant[0] is not None and isinstance(self._pieces[pos], Pawn):
-                        pmoves[pos].add(self.en_passant[0])
-                    # pmoves[pos] |= capture_moves
-
-        # Give the king special treatment.
-        pmoves[king.position] -= dzone
-
-        return pmoves
+        return thaw(self._masks(TEAM_INDEX[str(team)]))
+
+    def _masks(self, t: int) -> Iterable[Tuple[int, int]]:
+        """Returns the legal moves of team t as (square, mask of the target squares) pairs, from the move_cache
+        if the board has one."""
+        cache = self.move_cache
+        if cache is None:
+            return self._legal_masks(t).items()
+        key = self.zobrist, t
+        entry = cache.get(key)
+        if entry is None:
+            entry = tuple(self._legal_masks(t).items())
+            cache.put(key, entry)
+        return entry
+
+    def _legal_masks(self, t: int) -> Dict[int, int]:
+        """Calculates the legal moves of team t as a dictionary mapping squares to masks of target squares."""
+        squares, occ = self.squares, self.occupied
+        own = self._occupancy(t)
+        ksq = squares.find(6*t + KING + 1)
+        checkers, target, pins = self._king_masks(t, ksq, own)
+
+        # The danger zone looks through the king, as the king cannot step back along the ray of a slider.
+        danger = self._danger(1 - t)
+        moves = {ksq: KING_ATTACKS[ksq] & ~own & ~danger}
+        if self._castling and not checkers:
+            moves[ksq] |= self._castlings(t, occ, danger)
+
+        enemy, o = occ & ~own, 6*t + 1
+        for sq in iter_bits(own ^ BIT[ksq]):
+            ms = _targets(squares[sq] - o, t, sq, occ, enemy) & target
+            if ms and sq in pins:
+                ms &= pins[sq]
+            moves[sq] = ms
+        if target:
+            for sq in self._ep_pawns(t, own):
+                if self._en_passant(t, ksq, sq):
+                    moves[sq] |= BIT[self._ep]
+        return moves
 
     def put_piece(self, posx: Union[str, int], posy: int, piece, team: Union[str, pieces.Team]):
         """Initializes the board with the given piece.
@@ -301,7 +947,7 @@ class Board:
         """Places the king to the given position. This method should be prefered to the normal put piece method as 
         it also save the position of the king in the class."""
         (cx, cy), (px, py) = to_both_coord(posx, posy)
-        self[cx, cy] = self.kings[Team(team)] = King(team, (px, py))
+        self[cx, cy] = King(team, (px, py))
 
     def init_board(self):
         """Initializes the chess board by placing all the pieces on the board.
@@ -401,7 +1047,7 @@ class Board:
         
         self.put_piece('e', 4, Pawn, 'b')
         self.put_piece('d', 2, Pawn, 'w')
-        b.move(b['d', 2], ('d', 4))
+        self.move(self['d', 2], ('d', 4))
 
         return self._pieces
     
@@ -418,51 +1064,54 @@ class Board:
         self.put_piece('f', 1, Queen, 'w')
         
         # Enable the en passant
-        b.move(b['d', 2], ('d', 4))
+        self.move(self['d', 2], ('d', 4))
 
         return self._pieces
 
-# plt.close('all')
-
-b = Board()
-# bpieces = b.init_board()
-bpieces = b.board4()
-
-# b.plot_chessboard(b.get_danger_zone(Team('b')))
-# b.move(b['d', 2], ('d', 4))
-moves = b.legal_moves('b')
-dz = set()
-for pos in moves:
-    dz.update(moves[pos])
-b.plot_chessboard(dz)
-# b.move(b['d', 7], ('d', 5))
-# b.plot_chessboard()
-# b.move(b['e', 5], ('d', 6))
-# b.plot_chessboard()
-
-# b.plot_chessboard(moves[to_coord('g', 5)])
-# dz = set()
-# for pos in moves:
-#     dz.update(moves[pos])
-# b.plot_chessboard(dz)
-
-# b.plot_chessboard(moves[to_coord('e', 3)])
-# b.plot_chessboard(b['b', 7].get_moves(bpieces))
-# r.get_legal_moves(b.get_pieces())
-# r = b.list_of_pieces_on_board[0]
-# pawn1 = pieces[1]
-# pawn1.get_legal_moves(pieces)
-# q1 = pieces[2]
-# print(repr(q1.get_legal_moves(pieces)))
-
-# [[coord_to_chess(*l) for l in l_] for l_ in q1.get_legal_moves(pieces)[0]]
-# q1 = b['c', 4]
-# # _, enmy = q1.get_legal_moves(b.get_pieces())
-# dng = b.get_danger_zone(pieces.Team('b'))
-# b.plot_chessboard(highlighted=dng)
-# # print(ls2chess(q1.danger_zone(b.get_pieces())))
-# bkn = b['b', 8]
-# moves = bkn.get_legal_moves(b.get_pieces())
-# p1 = b['b',7]
-# dngp1 = p1.danger_zone(b.get_pieces())
-# king = b['e', 1]
+# An example of en passant, run with python board.py.
+if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
+    b = Board()
+    # bpieces = b.init_board()
+    bpieces = b.board4()
+
+    # b.plot_chessboard(b.get_danger_zone(Team('b')))
+    # b.move(b['d', 2], ('d', 4))
+    moves = b.legal_moves('b')
+    dz = set()
+    for pos in moves:
+        dz.update(moves[pos])
+    b.plot_chessboard(dz)
+    plt.show()
+    # b.move(b['d', 7], ('d', 5))
+    # b.plot_chessboard()
+    # b.move(b['e', 5], ('d', 6))
+    # b.plot_chessboard()
+
+    # b.plot_chessboard(moves[to_coord('g', 5)])
+    # dz = set()
+    # for pos in moves:
+    #     dz.update(moves[pos])
+    # b.plot_chessboard(dz)
+
+    # b.plot_chessboard(moves[to_coord('e', 3)])
+    # b.plot_chessboard(b['b', 7].get_moves(bpieces))
+    # r.get_legal_moves(b.get_pieces())
+    # r = b.list_of_pieces_on_board[0]
+    # pawn1 = pieces[1]
+    # pawn1.get_legal_moves(pieces)
+    # q1 = pieces[2]
+    # print(repr(q1.get_legal_moves(pieces)))
+
+    # [[coord_to_chess(*l) for l in l_] for l_ in q1.get_legal_moves(pieces)[0]]
+    # q1 = b['c', 4]
+    # # _, enmy = q1.get_legal_moves(b.get_pieces())
+    # dng = b.get_danger_zone(pieces.Team('b'))
+    # b.plot_chessboard(highlighted=dng)
+    # # print(ls2chess(q1.danger_zone(b.get_pieces())))
+    # bkn = b['b', 8]
+    # moves = bkn.get_legal_moves(b.get_pieces())
+    # p1 = b['b',7]
+    # dngp1 = p1.danger_zone(b.get_pieces())
+    # king = b['e', 1]
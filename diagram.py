@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Rendering of boards as Unicode text and SVG without any plotting library.
+
+The pieces are drawn with their unicode symbols (see pieces.Piece.icon_text) and the squares in the colors of
+settings.json. An SVG is joined from strings which are built once per size and colors: the squares in both
+states of highlighting and the text element of every piece on every square. So a position costs 64 lookups
+and a join, which suits a server rendering many boards (a few 10 µs per board instead of the milliseconds of
+a matplotlib figure, see render.py).
+
+Usage:
+    print(to_unicode(board))
+    svg = to_svg(board, highlighted=[(4, 3)])
+    python diagram.py --fen "<fen>" --svg board.svg
+"""
+
+import argparse
+from functools import lru_cache
+from typing import Iterable, List, Tuple, Union
+
+import pieces
+from bits import POSITIONS, BIT, to_mask
+from board import Board, Snapshot
+from fen import START_FEN
+from misc import load_settings
+from pieces import FLYWEIGHTS
+
+# The symbol of every piece code (see pieces.FLYWEIGHTS), the empty square has none.
+ICONS = ('',) + tuple(piece.icon_text for piece in (FLYWEIGHTS[code][0] for code in range(1, 13)))
+EMPTY = '·'  # The symbol of an empty square in the text.
+
+Color = Tuple[int, int, int]
+
+
+def to_unicode(position: Union[Board, Snapshot], highlighted: Iterable[pieces.Position] = None,
+               coordinates: bool = True) -> str:
+    """Returns the position as eight lines of unicode symbols, the eighth row on top.
+
+    Args:
+        position (Union[Board, Snapshot]): The position.
+        highlighted (Iterable[Position], optional): The positions (col, row) of the squares to mark, they are
+            shown in brackets. Defaults to None.
+        coordinates (bool, optional): Whether to add the numbers of the rows and the letters of the columns.
+            Defaults to True.
+
+    Returns:
+        str: The text.
+    """
+    squares = position.squares
+    mask = to_mask(highlighted) if highlighted else 0
+    lines = []
+    for row in range(7, -1, -1):
+        cells = []
+        for sq in range(8*row, 8*row + 8):
+            icon = ICONS[squares[sq]] or EMPTY
+            cells.append(f"[{icon}]" if mask & BIT[sq] else f" {icon} ")
+        lines.append(f"{row + 1} {''.join(cells)}" if coordinates else ''.join(cells))
+    if coordinates:
+        lines.append('  ' + ''.join(f" {c} " for c in "abcdefgh"))
+    return '\n'.join(lines)
+
+
+def _hex(color: Color) -> str:
+    return '#{:02x}{:02x}{:02x}'.format(*color)
+
+
+@lru_cache(maxsize=16)
+def _svg_parts(size: int, white: Color, black: Color, white_highlighted: Color, black_highlighted: Color,
+               white_pieces: Color, black_pieces: Color) -> Tuple[str, List[Tuple[str, str]], List[List[str]]]:
+    """Returns the head of the SVG, the squares [sq][highlighted] and the pieces [code][sq] as SVG elements."""
+    head = (f'<svg xmlns="http://www.w3.org/2000/svg" width="{8*size}" height="{8*size}" '
+            f'viewBox="0 0 {8*size} {8*size}" font-size="{0.8*size:g}" text-anchor="middle" '
+            f'dominant-baseline="central">')
+    squares, glyphs = [], [[''] * 64]
+    for col, row in POSITIONS:
+        x, y = col*size, (7 - row)*size
+        # (col + row) is even on the dark squares, a1 is dark.
+        colors = (black, black_highlighted) if (col + row) % 2 == 0 else (white, white_highlighted)
+        squares.append(tuple(f'<rect x="{x}" y="{y}" width="{size}" height="{size}" fill="{_hex(c)}"/>'
+                             for c in colors))
+    for code in range(1, 13):
+        fill = _hex(white_pieces if code <= 6 else black_pieces)
+        glyphs.append([f'<text x="{(col + 0.5)*size:g}" y="{(7.5 - row)*size:g}" fill="{fill}">{ICONS[code]}</text>'
+                       for col, row in POSITIONS])
+    return head, squares, glyphs
+
+
+def to_svg(position: Union[Board, Snapshot], highlighted: Iterable[pieces.Position] = None, size: int = 45,
+           settings: dict = None) -> str:
+    """Returns the position as an SVG image.
+
+    Args:
+        position (Union[Board, Snapshot]): The position.
+        highlighted (Iterable[Position], optional): The positions (col, row) of the squares to highlight.
+            Defaults to None.
+        size (int, optional): The width and height of a square in pixels. Defaults to 45.
+        settings (dict, optional): The settings with the colors, see settings.json. Defaults to the settings
+            next to this module, which are read once.
+
+    Returns:
+        str: The SVG document.
+    """
+    colors = (settings or load_settings())['colors']
+    head, squares, glyphs = _svg_parts(size, *(tuple(colors[name]) for name in (
+        'white_field', 'black_field', 'white_highlighted', 'black_highlighted', 'white_pieces', 'black_pieces')))
+    mask = to_mask(highlighted) if highlighted else 0
+    parts = [head]
+    parts += [squares[sq][1 if mask & BIT[sq] else 0] for sq in range(64)]
+    parts += [glyphs[code][sq] for sq, code in enumerate(position.squares) if code]
+    parts.append('</svg>')
+    return ''.join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prints a position as text or saves it as an SVG.")
+    parser.add_argument('--fen', default=START_FEN, help="The position.")
+    parser.add_argument('--svg', help="The file for the SVG image.")
+    parser.add_argument('--size', type=int, default=45, help="The size of a square in the SVG in pixels.")
+    args = parser.parse_args(argv)
+
+    board = Board.from_fen(args.fen)
+    print(to_unicode(board))
+    if args.svg:
+        with open(args.svg, 'w', encoding='utf-8') as file:
+            file.write(to_svg(board, size=args.size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Evaluation of positions by material and piece-square tables.
+
+The value of a piece on a square is PST[code, sq] in centipawns from the view of white, that is the material
+value of the piece plus a bonus for the square (the tables of the simplified evaluation function), negated
+and mirrored for the black pieces. The score of a position is the sum over its pieces. The board keeps this
+sum up to date with every change of a square (see Board.evaluate), evaluate_many scores whole arrays of
+positions at once.
+"""
+
+import numpy as np
+
+from bits import RAN64
+from pieces import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+# The value of the kinds in centipawns, the king is never captured.
+VALUES = (100, 320, 330, 500, 900, 0)
+
+# The bonus of the kinds on the squares, from the view of white as the board is looked at: the first row of
+# a table is the eighth row of the board.
+_TABLES = {
+    PAWN: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0),
+    KNIGHT: (
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50),
+    BISHOP: (
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20),
+    ROOK: (
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0),
+    QUEEN: (
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20),
+    KING: (
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20),
+}
+
+# PST[code, sq], code 0 (the empty square) is worth nothing.
+PST = np.zeros((13, 64), dtype=np.int32)
+for _kind, _table in _TABLES.items():
+    _white = VALUES[_kind] + np.array(_table, dtype=np.int32).reshape(8, 8)[::-1].ravel()
+    PST[_kind + 1] = _white
+    # A black piece on sq is worth as much for black as a white piece on the mirrored square for white.
+    PST[_kind + 7] = -_white[[sq ^ 56 for sq in RAN64]]
+# The same as nested lists, Python integers are a lot faster to add up one by one than NumPy scalars.
+PST_SCORES = PST.tolist()
+
+_SQUARE_INDEX = np.arange(64)
+
+
+def evaluate_squares(squares: bytes) -> int:
+    """Returns the score of the piece codes of the 64 squares from the view of white."""
+    return sum([PST_SCORES[code][sq] for sq, code in enumerate(squares) if code])
+
+
+def evaluate_many(positions: np.ndarray, relative: bool = False) -> np.ndarray:
+    """Scores many positions in one go.
+
+    Args:
+        positions (np.ndarray): The positions, see fen.POSITION_DTYPE (e.g. from fen.load_fens or
+            PositionStore.positions), or just the piece codes of the squares with the shape (n, 64).
+        relative (bool, optional): Whether the scores are from the view of the team to move instead of white,
+            which needs the turn of the positions. Defaults to False.
+
+    Returns:
+        np.ndarray: The scores in centipawns.
+    """
+    squares = positions['squares'] if positions.dtype.names else positions
+    scores = PST[np.asarray(squares).reshape(-1, 64), _SQUARE_INDEX].sum(axis=1)
+    if relative:
+        scores = np.where(positions['turn'] != 0, -scores, scores)
+    return scores
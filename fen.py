@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Reading and writing positions in the Forsyth-Edwards Notation (FEN).
+
+A position is handled as the piece codes of the 64 squares (see pieces.FLYWEIGHTS), the team to move (0 for
+white, 1 for black), the en passant square (-1 if there is none) and the castling rights (see bits.CASTLINGS).
+Such a position can be loaded into a board with Board.set_position, or many of them into a compact array with
+load_fens.
+
+The rows of a FEN repeat a lot (empty rows, the rows of the start position, ...), so every distinct row is
+parsed only once and then taken from a cache, which makes parsing a FEN a handful of dictionary lookups.
+"""
+
+from functools import lru_cache
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from bits import RAN8, RAN64, TEAM_INDEX, WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE
+
+# The letter of every piece code, code 0 (the empty square) has no letter.
+LETTERS = ' PNBRQKpnbrqk'
+_CODES = {ch: code for code, ch in enumerate(LETTERS) if code}
+# The name (e.g. 'e3') of every square and back.
+SQUARE_NAMES = ["abcdefgh"[sq & 7] + str((sq >> 3) + 1) for sq in RAN64]
+_SQUARES = {name: sq for sq, name in enumerate(SQUARE_NAMES)}
+_RIGHTS = (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE), ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+_RIGHT_OF = dict(_RIGHTS)
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# One record of load_fens: the piece codes of the squares, the team to move, the en passant square and the
+# castling rights.
+POSITION_DTYPE = np.dtype([('squares', np.uint8, 64), ('turn', np.uint8), ('ep', np.int8), ('castling', np.uint8)])
+
+
+@lru_cache(maxsize=1 << 14)
+def _parse_row(text: str) -> bytes:
+    row = bytearray()
+    for ch in text:
+        if ch in '12345678':
+            row += bytes(int(ch))
+        else:
+            row.append(_CODES[ch])
+    if len(row) != 8:
+        raise ValueError(f"The row {text!r} does not have 8 squares.")
+    return bytes(row)
+
+
+@lru_cache(maxsize=1 << 14)
+def _format_row(row: bytes) -> str:
+    text, empty = [], 0
+    for code in row:
+        if code:
+            if empty:
+                text.append(str(empty))
+                empty = 0
+            text.append(LETTERS[code])
+        else:
+            empty += 1
+    if empty:
+        text.append(str(empty))
+    return "".join(text)
+
+
+def parse_castling(text: str) -> int:
+    """Returns the castling rights of the castling field of a FEN, e.g. 'KQkq' or '-'."""
+    rights = 0
+    if text != '-':
+        for ch in text:
+            rights |= _RIGHT_OF[ch]
+    return rights
+
+
+def format_castling(rights: int) -> str:
+    """Returns the castling field of a FEN for the castling rights."""
+    return "".join(ch for ch, right in _RIGHTS if rights & right) or '-'
+
+
+def parse_fen(fen: str) -> Tuple[bytes, int, int, int]:
+    """Parses the placement, the team to move, the en passant square and the castling rights of a FEN. The
+    move counters are not used by the board and ignored.
+
+    Args:
+        fen (str): The FEN string, only the placement is required.
+
+    Raises:
+        ValueError: If the FEN is malformed or no pawn can have skipped its en passant square.
+
+    Returns:
+        Tuple[bytes, int, int, int]: The piece codes of the squares, the team to move, the en passant square
+            and the castling rights, as taken by Board.set_position.
+    """
+    fields = fen.split()
+    rows = fields[0].split('/') if fields else ()
+    if len(rows) != 8:
+        raise ValueError(f"The placement of {fen=} does not have 8 rows.")
+    try:
+        # The FEN starts with the eighth row, the squares with the first.
+        placement = b"".join([_parse_row(rows[7 - r]) for r in RAN8])
+        turn = 0 if len(fields) < 2 else TEAM_INDEX[fields[1]]
+        castling = 0 if len(fields) < 3 else parse_castling(fields[2])
+        ep = -1 if len(fields) < 4 or fields[3] == '-' else _SQUARES[fields[3]]
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"{fen=} is not valid: {e}") from None
+    if ep >= 0 and not _en_passant_possible(placement, turn, ep):
+        raise ValueError(f"{fen=} is not valid: no pawn can have skipped {SQUARE_NAMES[ep]}.")
+    return placement, turn, ep, castling
+
+
+def _en_passant_possible(squares: bytes, turn: int, ep: int) -> bool:
+    """Returns True if the pawn of the team which is not to move can just have skipped ep with a double step:
+    ep is on the third row of that team, the pawn is in front of it, and ep and the square behind it are empty."""
+    if turn == 0:
+        return ep >> 3 == 5 and squares[ep - 8] == _CODES['p'] and not squares[ep] and not squares[ep + 8]
+    return ep >> 3 == 2 and squares[ep + 8] == _CODES['P'] and not squares[ep] and not squares[ep - 8]
+
+
+def format_fen(squares: bytes, turn: int = 0, ep: int = -1, castling: int = 0, halfmove: int = 0,
+               fullmove: int = 1) -> str:
+    """Creates the FEN of a position, see parse_fen.
+
+    Args:
+        squares (bytes): The piece codes of the 64 squares.
+        turn (int, optional): The team to move. Defaults to 0 (white).
+        ep (int, optional): The en passant square, -1 if there is none. Defaults to -1.
+        castling (int, optional): The castling rights. Defaults to 0.
+        halfmove (int, optional): The number of half moves since the last capture or pawn move. Defaults to 0.
+        fullmove (int, optional): The number of the move. Defaults to 1.
+
+    Returns:
+        str: The FEN string.
+    """
+    squares = bytes(squares)
+    placement = "/".join([_format_row(squares[8*r:8*r + 8]) for r in reversed(RAN8)])
+    ep = '-' if ep < 0 else SQUARE_NAMES[ep]
+    return f"{placement} {'wb'[turn]} {format_castling(castling)} {ep} {halfmove} {fullmove}"
+
+
+def load_fens(fens: Iterable[str]) -> np.ndarray:
+    """Parses many FENs into one compact array with a record of 67 bytes per position (see POSITION_DTYPE).
+    A record r is loaded into a board with board.set_position(r['squares'], r['turn'], r['ep'], r['castling']).
+
+    Args:
+        fens (Iterable[str]): The FEN strings, e.g. the lines of a file.
+
+    Returns:
+        np.ndarray: The structured array of the positions in the order of fens.
+    """
+    buffer = bytearray()
+    for fen in fens:
+        placement, turn, ep, castling = parse_fen(fen)
+        buffer += placement
+        buffer.append(turn)
+        buffer.append(ep & 0xFF)
+        buffer.append(castling)
+    return np.frombuffer(buffer, dtype=POSITION_DTYPE)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Measurement of the import times of the engine modules against a budget.
+
+Every module is imported in a new interpreter with python -X importtime, which reports the time of the
+import with everything it imports in turn. The median of several runs is compared to the budget of the module,
+and the modules of the plotting libraries must not be imported at all: the rules, the search and the text and
+SVG rendering run without matplotlib, which is only imported by render.py and Board.plot_chessboard.
+
+Usage:
+    python import_budget.py
+    python import_budget.py --runs 9 board search
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# The budgets in milliseconds, with numpy (about 50-100 ms of each) included. The tables of the pieces and the
+# sliders are read from the cache (see tables.py), the first import which builds them is slower.
+BUDGETS: Dict[str, float] = {
+    'bits': 50,
+    'pieces': 250,
+    'board': 300,
+    'bitboard': 300,
+    'perft': 350,
+    'pgn': 350,
+    'search': 400,
+    'diagram': 300,
+}
+# The modules which must not be loaded by the engine.
+FORBIDDEN = ('matplotlib', 'PIL')
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """Imports the module in a new interpreter.
+
+    Returns:
+        Tuple[float, List[str]]: The time of the import in milliseconds and the forbidden modules it loaded.
+    """
+    check = f"import sys, {module}; print(' '.join(m for m in {FORBIDDEN!r} if m in sys.modules))"
+    done = subprocess.run([sys.executable, '-X', 'importtime', '-c', check], capture_output=True, text=True,
+                          check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    # The last line is the module itself: "import time: self [us] | cumulative | name".
+    line = next(line for line in reversed(done.stderr.splitlines()) if line.rstrip().endswith(f' {module}'))
+    return int(line.split('|')[1]) / 1000, done.stdout.split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures the import times of the engine modules.")
+    parser.add_argument('modules', nargs='*', default=list(BUDGETS), help="The modules, defaults to all.")
+    parser.add_argument('--runs', type=int, default=5, help="The number of imports of every module.")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        runs = [measure(module) for _ in range(args.runs)]
+        ms = statistics.median(t for t, _ in runs)
+        loaded = runs[0][1]
+        budget = BUDGETS.get(module)
+        # The modules without a budget (e.g. render) are only measured.
+        ok = budget is None or (ms <= budget and not loaded)
+        failed |= not ok
+        print(f"{module:10} {ms:7.1f} ms  budget {budget if budget is not None else '-':>5}  "
+              f"{'ok' if ok else 'FAILED'}{'  loads ' + ', '.join(loaded) if loaded else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
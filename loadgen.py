@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+A load generator for the game server (see server.py).
+
+Every client opens a connection, starts its games and plays random legal moves in them one request after
+another: it asks for the moves of a game and makes one of them, until the game is over or has max_plies
+plies, and starts a new one then. A part of the requests are analyses, which the server sends to its pool.
+The clients run concurrently on one event loop, the latency of every request is measured on the client side
+and the throughput and the percentiles are reported per op at the end, together with the server's own
+statistics.
+
+Usage:
+    python server.py --port 8765 &
+    python loadgen.py --port 8765 --clients 50 --games 20 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from server import percentiles
+
+
+class Client:
+    """A connection to the server, which sends one request at a time and measures the latencies."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 latencies: Dict[str, List[float]]):
+        self.reader, self.writer = reader, writer
+        self.latencies = latencies
+
+    @classmethod
+    async def connect(cls, latencies: Dict[str, List[float]], host: str = '127.0.0.1', port: int = 8765,
+                      unix: str = None) -> 'Client':
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, latencies)
+
+    async def request(self, op: str, **args: Any) -> Dict[str, Any]:
+        start = time.perf_counter()
+        self.writer.write(json.dumps({'op': op, **args}).encode() + b'\n')
+        await self.writer.drain()
+        line = await self.reader.readline()
+        self.latencies[op].append(time.perf_counter() - start)
+        if not line:
+            raise ConnectionError("The server closed the connection.")
+        return json.loads(line)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def play(client: Client, games: int, deadline: float, max_plies: int, analyze: float, depth: int,
+               rng: random.Random) -> int:
+    """Plays random games in the given number of games at once until the deadline.
+
+    Returns:
+        int: The number of moves made.
+    """
+    ids = [(await client.request('new'))['game'] for _ in range(games)]
+    plies = [0] * games
+    moves = 0
+    while time.perf_counter() < deadline:
+        i = rng.randrange(games)
+        if rng.random() < analyze:
+            await client.request('analyze', game=ids[i], depth=depth)
+            continue
+        legal = (await client.request('moves', game=ids[i]))['moves']
+        if legal and plies[i] < max_plies:
+            answer = await client.request('move', game=ids[i], move=rng.choice(legal))
+            if not answer['ok']:
+                raise RuntimeError(f"A legal move was rejected: {answer['error']}")
+            plies[i] += 1
+            moves += 1
+        else:
+            await client.request('close', game=ids[i])
+            ids[i], plies[i] = (await client.request('new'))['game'], 0
+    for game in ids:
+        await client.request('close', game=game)
+    return moves
+
+
+async def run(host: str, port: int, unix: str, clients: int, games: int, duration: float, max_plies: int,
+              analyze: float, depth: int, seed: int) -> Dict[str, Any]:
+    latencies = defaultdict(list)
+    connections = [await Client.connect(latencies, host, port, unix) for _ in range(clients)]
+    start = time.perf_counter()
+    deadline = start + duration
+    moves = await asyncio.gather(*(play(c, games, deadline, max_plies, analyze, depth, random.Random(seed + i))
+                                   for i, c in enumerate(connections)))
+    elapsed = time.perf_counter() - start
+    stats = await connections[0].request('stats')
+    for client in connections:
+        await client.close()
+    return {'elapsed': elapsed, 'moves': sum(moves), 'latencies': latencies, 'server': stats}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measures the throughput of the game server.")
+    parser.add_argument('--host', default='127.0.0.1', help="The host of the server.")
+    parser.add_argument('--port', type=int, default=8765, help="The TCP port of the server.")
+    parser.add_argument('--unix', help="The Unix socket of the server instead of TCP.")
+    parser.add_argument('--clients', type=int, default=20, help="The number of connections.")
+    parser.add_argument('--games', type=int, default=10, help="The number of games of every client.")
+    parser.add_argument('--duration', type=float, default=10, help="The time of the measurement in seconds.")
+    parser.add_argument('--max-plies', type=int, default=200, help="The plies after which a game is restarted.")
+    parser.add_argument('--analyze', type=float, default=0.01, help="The part of the requests which analyze.")
+    parser.add_argument('--depth', type=int, default=2, help="The depth of the analyses.")
+    parser.add_argument('--seed', type=int, default=0, help="The seed of the random moves.")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args.host, args.port, args.unix, args.clients, args.games, args.duration,
+                             args.max_plies, args.analyze, args.depth, args.seed))
+    elapsed, latencies = result['elapsed'], result['latencies']
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"{total} requests in {elapsed:.2f} s, {total / elapsed:.0f} requests/s, "
+          f"{result['moves'] / elapsed:.0f} moves/s, {args.clients * args.games} games")
+    print("client latency in ms:")
+    for op, samples in sorted(latencies.items()):
+        values = '  '.join(f"{p} {v * 1000:.2f}" for p, v in percentiles(samples).items())
+        print(f"  {op:8} {len(samples):8}  {values}")
+    print("server latency in µs:")
+    for op, stats in sorted(result['server']['latency'].items()):
+        values = '  '.join(f"{p} {v:.0f}" for p, v in stats.items() if p != 'count')
+        print(f"  {op:8} {stats['count']:8}  {values}")
+
+
+if __name__ == '__main__':
+    main()
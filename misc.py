@@ -6,8 +6,13 @@ Created on Fri Dec  2 23:05:24 2022
 """
 
 import json
+import os
+from functools import lru_cache
 from typing import Union
 
+# The settings (colors of the board) next to this file.
+SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'settings.json')
+
 _c2n = {c : ord(c) - ord('a') for c in "abcdefgh"}
 
 def c2n(c):
@@ -57,4 +62,12 @@ def ls2chess(ls):
 def get_json_file():
     with open('settings.json', 'r') as f:
         cdict = json.load(f)
-    return cdict
\ No newline at end of file
+    return cdict
+
+
+@lru_cache(maxsize=None)
+def load_settings(path: str = SETTINGS_PATH) -> dict:
+    """Reads the settings once, later calls return the same dictionary, which must not be changed.
+    Unlike get_json_file, the default file does not depend on the working directory."""
+    with open(path, 'r') as f:
+        return json.load(f)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of the legal moves of positions which are seen again and again (hints of a GUI, analysis of the same
+openings, replays).
+
+The cache is opt-in: it is used by Board.legal_moves once it is set as the move_cache of the board, and it
+can be shared by many boards. The moves are cached under the Zobrist hash of the position (see Board.key)
+and the team, and since the hash changes with every change of the board (move, remove, board[pos] = piece,
+...), an entry is never used for another position. Like in the transposition table, collisions of the 64-bit
+hash are ignored.
+
+An entry is stored as a tuple of (square, mask of the target squares) pairs, a few hundred bytes for a
+position, and turned into the dictionary of Board.legal_moves on every hit, so the caller may change it.
+Board.generate and Board.iter_moves read the pairs directly.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+import pieces
+from bits import POSITIONS, BIT, square, to_positions
+
+Moves = Tuple[Tuple[int, int], ...]
+
+
+def freeze(moves: Dict[pieces.Position, Set[pieces.Position]]) -> Moves:
+    """Turns the legal moves (see Board.legal_moves) into the compact immutable form of an entry."""
+    frozen = []
+    for frm, tos in moves.items():
+        mask = 0
+        for to in tos:
+            mask |= BIT[square(*to)]
+        frozen.append((square(*frm), mask))
+    return tuple(frozen)
+
+
+def thaw(frozen: Moves) -> Dict[pieces.Position, Set[pieces.Position]]:
+    """Turns an entry back into the legal moves, see freeze."""
+    return {POSITIONS[sq]: to_positions(mask) for sq, mask in frozen}
+
+
+class MoveCache:
+    """A least recently used cache of the legal moves with a limited number of entries.
+
+    Usage:
+        board.move_cache = MoveCache(maxsize=4096)
+        board.legal_moves(board.turn)  # miss
+        board.legal_moves(board.turn)  # hit
+        print(board.move_cache.stats())
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        if maxsize < 1:
+            raise ValueError(f"The cache needs room for one entry at least, not {maxsize=}.")
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple[int, int]) -> Optional[Moves]:
+        """Returns the entry of the key (hash, team) and marks it as used, None if there is none."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Tuple[int, int], entry: Moves):
+        """Adds the entry, the least recently used one is evicted if the cache is full."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Removes all entries and resets the counters."""
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """The counters since the cache was created or cleared."""
+        lookups = self.hits + self.misses
+        return {'size': len(self), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                'hit rate': self.hits / max(lookups, 1), 'evictions': self.evictions}
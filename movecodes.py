@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Moves encoded as 16-bit integers.
+
+A move is from | to << 6 | flags << 12 with the squares of the board (col + 8*row). The flags tell what kind
+of move it is without looking at the board:
+
+    0  QUIET          4  CAPTURE
+    1  DOUBLE_PUSH    5  EN_PASSANT
+    2  KING_CASTLE    8  PROMOTION to a knight, +1 bishop, +2 rook, +3 queen
+    3  QUEEN_CASTLE   12 PROMOTION | CAPTURE, the same
+
+Board.generate writes the legal moves in this form into a preallocated array('H') (see new_buffer) or a NumPy
+array of uint16, so no tuple or set is created per move, and Board.push takes the integers as well. The
+transposition table keeps its best moves in the same form, see pack_move.
+"""
+
+from array import array
+from typing import Tuple
+
+import pieces
+from bits import POSITIONS, square
+from pieces import PIECE_CLASSES, PROMOTIONS, KNIGHT
+
+QUIET, DOUBLE_PUSH, KING_CASTLE, QUEEN_CASTLE, CAPTURE, EN_PASSANT, PROMOTION = 0, 1, 2, 3, 4, 5, 8
+# The flags of the promotions in the order of pieces.PROMOTIONS, shifted to their place in the move.
+PROMOTION_FLAGS = tuple((PROMOTION | piece.kind - KNIGHT) << 12 for piece in PROMOTIONS)
+# There are at most 218 legal moves in a chess position.
+MAX_MOVES = 256
+
+
+def new_buffer(size: int = MAX_MOVES) -> array:
+    """Returns a buffer for Board.generate, which holds the moves of any position with the default size."""
+    return array('H', bytes(2*size))
+
+
+def encode(frm: int, to: int, flags: int = QUIET) -> int:
+    """Returns the move from square frm to square to with the flags."""
+    return frm | to << 6 | flags << 12
+
+
+def from_square(code: int) -> int:
+    return code & 63
+
+
+def to_square(code: int) -> int:
+    return code >> 6 & 63
+
+
+def move_flags(code: int) -> int:
+    return code >> 12
+
+
+def is_capture(code: int) -> bool:
+    """True for captures, en passant and promotions with capture included."""
+    return bool(code >> 12 & CAPTURE)
+
+
+def promotion_kind(code: int) -> int:
+    """Returns the kind of the piece a pawn is promoted to (see pieces.KNIGHT, ...), -1 for other moves."""
+    return (code >> 12 & 3) + KNIGHT if code >> 12 & PROMOTION else -1
+
+
+def pack_move(move: Tuple[pieces.Position, ...]) -> int:
+    """Encodes a move (see Board.iter_moves) without a board, so the capture, double push and castling flags
+    are not set. A promotion is always set, Board.push promotes to a queen if the piece is missing."""
+    code = square(*move[0]) | square(*move[1]) << 6
+    if len(move) > 2 and move[2] is not None:
+        code |= (PROMOTION | move[2].kind - KNIGHT) << 12
+    return code
+
+
+def unpack_move(code: int) -> Tuple[pieces.Position, ...]:
+    """Decodes a move into the form of Board.iter_moves: (from, to) in normal coordinates, the class of the
+    piece as third element for promotions."""
+    move = POSITIONS[code & 63], POSITIONS[code >> 6 & 63]
+    if code >> 12 & PROMOTION:
+        return move + (PIECE_CLASSES[(code >> 12 & 3) + KNIGHT],)
+    return move
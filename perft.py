@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Perft (performance test) of the move generation.
+
+perft counts the leaf nodes of the tree of legal moves up to a given depth. Comparing the counts with the
+well known reference numbers is the standard way to check a move generator, and the nodes per second give
+a reproducible throughput number for every engine change.
+
+Usage:
+    python perft.py                          # runs the reference suite
+    python perft.py --bitboard --max-nodes 1000000
+    python perft.py --fen "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - -" --depth 4 --divide
+    python perft.py --bitboard --depth 5 --workers 8 --split-depth 2
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, List, Tuple, Union
+
+import pieces
+from board import Board
+from bitboard import BitBoard
+from bits import TEAM_INDEX, square
+from fen import LETTERS
+from misc import coord_to_chess
+from movecodes import new_buffer
+from transposition import TranspositionTable, EXACT
+
+# Reference positions with the number of leaf nodes for each depth.
+REFERENCE = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("illegal en passant, black", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+     {1: 18, 2: 92, 3: 1670, 4: 10138, 5: 185429}),
+    ("illegal en passant, white", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+     {1: 13, 2: 102, 3: 1266, 4: 10276, 5: 135655}),
+    ("en passant gives check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+     {1: 15, 2: 126, 3: 1928, 4: 13931}),
+    ("double check", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+     {1: 37, 2: 183, 3: 6559, 4: 23527, 5: 811573}),
+    ("self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1",
+     {1: 2, 2: 6, 3: 13, 4: 63}),
+    ("discovered check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1",
+     {1: 29, 2: 165, 3: 5160}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("castling rights", "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1",
+     {1: 26, 2: 568, 3: 13744, 4: 314346}),
+    ("promotions", "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+     {1: 24, 2: 496, 3: 9483, 4: 182838}),
+]
+_FILES, _RANKS = 'abcdefgh', '12345678'
+
+def encode(board: Board) -> Tuple[bytes, int, int, int]:
+    """Encodes the position compactly, such that it can be sent to another process instead of pickling the
+    board.
+
+    Returns:
+        Tuple[bytes, int, int, int]: The piece code of every square (see pieces.FLYWEIGHTS), the team to move,
+            the en passant square (-1 if there is none) and the castling rights, as taken by Board.set_position.
+    """
+    ep = board.en_passant[0]
+    return bytes(board.squares), TEAM_INDEX[str(board.turn)], -1 if ep is None else square(*ep), board.castling
+
+
+def decode(code: Tuple[bytes, int, int, int], bitboard: bool = False) -> Board:
+    """Creates a board from a position encoded with encode."""
+    board = Board(bitboard=bitboard)
+    board.set_position(*code)
+    return board
+
+
+def _team(board: Board) -> str:
+    return str(board.turn)
+
+
+# The move buffers of perft, one for every depth. Every thread has its own, perft may run in several threads at
+# once (e.g. in the threads of the game server).
+_local = threading.local()
+
+
+def perft(board: Board, depth: int, team: str = None, table: TranspositionTable = None) -> int:
+    """Counts the leaf nodes of the tree of legal moves with the given depth.
+
+    Args:
+        board (Board): The position to start from. It is restored after the count.
+        depth (int): The depth of the tree.
+        team (str, optional): The team to move, 'w' or 'b'. Defaults to the team to move of the board.
+        table (TranspositionTable, optional): Caches the counts of the subtrees, the positions reached by
+            different move orders are counted only once. Defaults to None.
+
+    Returns:
+        int: The number of leaf nodes.
+    """
+    if team is None:
+        team = _team(board)
+    if depth == 0:
+        return 1
+    if table is not None and depth > 1:
+        entry = table.probe(board.zobrist)
+        if entry is not None and entry.depth == depth:
+            return entry.score
+    if depth == 1:
+        # Bulk counting, the leaves do not have to be made.
+        return board.count_moves(team)
+    # The moves are written into one buffer per depth, which is reused by all the nodes of the depth.
+    buffers = getattr(_local, 'buffers', None)
+    if buffers is None:
+        buffers = _local.buffers = []
+    while len(buffers) < depth:
+        buffers.append(new_buffer())
+    moves = buffers[depth - 1]
+    n = board.generate(moves, team)
+    other = 'b' if team == 'w' else 'w'
+    nodes = 0
+    for i in range(n):
+        board.push(moves[i])
+        nodes += perft(board, depth - 1, other, table)
+        board.pop()
+    if table is not None and nodes < 2**31:
+        table.store(board.zobrist, depth, EXACT, nodes)
+    return nodes
+
+
+def divide(board: Board, depth: int) -> Dict[Tuple[pieces.Position, ...], int]:
+    """Counts the leaf nodes of the tree of the given depth separately for each move of the root.
+
+    Raises:
+        ValueError: If depth is smaller than 1, there is no move of the root then.
+
+    Returns:
+        Dict[Tuple[Position, ...], int]: Maps every legal move (see Board.iter_moves) to the leaf nodes below it.
+    """
+    if depth < 1:
+        raise ValueError(f"divide needs a depth of 1 at least, not {depth}.")
+    team = _team(board)
+    other = 'b' if team == 'w' else 'w'
+    result = dict()
+    for move in board.iter_moves(team):
+        board.push(move)
+        result[move] = perft(board, depth - 1, other)
+        board.pop()
+    return result
+
+
+def _perft_task(code: Tuple[bytes, int, int, int], depth: int, bitboard: bool) -> int:
+    """Runs in a worker process."""
+    return perft(decode(code, bitboard), depth)
+
+
+def parallel_divide(board: Board, depth: int, workers: int = None,
+                    split_depth: int = 1) -> Dict[Tuple[pieces.Position, ...], int]:
+    """Same as divide, but the subtrees are counted in a pool of processes.
+
+    The tree is split at split_depth, every position at this depth is one task. Only the encoded
+    positions (see encode) are sent to the workers. The results are summed up in the order of the root
+    moves, so the result does not depend on the order in which the workers finish.
+
+    Args:
+        board (Board): The position to start from. The workers use the same engine as this board.
+        depth (int): The depth of the tree.
+        workers (int, optional): The number of processes. Defaults to the number of CPUs.
+        split_depth (int, optional): The depth at which the tree is split into tasks. A larger depth gives
+            more and smaller tasks, which balances the load better. Defaults to 1.
+
+    Returns:
+        Dict[Tuple[Position, Position], int]: Maps every legal move to the leaf nodes below it.
+    """
+    split_depth = max(1, min(split_depth, depth - 1))
+    if depth <= 1:
+        return divide(board, depth)
+    team = _team(board)
+    other = 'b' if team == 'w' else 'w'
+
+    # Collect the positions at the split depth together with the root move leading to them.
+    roots, codes = [], []
+
+    def collect(root, d, t):
+        if d == 0:
+            codes.append(encode(board))
+            roots.append(root)
+            return
+        for move in board.iter_moves(t):
+            board.push(move)
+            collect(root, d - 1, 'b' if t == 'w' else 'w')
+            board.pop()
+
+    result = dict()
+    for root in board.iter_moves(team):
+        result[root] = 0
+        board.push(root)
+        collect(root, split_depth - 1, other)
+        board.pop()
+
+    bitboard = isinstance(board, BitBoard)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        chunksize = max(1, len(codes) // (4*workers))
+        counts = pool.map(_perft_task, codes, repeat(depth - split_depth), repeat(bitboard), chunksize=chunksize)
+        for root, nodes in zip(roots, counts):
+            result[root] += nodes
+    return result
+
+
+def parallel_perft(board: Board, depth: int, workers: int = None, split_depth: int = 1) -> int:
+    """Same as perft, but the subtrees are counted in a pool of processes, see parallel_divide."""
+    if depth <= 1:
+        return perft(board, depth)
+    return sum(parallel_divide(board, depth, workers, split_depth).values())
+
+
+def move_name(move: Tuple[pieces.Position, ...]) -> str:
+    """Returns the move in coordinate notation, e.g. 'e2e4' or 'e7e8q'."""
+    name = "".join(f"{c}{r}" for c, r in (coord_to_chess(*move[0]), coord_to_chess(*move[1])))
+    if len(move) > 2 and move[2] is not None:
+        name += LETTERS[move[2].kind + 7]
+    return name
+
+
+def parse_move(name: str) -> Tuple[pieces.Position, ...]:
+    """Returns the move of the coordinate notation, the inverse of move_name. It is not checked whether the
+    move is legal.
+
+    Raises:
+        ValueError: If name is not a move in coordinate notation.
+    """
+    if (len(name) not in (4, 5) or name[0] not in _FILES or name[2] not in _FILES or name[1] not in _RANKS
+            or name[3] not in _RANKS or (len(name) == 5 and name[4] not in 'nbrq')):
+        raise ValueError(f"{name!r} is not a move in coordinate notation.")
+    move = (_FILES.index(name[0]), int(name[1]) - 1), (_FILES.index(name[2]), int(name[3]) - 1)
+    if len(name) == 5:
+        return move + (pieces.PIECE_CLASSES[LETTERS.index(name[4]) - 7],)
+    return move
+
+
+def benchmark(board: Board, depth: int, verbose: bool = True, workers: int = 0,
+              split_depth: int = 1) -> List[Tuple[int, int, float]]:
+    """Runs perft for every depth up to the given depth and measures the time.
+
+    Args:
+        workers (int, optional): Number of processes for parallel_perft, 0 counts in this process. Defaults to 0.
+        split_depth (int, optional): See parallel_divide. Defaults to 1.
+
+    Returns:
+        List[Tuple[int, int, float]]: The depth, the number of nodes and the time in seconds for each depth.
+    """
+    results = []
+    for d in range(1, depth + 1):
+        t = time.perf_counter()
+        nodes = parallel_perft(board, d, workers, split_depth) if workers else perft(board, d)
+        t = time.perf_counter() - t
+        results.append((d, nodes, t))
+        if verbose:
+            print(f"depth {d:2d} {nodes:12d} nodes {t:9.3f} s {nodes / max(t, 1e-9):12.0f} nodes/s")
+    return results
+
+
+def run_suite(max_nodes: int = 200000, bitboard: bool = False, verbose: bool = True, hash_mb: float = 0) -> bool:
+    """Checks the reference positions for every depth with at most max_nodes nodes. With hash_mb the counts
+    are cached in a transposition table of this size (see perft), a new one for every count.
+
+    Returns:
+        bool: True if all the counts are correct.
+    """
+    ok = True
+    total_nodes, total_time = 0, 0.
+    for name, fen, counts in REFERENCE:
+        for depth, expected in counts.items():
+            if expected > max_nodes:
+                break
+            board = Board.from_fen(fen, bitboard)
+            table = TranspositionTable(hash_mb) if hash_mb else None
+            t = time.perf_counter()
+            nodes = perft(board, depth, table=table)
+            t = time.perf_counter() - t
+            total_nodes += nodes
+            total_time += t
+            ok &= nodes == expected
+            if verbose:
+                status = "ok" if nodes == expected else f"FAILED, expected {expected}"
+                print(f"{name:28s} depth {depth} {nodes:10d} nodes {t:8.3f} s  {status}")
+    if verbose:
+        print(f"{total_nodes} nodes in {total_time:.3f} s, {total_nodes / max(total_time, 1e-9):.0f} nodes/s")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft of the move generation.")
+    parser.add_argument("--fen", help="Position to count, the reference suite is run if not given.")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="Print the nodes of every root move.")
+    parser.add_argument("--bitboard", action="store_true", help="Use the bitboard engine.")
+    parser.add_argument("--max-nodes", type=int, default=200000,
+                        help="Largest reference count of the suite which is checked.")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Count the subtrees in this many processes (0 counts in this process).")
+    parser.add_argument("--split-depth", type=int, default=1, help="Depth at which the tree is split into tasks.")
+    parser.add_argument("--hash", type=float, default=0, help="Cache the counts of the suite in a table of this many MB.")
+    args = parser.parse_args(argv)
+
+    if args.fen is None:
+        return 0 if run_suite(args.max_nodes, args.bitboard, hash_mb=args.hash) else 1
+    board = Board.from_fen(args.fen, args.bitboard)
+    if args.divide:
+        t = time.perf_counter()
+        if args.workers:
+            result = parallel_divide(board, args.depth, args.workers, args.split_depth)
+        else:
+            result = divide(board, args.depth)
+        t = time.perf_counter() - t
+        for name, nodes in sorted((move_name(move), nodes) for move, nodes in result.items()):
+            print(f"{name}: {nodes}")
+        total = sum(result.values())
+        print(f"\n{len(result)} moves, {total} nodes, {t:.3f} s, {total / max(t, 1e-9):.0f} nodes/s")
+    else:
+        benchmark(board, args.depth, workers=args.workers, split_depth=args.split_depth)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming reader of games in the Portable Game Notation (PGN).
+
+The games are read line by line and handed out one after another, so only the current game is held in
+memory, no matter how large the file is. The moves in standard algebraic notation (SAN) are resolved
+against Board.legal_moves and replayed with Board.move. For large files the replay can be spread over a
+pool of processes, the games are sent to the workers in chunks and only a bounded number of chunks is in
+flight at any time.
+
+Usage:
+    python pgn.py games.pgn                   # replays all games and reports games/s
+    python pgn.py games.pgn.gz --bitboard --workers 8 --chunk-size 64
+"""
+
+import argparse
+import bz2
+import gzip
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import pieces
+from board import Board
+from bits import TEAM_INDEX, square
+from fen import START_FEN
+from misc import c2n, coord_to_chess
+from pieces import PIECE_CLASSES, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+_TOKEN = re.compile(r"[{}();]|[^\s{}();]+")
+_TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+_MOVE_NUMBER = re.compile(r"^\d+\.+")
+_SAN = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?[+#!?]*$")
+_SAN_KINDS = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+
+
+class Game(NamedTuple):
+    """A game as it is read from the PGN, the moves are not checked yet."""
+    headers: Dict[str, str]
+    moves: List[str]  # The moves in SAN, without move numbers, comments and variations.
+    result: str
+
+
+def _open(source: Union[str, os.PathLike, Iterable[str]]) -> Iterable[str]:
+    if not isinstance(source, (str, os.PathLike)):
+        return source
+    path = os.fspath(source)
+    opener = gzip.open if path.endswith('.gz') else bz2.open if path.endswith('.bz2') else open
+    return opener(path, 'rt', encoding='utf-8', errors='replace')
+
+
+def read_games(source: Union[str, os.PathLike, Iterable[str]]) -> Iterator[Game]:
+    """Yields the games of a PGN one after another. Comments, variations, annotation glyphs and move numbers
+    are skipped.
+
+    Args:
+        source (Union[str, PathLike, Iterable[str]]): The path of the PGN file (.gz and .bz2 are decompressed
+            on the fly) or the lines of a PGN, e.g. an open file.
+
+    Returns:
+        Iterator[Game]: The games in the order of the PGN.
+    """
+    lines = _open(source)
+    headers, moves, result = dict(), [], '*'
+    movetext = False  # Whether the movetext of the current game started.
+    comment, depth = False, 0  # Inside a {comment} and the depth of the (variations).
+    try:
+        for line in lines:
+            line = line.strip()
+            if not comment and depth == 0 and line.startswith('['):
+                if movetext:
+                    yield Game(headers, moves, result)
+                    headers, moves, result, movetext = dict(), [], '*', False
+                tag = _TAG.match(line)
+                if tag:
+                    headers[tag.group(1)] = tag.group(2).replace('\\"', '"').replace('\\\\', '\\')
+                continue
+            if not line or line[0] == '%':
+                continue
+            movetext = True
+            for token in _TOKEN.findall(line):
+                if comment:
+                    comment = token != '}'
+                elif token == '{':
+                    comment = True
+                elif token == ';':
+                    break
+                elif token == '(':
+                    depth += 1
+                elif token == ')':
+                    depth = max(depth - 1, 0)
+                elif depth or token[0] == '$':
+                    continue
+                elif token in RESULTS:
+                    result = token
+                else:
+                    token = _MOVE_NUMBER.sub('', token)
+                    if token:
+                        moves.append(token)
+        if movetext or headers:
+            yield Game(headers, moves, result)
+    finally:
+        if lines is not source:
+            lines.close()
+
+
+def parse_san(board: Board, san: str, legal: Dict[pieces.Position, set] = None) -> Tuple[pieces.Position, ...]:
+    """Resolves a move in SAN (e.g. 'Nbd7', 'exd6', 'O-O' or 'e8=Q+') for the team which is to move.
+
+    Args:
+        board (Board): The position.
+        san (str): The move.
+        legal (Dict[Position, Set[Position]], optional): The legal moves of the team which is to move, if
+            they are already calculated. Defaults to None.
+
+    Raises:
+        ValueError: If the move is not valid SAN, illegal or ambiguous.
+
+    Returns:
+        Tuple[Position, ...]: The move as it is taken by Board.push, see Board.iter_moves.
+    """
+    if legal is None:
+        legal = board.legal_moves(board.turn)
+    if san.startswith(('O-O', '0-0')):
+        row = 7*TEAM_INDEX[str(board.turn)]
+        frm, to = (4, row), (2 if san.startswith(('O-O-O', '0-0-0')) else 6, row)
+        if to not in legal.get(frm, ()) or (board.squares[square(*frm)] - 1) % 6 != KING:
+            raise ValueError(f"{san} is not legal in {board.to_fen()}.")
+        return frm, to
+    match = _SAN.match(san)
+    if match is None:
+        raise ValueError(f"{san!r} is not a move in SAN.")
+    letter, file, rank, target, promotion = match.groups()
+    kind = _SAN_KINDS[letter] if letter else PAWN
+    to = c2n(target[0]), int(target[1]) - 1
+    candidates = [frm for frm, tos in legal.items()
+                  if to in tos and (board.squares[square(*frm)] - 1) % 6 == kind
+                  and (file is None or frm[0] == c2n(file)) and (rank is None or frm[1] == int(rank) - 1)]
+    if len(candidates) != 1:
+        raise ValueError(f"{san} is {'ambiguous' if candidates else 'not legal'} in {board.to_fen()}.")
+    if promotion:
+        return candidates[0], to, PIECE_CLASSES[_SAN_KINDS[promotion]]
+    return candidates[0], to
+
+
+def replay(game: Game, board: Board = None, bitboard: bool = False) -> Iterator[Board]:
+    """Replays the game with Board.move and yields the board after every ply.
+
+    The same board is yielded every time, so everything which is kept has to be taken from it before
+    the next ply (e.g. with to_fen).
+
+    Args:
+        game (Game): The game, it starts from the FEN header if there is one.
+        board (Board, optional): The board to reuse. Defaults to a new board.
+        bitboard (bool, optional): Whether a new board uses the bitboard engine. Defaults to False.
+
+    Raises:
+        ValueError: If a move cannot be resolved, see parse_san.
+    """
+    if board is None:
+        board = Board(bitboard=bitboard)
+    board.set_fen(game.headers.get('FEN', START_FEN))
+    for san in game.moves:
+        frm, to, *promotion = parse_san(board, san)
+        board.move(board[coord_to_chess(*frm)], to, *promotion)
+        yield board
+
+
+def iter_positions(source: Union[str, os.PathLike, Iterable[str]], features: Callable[[Board], Any] = Board.to_fen,
+                   bitboard: bool = False) -> Iterator[Tuple[int, int, Any]]:
+    """Yields the features of the position after every ply of every game of a PGN.
+
+    A game with a move which cannot be resolved is left at this move, the plies before are yielded.
+
+    Args:
+        source (Union[str, PathLike, Iterable[str]]): The PGN, see read_games.
+        features (Callable[[Board], Any], optional): Takes the board and returns what is yielded.
+            Defaults to Board.to_fen.
+        bitboard (bool, optional): Whether the bitboard engine is used. Defaults to False.
+
+    Returns:
+        Iterator[Tuple[int, int, Any]]: The index of the game, the ply (starting with 1) and the features.
+    """
+    board = Board(bitboard=bitboard)
+    for index, game in enumerate(read_games(source)):
+        for ply, position in enumerate(_resolved(game, board), 1):
+            yield index, ply, features(position)
+
+
+def _resolved(game: Game, board: Board, errors: List[str] = None) -> Iterator[Board]:
+    """Replays the game up to the first move which cannot be resolved, its message is appended to errors. Only
+    the moves are guarded, an error raised by the caller between the plies is not taken for a bad move."""
+    positions = replay(game, board)
+    while True:
+        try:
+            position = next(positions)
+        except StopIteration:
+            return
+        except ValueError as e:
+            if errors is not None:
+                errors.append(str(e))
+            return
+        yield position
+
+
+def _replay_games(games: Iterable[Game], features: Callable[[Board], Any],
+                  board: Board) -> Iterator[Tuple[Game, List[Any], Optional[str]]]:
+    for game in games:
+        errors = []
+        positions = [features(position) for position in _resolved(game, board, errors)]
+        yield game, positions, errors[0] if errors else None
+
+
+def _replay_chunk(games: List[Game], features: Callable[[Board], Any],
+                  bitboard: bool) -> List[Tuple[List[Any], Optional[str]]]:
+    """Runs in a worker process."""
+    return [(positions, error) for _, positions, error in _replay_games(games, features, Board(bitboard=bitboard))]
+
+
+def parallel_replay(source: Union[str, os.PathLike, Iterable[str]], features: Callable[[Board], Any] = Board.to_fen,
+                    workers: int = None, chunk_size: int = 64,
+                    bitboard: bool = False) -> Iterator[Tuple[Game, List[Any], Optional[str]]]:
+    """Replays the games of a PGN in a pool of processes.
+
+    The games are read in this process and sent to the workers in chunks of chunk_size games. At most two
+    chunks per worker are in flight, so the memory stays bounded however large the PGN is. The results are
+    yielded in the order of the games.
+
+    Args:
+        source (Union[str, PathLike, Iterable[str]]): The PGN, see read_games.
+        features (Callable[[Board], Any], optional): Takes the board after every ply and returns what is sent
+            back, it has to be picklable, e.g. a function of a module. Defaults to Board.to_fen.
+        workers (int, optional): The number of processes. Defaults to the number of CPUs.
+        chunk_size (int, optional): The number of games per task. Defaults to 64.
+        bitboard (bool, optional): Whether the bitboard engine is used. Defaults to False.
+
+    Returns:
+        Iterator[Tuple[Game, List[Any], Optional[str]]]: Every game with the features after every ply and the
+            error message if a move could not be resolved (None otherwise).
+    """
+    workers = workers or os.cpu_count() or 1
+    games = read_games(source)
+    pending = deque()
+    with ProcessPoolExecutor(workers) as pool:
+        while True:
+            while len(pending) < 2*workers:
+                chunk = list(islice(games, chunk_size))
+                if not chunk:
+                    break
+                pending.append((chunk, pool.submit(_replay_chunk, chunk, features, bitboard)))
+            if not pending:
+                return
+            chunk, future = pending.popleft()
+            for game, (positions, error) in zip(chunk, future.result()):
+                yield game, positions, error
+
+
+def _plies(board: Board) -> None:
+    """The features of the benchmark, nothing is sent back but the number of plies."""
+    return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replays the games of a PGN file and measures the throughput.")
+    parser.add_argument('pgn', help="The PGN file, .gz and .bz2 files are decompressed on the fly.")
+    parser.add_argument('--bitboard', action='store_true', help="Use the bitboard engine.")
+    parser.add_argument('--workers', type=int, default=0, help="Number of processes, 0 replays in this process.")
+    parser.add_argument('--chunk-size', type=int, default=64, help="Games per task sent to a worker.")
+    parser.add_argument('--report', type=int, default=1000, help="Print the throughput every this many games.")
+    args = parser.parse_args(argv)
+
+    if args.workers:
+        results = parallel_replay(args.pgn, _plies, args.workers, args.chunk_size, args.bitboard)
+    else:
+        results = _replay_games(read_games(args.pgn), _plies, Board(bitboard=args.bitboard))
+
+    games = plies = errors = 0
+    t = time.perf_counter()
+    for game, positions, error in results:
+        games += 1
+        plies += len(positions)
+        errors += error is not None
+        if args.report and games % args.report == 0:
+            dt = time.perf_counter() - t
+            print(f"{games} games, {plies} plies, {games / dt:.1f} games/s, {plies / dt:.0f} plies/s")
+    dt = max(time.perf_counter() - t, 1e-9)
+    print(f"{games} games ({errors} with errors), {plies} plies in {dt:.2f} s, "
+          f"{games / dt:.1f} games/s, {plies / dt:.0f} plies/s")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -5,10 +5,15 @@ Created on Thu Nov 24 20:26:50 2022
 @author: anton
 """
 
-from typing import Dict, List, Tuple, TypeVar, Union
+from typing import Dict, List, Mapping, Tuple, TypeVar, Union
 import copy
 
+import numpy as np
+
 from misc import chess_to_coord, coord_to_chess, ls2chess
+from bits import POSITIONS, TEAM_INDEX, square, to_mask, to_positions
+import sliders
+import tables
 
 Position = TypeVar('Position')
 
@@ -18,80 +23,173 @@ RAN8 = range(8) # evaluate this now for a little bit faster code.
 # Get the list of all valid directions.
 # It is based on the idea of https://stackoverflow.com/a/65637922
 positions = [(c, r) for c in RAN8 for r in RAN8]
-direction = dict()
 
 def valid(poss):
     """Filters out the not valid positions in poss. That is, the positions which are not on the board."""
     return [(c, r) for c, r in poss if c in RAN8 and r in RAN8]
 
-# Get all the possible base directions
-direction['up'] = {(c, r): valid((c, r+v) for v in RAN8[1:])
+
+# The names of the tables, the directions are lists of squares, MOVES are lists of rays (lists of squares)
+# per square except for the pawns.
+DIRECTIONS = ('up', 'down', 'right', 'left', 'upleft', 'downleft', 'upright', 'downright')
+MOVE_IDS = ('K', 'R', 'B', 'Q', 'Kn', 'wP', 'bP', 'wPtake', 'bPtake')
+_RAYS = ('K', 'R', 'B', 'Q', 'Kn')
+_TABLE_NAMES = DIRECTIONS + MOVE_IDS
+# The version of the cached arrays (see tables.py), increase it when the tables change.
+VERSION = 1
+
+
+def _build_lists():
+    """Builds the tables as dictionaries of lists, direction[name][position] and MOVES[id][position]."""
+    direction = dict()
+    # Get all the possible base directions
+    direction['up'] = {(c, r): valid((c, r+v) for v in RAN8[1:])
+                       for c, r in positions}
+    direction['down'] = {(c, r): valid((c, r-v) for v in RAN8[1:])
+                         for c, r in positions}
+    direction['right'] = {(c, r): valid((c+v, r)
+                                        for v in RAN8[1:]) for c, r in positions}
+    direction['left'] = {(c, r): valid((c-v, r) for v in RAN8[1:])
+                         for c, r in positions}
+    direction['upleft'] = {(c, r): valid((c_, r_) for (_, r_), (c_, _) in zip(
+        direction['up'][c, r], direction['left'][c, r])) for c, r in positions}
+    direction['downleft'] = {(c, r): valid((c_, r_) for (_, r_), (c_, _) in zip(
+        direction['down'][c, r], direction['left'][c, r])) for c, r in positions}
+    direction['upright'] = {(c, r): valid((c_, r_) for (_, r_), (c_, _) in zip(
+        direction['up'][c, r], direction['right'][c, r])) for c, r in positions}
+    direction['downright'] = {(c, r): valid((c_, r_) for (_, r_), (c_, _) in zip(
+        direction['down'][c, r], direction['right'][c, r])) for c, r in positions}
+    MOVES = dict()
+    # moves of king
+    MOVES['K'] = {(c, r): [valid([(c+v, r+h)]) for v in (-1, 0, 1)
+                           for h in (-1, 0, 1) if v != 0 or h != 0] for c, r in positions}
+    # moves of rook
+    MOVES['R'] = {(c, r): [direction['up'][c, r], direction['right'][c, r],
+                           direction['down'][c, r], direction['left'][c, r]] for c, r in positions}
+    # moves of bishop
+    MOVES['B'] = {(c, r): [direction['upleft'][c, r], direction['upright'][c, r],
+                           direction['downright'][c, r], direction['downleft'][c, r]] for c, r in positions}
+    # moves of queen
+    MOVES['Q'] = {(c, r): MOVES['R'][c, r] + MOVES['B'][c, r]
+                  for c, r in positions}
+    # moves of knight
+    MOVES['Kn'] = {(c, r): [valid([(c+v, r+h)]) for v, h in [(2, 1), (2, -1), (1, 2),
+                                                          (1, -2), (-2, 1), (-2, -1), (-1, 2), (-1, -2)]] for c, r in positions}
+    # moves of white pawn
+    MOVES['wP'] = {(c, r): [valid([(c, r+1)])*(r < 7), [(c, r+2)]*(r == 1)]
+                   for c, r in positions}
+    # moves of black pawn
+    MOVES['bP'] = {(c, r): [valid([(c, r-1)])*(r > 0), [(c, r-2)]*(r == 6)]
                    for c, r in positions}
-direction['down'] = {(c, r): valid((c, r-v) for v in RAN8[1:])
-                     for c, r in positions}
-direction['right'] = {(c, r): valid((c+v, r)
-                                    for v in RAN8[1:]) for c, r in positions}
-direction['left'] = {(c, r): valid((c-v, r) for v in RAN8[1:])
-                     for c, r in positions}
-direction['upleft'] = {(c, r): valid((c_, r_) for (_, r_), (c_, _) in zip(
-    direction['up'][c, r], direction['left'][c, r])) for c, r in positions}
-direction['downleft'] = {(c, r): valid((c_, r_) for (_, r_), (c_, _) in zip(
-    direction['down'][c, r], direction['left'][c, r])) for c, r in positions}
-direction['upright'] = {(c, r): valid((c_, r_) for (_, r_), (c_, _) in zip(
-    direction['up'][c, r], direction['right'][c, r])) for c, r in positions}
-direction['downright'] = {(c, r): valid((c_, r_) for (_, r_), (c_, _) in zip(
-    direction['down'][c, r], direction['right'][c, r])) for c, r in positions}
-MOVES = dict()
-# moves of king
-MOVES['K'] = {(c, r): [valid([(c+v, r+h)]) for v in (-1, 0, 1)
-                       for h in (-1, 0, 1) if v != 0 or h != 0] for c, r in positions}
-# moves of rook
-MOVES['R'] = {(c, r): [direction['up'][c, r], direction['right'][c, r],
-                       direction['down'][c, r], direction['left'][c, r]] for c, r in positions}
-# moves of bishop
-MOVES['B'] = {(c, r): [direction['upleft'][c, r], direction['upright'][c, r],
-                       direction['downright'][c, r], direction['downleft'][c, r]] for c, r in positions}
-# moves of queen
-MOVES['Q'] = {(c, r): MOVES['R'][c, r] + MOVES['B'][c, r]
-              for c, r in positions}
-# moves of knight
-MOVES['Kn'] = {(c, r): [valid([(c+v, r+h)]) for v, h in [(2, 1), (2, -1), (1, 2),
-                                                      (1, -2), (-2, 1), (-2, -1), (-1, 2), (-1, -2)]] for c, r in positions}
-# moves of white pawn
-MOVES['wP'] = {(c, r): [valid([(c, r+1)])*(r < 7), [(c, r+2)]*(r == 1)]
-               for c, r in positions}
-# moves of black pawn
-MOVES['bP'] = {(c, r): [valid([(c, r-1)])*(r > 0), [(c, r-2)]*(r == 6)]
-               for c, r in positions}
-
-# Flatten the movesets of the pawns.
-for pos in MOVES['wP']: 
-    lss = MOVES['wP'][pos]
-    MOVES['wP'][pos] = [l for ls in lss for l in ls]
-
-for pos in MOVES['bP']: 
-    lss = MOVES['bP'][pos]
-    MOVES['bP'][pos] = [l for ls in lss for l in ls]
-    
-# moves of white pawn take
-MOVES['wPtake'] = {(c, r): valid([(c+1, r+1), (c-1, r+1)]*(r > 0))
-                   for r, c in positions}
-# moves of black pawn take
-MOVES['bPtake'] = {(c, r): valid([(c+1, r-1), (c-1, r-1)]*(r < 7))
-                   for r, c in positions}
 
-# TODO Castle
+    # Flatten the movesets of the pawns.
+    for pos in MOVES['wP']:
+        lss = MOVES['wP'][pos]
+        MOVES['wP'][pos] = [l for ls in lss for l in ls]
+
+    for pos in MOVES['bP']:
+        lss = MOVES['bP'][pos]
+        MOVES['bP'][pos] = [l for ls in lss for l in ls]
+
+    # moves of white pawn take
+    # These are also used to find the pawns which attack a king, so they are defined on the back rows too.
+    MOVES['wPtake'] = {(c, r): valid([(c+1, r+1), (c-1, r+1)])
+                       for c, r in positions}
+    # moves of black pawn take
+    MOVES['bPtake'] = {(c, r): valid([(c+1, r-1), (c-1, r-1)])
+                       for c, r in positions}
+
+    return direction, MOVES
+
+
+def _build_arrays() -> Dict[str, np.ndarray]:
+    """Flattens the tables into arrays of indices: the squares of all rays one after another, the ray r is
+    squares[rays[r]:rays[r + 1]] and the rays of the square sq in the table t (the index in _TABLE_NAMES)
+    are the rays from starts[64*t + sq] to starts[64*t + sq + 1]."""
+    direction, moves = _build_lists()
+    squares, rays, starts = [], [0], [0]
+    for name in _TABLE_NAMES:
+        table = direction[name] if name in DIRECTIONS else moves[name]
+        for position in POSITIONS:
+            for ray in (table[position] if name in _RAYS else [table[position]]):
+                squares.extend(square(*p) for p in ray)
+                rays.append(len(squares))
+            starts.append(len(rays) - 1)
+    return {'squares': np.array(squares, np.uint8), 'rays': np.array(rays, np.uint32),
+            'starts': np.array(starts, np.uint32)}
+
+
+class _Tables(Mapping):
+    """The tables as read-only dictionaries of lists by their names. The dictionary of a table is made from the
+    cached arrays when it is used first, so a process which does not use them (e.g. the bitboard engine)
+    keeps only the mapped arrays. The dictionaries are private to the process (about 0.4 MB for all)."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], names: Tuple[str, ...]):
+        self._arrays = arrays
+        self._names = names
+        self._tables = dict()
+        self._lists = None
+
+    def __getitem__(self, name: str) -> Dict[Position, list]:
+        table = self._tables.get(name)
+        if table is None:
+            t = _TABLE_NAMES.index(name) if name in self._names else -1
+            if t < 0:
+                raise KeyError(name)
+            if self._lists is None:
+                self._lists = ([POSITIONS[sq] for sq in self._arrays['squares'].tolist()],
+                               self._arrays['rays'].tolist(), self._arrays['starts'].tolist())
+            squares, rays, starts = self._lists
+            table = dict()
+            # The old tables were filled column by column.
+            for position in positions:
+                i = 64*t + square(*position)
+                lists = [squares[rays[r]:rays[r + 1]] for r in range(starts[i], starts[i + 1])]
+                table[position] = lists if name in _RAYS else lists[0]
+            self._tables[name] = table
+        return table
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+_arrays = tables.cached_arrays('pieces', VERSION, _build_arrays)
+direction: Mapping[str, Dict[Position, List[Position]]] = _Tables(_arrays, DIRECTIONS)
+MOVES: Mapping[str, Dict[Position, list]] = _Tables(_arrays, MOVE_IDS)
+
+# The kinds of pieces, in the order used to index tables by piece. The index of a piece is 6*team + kind,
+# where white is team 0 and black team 1.
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
 
 
 class Team:
-    def __init__(self, team):
-        if not isinstance(team, Team):
+    """One of the two teams. There are only two instances, Team('w') and Team('b'), every call of the
+    constructor returns one of them. Hence teams are immutable and compared by identity.
+    """
+    __slots__ = ('team',)
+    _instances = dict()
+
+    def __new__(cls, team):
+        if isinstance(team, Team):
+            return team
+        instance = cls._instances.get(team)
+        if instance is None:
             assert team in (
                 'w', 'b'), "team should be w (for white) or b (for black)."
-        self.team = team
+            instance = super().__new__(cls)
+            object.__setattr__(instance, 'team', team)
+            cls._instances[team] = instance
+        return instance
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable.")
 
-    def __eq__(self, __o: object) -> bool:
-        return isinstance(__o, Team) and self.team == __o.team
+    def __reduce__(self):
+        # Unpickling (e.g. in a worker process) returns the interned instance again.
+        return Team, (self.team,)
 
     def other_team(self):
         """Returns the other team of the given team
@@ -104,23 +202,45 @@ class Team:
 
     def __str__(self) -> str:
         return str(self.team)
-    
-    def __hash__(self) -> int:
-        return hash(self.team)
-    
+
     def __invert__ (self):
         return Team('w') if self.team == 'b' else Team('b')
 
 
 class Piece:
     """Implementation class for a chess piece.
-    """
 
-    def __init__(self, team, id, position: Position) -> None:
-        self.team: Team = team
-        self.id: str = id
-        self.position: Position = position
-        self.move_set: Dict[Position, List[Position]] = None
+    Pieces are immutable flyweights: a piece is the value (kind, team, position) and every value exists only
+    once, the constructor returns the interned instance. The board does not store the pieces but a code per
+    square (see piece_code) and hands out the interned pieces when asked, so moving a piece does not change
+    the piece object, board[new_position] is the moved piece.
+    """
+    __slots__ = ('team', 'position', 'code')
+    _interned = dict()
+
+    id: str = None  # The id of the kind of piece, set by the subclasses.
+    kind: int = None  # The kind of piece (PAWN, ..., KING), set by the subclasses.
+    icons: Tuple[str, str] = None  # The white and black unicode symbol, set by the subclasses.
+
+    def __new__(cls, team: Union[str, Team], position: Position):
+        team = Team(team)
+        position = tuple(position)
+        piece = Piece._interned.get((cls, team, position))
+        if piece is None:
+            if len(valid([position])) != 1:
+                raise ValueError(f"position is not valid, {position=}.")
+            piece = super().__new__(cls)
+            object.__setattr__(piece, 'team', team)
+            object.__setattr__(piece, 'position', position)
+            object.__setattr__(piece, 'code', 6*TEAM_INDEX[team.team] + cls.kind + 1)
+            Piece._interned[cls, team, position] = piece
+        return piece
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable, move it on the board instead.")
+
+    def __reduce__(self):
+        return type(self), (self.team.team, self.position)
 
     def __repr__(self) -> str:
         return f"{type(self).__name__}(team={self.team}, position={self.position})"
@@ -128,31 +248,21 @@ class Piece:
     def __str__(self) -> str:
         return f"{self.team}{self.id}"
 
-    def _def_move_set(self, id):
-        self.move_set = MOVES[id]
-        return self.move_set
+    @property
+    def move_set(self) -> Dict[Position, List[List[Position]]]:
+        return MOVES[self.id]
 
-    def __eq__(self, __o: object) -> bool:
-        """Two pieces are the same if they are on the same position, have the same id (= chess piece) and are on the same team"""
-        return isinstance(__o, self.__class__) and (self.id == __o.id and self.position == __o.position and self.team == __o.team)
-    
-    def set_position(self, position):
-        """Sets a new position of the piece. 
-        Checks if the position is valid. It should be a coordinate. That is (7,7) instead of ('h', 8)
+    @property
+    def icon_text(self) -> str:
+        return self.icons[TEAM_INDEX[self.team.team]]
 
-        Args:
-            position (Position): A position which the piece should take. Trows an error if the position is not valid.
+    def at(self, position: Position) -> 'Piece':
+        """Returns the same piece (kind and team) on another position. Checks if the position is valid.
+        It should be a coordinate. That is (7,7) instead of ('h', 8)
         """
-        if len(valid([position])) != 1:
-            raise ValueError(f"position is not valid, {position=}.")
-        self.position = position
-
-    def destroy(self):
-        """Removes the piece by setting the position to None"""
-        self.team = None
-        self.position = None
+        return type(self)(self.team, position)
 
-    def danger_zone(self, pieces, calc_move = False):
+    def danger_zone(self, pieces, calc_move = False, occupancy=None):
         """Returns the positions to which this piece can move, that is, all positions that are threatened.
         A dictionary of pieces must be given and a set of positions is returned.
         A pin is not considered into this as this is mainly interesting for checks.
@@ -163,7 +273,8 @@ class Piece:
         Args:
             pieces (Dict[Position, Piece]): A dictionary mapping positions to pieces.
             calc_move (bool): Determines if a move should be calculated instead of the danger zone (excludes the pieces of the own team.). Defaults to False
-            
+            occupancy (int, optional): The mask of the occupied squares, see bits.to_mask. Only the sliding pieces
+                use it, if it is not given it is calculated from pieces. Defaults to None.
 
         Returns:
             Set[Position]: The part of the board reached by the influence of the current piece. 
@@ -200,7 +311,7 @@ class Piece:
         Returns:
             Set[Position]: A set of positions the piece can move to.
         """
-        return self.danger_zone(pieces, calc_move=True)
+        return self.danger_zone(pieces, calc_move=True, occupancy=kwargs.get('occupancy'))
     
     def clegal_moves(self, pieces):
         lmoves, enemies = self.get_moves(pieces)
@@ -214,21 +325,56 @@ class Piece:
         return coord_to_chess(*self.position)
 
 
-class King(Piece):
-    # TODO Castle.
-    def __init__(self, team: Union[str, Team], position: Tuple[int, int] = None) -> None:
-        if position is None:
-            if self.team == 'w':
-                position = (0, 4)
-            else:
-                position = (7, 4)
-        self.position = position
-        super().__init__(Team(team), 'K', position)
+class SlidingPiece(Piece):
+    """Base class of the rook, bishop and queen. The attacks are looked up in the precomputed tables
+    of the sliders module instead of walking along the rays.
+    """
+    __slots__ = ()
+    attacks = None  # The lookup function of the sliders module, set by the subclasses.
+
+    def danger_zone(self, pieces, calc_move=False, occupancy=None):
+        """Returns the positions to which this piece can move, that is, all positions that are threatened.
+        See Piece.danger_zone, the result is the same.
+
+        Args:
+            pieces (Dict[Position, Piece]): A dictionary mapping positions to pieces.
+            calc_move (bool): Determines if a move should be calculated instead of the danger zone (excludes the pieces of the own team.). Defaults to False
+            occupancy (int, optional): The mask of the occupied squares. Calculated from pieces if not given. Defaults to None.
+
+        Returns:
+            Set[Position]: The part of the board reached by the influence of the current piece.
+        """
+        if occupancy is None:
+            occupancy = to_mask(pieces)
+        sq = square(*self.position)
+        attacks = self.attacks(sq, occupancy)
+        # Only the blockers have to be looked at.
+        blockers = attacks & occupancy
+        while blockers:
+            b = blockers & -blockers
+            blockers ^= b
+            piece = pieces[POSITIONS[b.bit_length() - 1]]
+            if calc_move:
+                if piece.team == self.team:
+                    attacks ^= b
+            elif isinstance(piece, King) and piece.team != self.team:
+                # Ignore the enemy king when calculating the damage zone.
+                attacks = self.attacks(sq, occupancy ^ b)
+                break
+        return to_positions(attacks)
 
-        self.moved = False
-        self.move_set = self._def_move_set(self.id)
 
-        self.icon_text = '\u2654' if team == 'w' else '\u265A'
+class King(Piece):
+    # Castling is a move of the king by two fields, the board moves the rook along (see Board.legal_moves).
+    __slots__ = ()
+    id = 'K'
+    kind = KING
+    icons = ('\u2654', '\u265A')
+
+    def __new__(cls, team: Union[str, Team], position: Tuple[int, int] = None):
+        if position is None:
+            position = (4, 0) if str(team) == 'w' else (4, 7)
+        return super().__new__(cls, team, position)
 
     def check_pins(self, pieces):
         pinned = []
@@ -251,7 +397,9 @@ class King(Piece):
                         else:
                             tpiece = piece 
                     else: 
-                        possible_pin = True
+                        # Only a piece which moves along this direction can pin.
+                        slider = Rook if k in ('up', 'down', 'left', 'right') else Bishop
+                        possible_pin = isinstance(piece, (slider, Queen))
                         break
             if tpiece is not None and possible_pin:
                 pinned.append((tpiece, set(ms[:iidx+1])))
@@ -259,48 +407,46 @@ class King(Piece):
             
             
 
-class Queen(Piece):
-    def __init__(self, team: str, position: Tuple[int, int]) -> None:
-        super().__init__(Team(team), 'Q', position)
-        self.move_set = self._def_move_set(self.id)
-
-        self.icon_text = '\u2655' if team == 'w' else '\u265B'
-
-class Rook(Piece):
-
-    def __init__(self, team: str, position: Tuple[int, int]) -> None:
-        super().__init__(Team(team), 'R', position)
-        self.move_set = self._def_move_set(self.id)
+class Queen(SlidingPiece):
+    __slots__ = ()
+    id = 'Q'
+    kind = QUEEN
+    icons = ('\u2655', '\u265B')
+    attacks = staticmethod(sliders.queen_attacks)
 
-        self.icon_text = '\u2656' if team == 'w' else '\u265C'
+class Rook(SlidingPiece):
+    __slots__ = ()
+    id = 'R'
+    kind = ROOK
+    icons = ('\u2656', '\u265C')
+    attacks = staticmethod(sliders.rook_attacks)
 
-class Bishop(Piece):
-
-    def __init__(self, team: str, position: Tuple[int, int]) -> None:
-        super().__init__(Team(team), 'B', position)
-        self.move_set = self._def_move_set(self.id)
-
-        self.icon_text = '\u2657' if team == 'w' else '\u265D'
+class Bishop(SlidingPiece):
+    __slots__ = ()
+    id = 'B'
+    kind = BISHOP
+    icons = ('\u2657', '\u265D')
+    attacks = staticmethod(sliders.bishop_attacks)
 
 
 class Knight(Piece):
-
-    def __init__(self, team: str, position: Tuple[int, int]) -> None:
-        super().__init__(Team(team), 'Kn', position)
-        self.move_set = self._def_move_set(self.id)
-
-        self.icon_text = '\u2658' if team == 'w' else '\u265E'
+    __slots__ = ()
+    id = 'Kn'
+    kind = KNIGHT
+    icons = ('\u2658', '\u265E')
 
 
 class Pawn(Piece):
+    __slots__ = ()
+    id = 'P'
+    kind = PAWN
+    icons = ('\u2659', '\u265F')
 
-    def __init__(self, team: str, position: Tuple[int, int]) -> None:
-        super().__init__(Team(team), 'P', position)
-        self.move_set = self._def_move_set(f"{team}{self.id}")
+    @property
+    def move_set(self) -> Dict[Position, List[Position]]:
+        return MOVES[f"{self.team}{self.id}"]
 
-        self.icon_text = '\u2659' if team == 'w' else '\u265F'
-        
-    def danger_zone(self, pieces):
+    def danger_zone(self, pieces, **kwargs):
         """Generates the danger zone of the pawn as it has a rather unique set of movements.
         TODO En passant.
 
@@ -327,5 +473,21 @@ class Pawn(Piece):
                 # The pawn cannot move behind a piece which is right before it.
                 break
         return mset
-            
 
+
+# The ids and classes of the pieces by kind.
+KIND_IDS = ('P', 'Kn', 'B', 'R', 'Q', 'K')
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King)
+# The pieces a pawn can promote to.
+PROMOTIONS = (Queen, Rook, Bishop, Knight)
+
+
+def piece_index(piece: Piece) -> int:
+    """Returns the index (between 0 and 11) of the team and kind of the given piece."""
+    return piece.code - 1
+
+
+# The boards store a code per square, the index of the piece plus one, 0 marks an empty square.
+# FLYWEIGHTS[code][sq] is the interned piece with the code on the square sq.
+FLYWEIGHTS: List[List[Union[Piece, int]]] = [[0]*64] + [
+    [PIECE_CLASSES[idx % 6]('wb'[idx // 6], POSITIONS[sq]) for sq in range(64)] for idx in range(12)]
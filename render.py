@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Rendering of boards with matplotlib into a persistent figure.
+
+A BoardRenderer creates its figure, the image of the squares and one text artist per square once. Drawing
+a position only changes the artists of the squares whose piece or highlighting changed, so a sequence of
+positions (e.g. a replayed game) is rendered in one figure which is reused for every frame. The figure is
+not registered with pyplot, it is freed with the renderer and no figure is left behind per frame.
+
+Usage:
+    with BoardRenderer() as renderer:
+        renderer.export_frames(pgn.replay(game), 'frames')      # frames/frame_0000.png, ...
+        renderer.export_animation(pgn.replay(game), 'game.gif', fps=2)
+
+    python render.py games.pgn --game 3 --frames frames --animation game.gif
+"""
+
+import argparse
+import os
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox, TransformedBbox
+
+import pieces
+from bits import POSITIONS, BIT, iter_bits, to_mask
+from board import Board, Snapshot
+from diagram import ICONS
+from fen import START_FEN
+from misc import load_settings
+
+
+class BoardRenderer:
+    """Draws positions into one figure which is kept between the drawings.
+
+    Args:
+        settings (dict, optional): The settings with the colors, see settings.json. Defaults to the settings
+            next to this module, which are read once.
+        ax (matplotlib.axes.Axes, optional): The axes to draw into, e.g. of a pyplot figure which is shown.
+            Defaults to the axes of a new figure which is only used for exporting.
+        size (float, optional): The width and height of a new figure in inches, the glyphs of the pieces are
+            scaled with it (26 points for 6 inches). Defaults to 6.
+        dpi (int, optional): The resolution of the exported images. Defaults to 100.
+        title (str, optional): The title of the figure. Defaults to "Chess Board".
+    """
+
+    def __init__(self, settings: dict = None, ax=None, size: float = 6, dpi: int = 100,
+                 title: Optional[str] = "Chess Board"):
+        colors = (settings or load_settings())['colors']
+        # The colors of the squares: white, black, highlighted white and highlighted black.
+        self._palette = np.array([colors['white_field'], colors['black_field'], colors['white_highlighted'],
+                                  colors['black_highlighted']], dtype=float) / 255
+        self._piece_colors = (np.array(colors['white_pieces']) / 255, np.array(colors['black_pieces']) / 255)
+        if ax is None:
+            self.figure = Figure(figsize=(size, size), dpi=dpi)
+            FigureCanvasAgg(self.figure)
+            ax = self.figure.add_subplot(1, 1, 1)
+        else:
+            self.figure = ax.figure
+        self.ax = ax
+        self.dpi = dpi
+        if title:
+            self.figure.suptitle(title)
+
+        # The image has the eighth row on top, the square (col, row) is the pixel [7 - row, col].
+        self._parity = np.add.outer(range(8), range(8)) % 2
+        self._pixels = self._palette[self._parity]
+        self._image = ax.imshow(self._pixels)
+        ax.set_xticks(range(8))
+        ax.set_xticklabels(list("abcdefgh"))
+        ax.set_yticks(range(7, -1, -1))
+        ax.set_yticklabels(range(1, 9))
+        # A glyph is clipped to its square, so drawing a square again (see render) leaves nothing of the piece
+        # before on the squares around it.
+        self._texts = [ax.text(col - 0.45, 7 - row + 0.33, '', fontsize=26 * size / 6, clip_on=True,
+                               clip_box=TransformedBbox(Bbox.from_extents(col - 0.5, 6.5 - row, col + 0.5, 7.5 - row),
+                                                        ax.transData))
+                       for col, row in POSITIONS]
+        self._codes = bytearray(64)  # The piece codes shown on the squares.
+        self._highlighted = 0  # The mask of the highlighted squares.
+        self._dirty = 0  # The mask of the squares which changed since the last drawing, see render.
+        self._background = None  # The pixels of the figure without the pieces.
+        self._size = self._boxes = None
+
+    def __enter__(self) -> 'BoardRenderer':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Removes the artists, the renderer cannot be used afterwards."""
+        self.figure.clear()
+
+    def update(self, position: Union[Board, Snapshot], highlighted: Iterable[pieces.Position] = None) -> int:
+        """Changes the artists of the squares which differ from the position drawn before.
+
+        Args:
+            position (Union[Board, Snapshot]): The position to show.
+            highlighted (Iterable[Position], optional): The positions (col, row) of the squares to
+                highlight. Defaults to None.
+
+        Returns:
+            int: The number of squares which changed.
+        """
+        changed = 0
+        shown, texts = self._codes, self._texts
+        for sq, code in enumerate(position.squares):
+            if code != shown[sq]:
+                shown[sq] = code
+                texts[sq].set_text(ICONS[code])
+                if code:
+                    texts[sq].set_color(self._piece_colors[(code - 1) // 6])
+                self._dirty |= BIT[sq]
+                changed += 1
+        mask = to_mask(highlighted) if highlighted else 0
+        if mask != self._highlighted:
+            diff, self._highlighted = mask ^ self._highlighted, mask
+            for sq, (col, row) in enumerate(POSITIONS):
+                if diff & BIT[sq]:
+                    r = 7 - row
+                    self._pixels[r, col] = self._palette[self._parity[r, col] + (2 if mask & BIT[sq] else 0)]
+                    changed += 1
+            self._image.set_data(self._pixels)
+            self._background = None
+        return changed
+
+    def render(self, position: Union[Board, Snapshot] = None,
+               highlighted: Iterable[pieces.Position] = None) -> np.ndarray:
+        """Draws the figure, after updating it to the position if it is given.
+
+        Only the squares which changed since the last drawing are drawn again: the empty square is copied
+        from the background, which is drawn once without the pieces, and the glyph of the new piece is drawn
+        on top. The whole figure is only drawn when the highlighted squares or the size change.
+
+        Returns:
+            np.ndarray: The pixels of the figure as RGBA with the shape (height, width, 4). The array is the
+                buffer of the figure, it changes with the next drawing.
+        """
+        if position is not None:
+            self.update(position, highlighted)
+        canvas, ax = self.figure.canvas, self.ax
+        if self._background is None or self._size != canvas.get_width_height():
+            for text in self._texts:
+                text.set_visible(False)
+            canvas.draw()
+            self._background = canvas.copy_from_bbox(self.figure.bbox)
+            self._size = canvas.get_width_height()
+            # The squares in the pixels of the buffer, whose rows start at the top, to copy single squares
+            # from the background.
+            height = self._size[1]
+            corners = ax.transData.transform([(col - 0.5, 7 - row + 0.5) for col, row in POSITIONS])
+            ends = ax.transData.transform([(col + 0.5, 7 - row - 0.5) for col, row in POSITIONS])
+            self._boxes = [(int(x1), int(height - np.ceil(y2)), int(np.ceil(x2)), int(height - y1))
+                           for (x1, y1), (x2, y2) in zip(np.minimum(corners, ends), np.maximum(corners, ends))]
+            for text in self._texts:
+                text.set_visible(True)
+            dirty = sum(BIT[sq] for sq, code in enumerate(self._codes) if code)
+        else:
+            dirty = self._dirty
+            for sq in iter_bits(dirty):
+                # The position is the corner of the whole background, which is copied to where it was.
+                canvas.restore_region(self._background, self._boxes[sq], (0, 0))
+        for sq in iter_bits(dirty):
+            if self._codes[sq]:
+                ax.draw_artist(self._texts[sq])
+        self._dirty = 0
+        return np.asarray(canvas.buffer_rgba())
+
+    def save(self, path: Union[str, os.PathLike], position: Union[Board, Snapshot] = None,
+             highlighted: Iterable[pieces.Position] = None):
+        """Saves the figure as an image, e.g. a PNG, after updating it to the position if it is given."""
+        if position is not None:
+            self.update(position, highlighted)
+        self.figure.savefig(path, dpi=self.dpi)
+
+    def frames(self, positions: Iterable[Union[Board, Snapshot]]) -> Iterator[np.ndarray]:
+        """Yields the pixels of the figure for every position, see render. The same buffer is yielded every
+        time, so a frame has to be used before the next one."""
+        for position in positions:
+            yield self.render(position)
+
+    def export_frames(self, positions: Iterable[Union[Board, Snapshot]], directory: Union[str, os.PathLike],
+                      pattern: str = "frame_{:04d}.png") -> int:
+        """Saves an image for every position. The positions are rendered one at a time, so the memory does not
+        grow with their number, and positions may be a generator which reuses one board (e.g. pgn.replay).
+
+        Args:
+            positions (Iterable[Union[Board, Snapshot]]): The positions.
+            directory (Union[str, os.PathLike]): The directory of the images, it is created if it is missing.
+            pattern (str, optional): The file name of the images, formatted with the index of the position.
+                Defaults to "frame_{:04d}.png".
+
+        Returns:
+            int: The number of images.
+        """
+        from PIL import Image
+
+        os.makedirs(directory, exist_ok=True)
+        n = 0
+        for n, pixels in enumerate(self.frames(positions), 1):
+            Image.fromarray(pixels).save(os.path.join(directory, pattern.format(n - 1)))
+        return n
+
+    def export_animation(self, positions: Iterable[Union[Board, Snapshot]], path: Union[str, os.PathLike],
+                         fps: float = 2) -> int:
+        """Saves the positions as an animation, one frame per position.
+
+        A GIF is written with Pillow, which keeps the frames with a palette of 256 colors until the end, one
+        byte per pixel. The other formats (e.g. MP4) are streamed to ffmpeg with matplotlib, which has to be
+        installed.
+
+        Args:
+            positions (Iterable[Union[Board, Snapshot]]): The positions.
+            path (Union[str, os.PathLike]): The file of the animation, the format is taken from the suffix.
+            fps (float, optional): The frames per second. Defaults to 2.
+
+        Returns:
+            int: The number of frames.
+        """
+        count = 0
+        if str(path).lower().endswith('.gif'):
+            from PIL import Image
+
+            def palette_frames():
+                nonlocal count
+                for pixels in self.frames(positions):
+                    count += 1
+                    yield Image.fromarray(pixels).convert('RGB').quantize(256)
+
+            frames = palette_frames()
+            first = next(frames, None)
+            if first is not None:
+                first.save(path, save_all=True, append_images=frames, duration=int(1000 / fps), loop=0)
+            return count
+
+        from matplotlib.animation import FFMpegWriter
+
+        writer = FFMpegWriter(fps=fps)
+        with writer.saving(self.figure, path, self.dpi):
+            for position in positions:
+                self.update(position)
+                writer.grab_frame()
+                count += 1
+        return count
+
+
+def main(argv=None):
+    import pgn
+
+    parser = argparse.ArgumentParser(description="Renders the positions of a game of a PGN file.")
+    parser.add_argument('pgn', help="The PGN file.")
+    parser.add_argument('--game', type=int, default=0, help="The index of the game in the file.")
+    parser.add_argument('--frames', help="The directory for a PNG image of every position.")
+    parser.add_argument('--animation', help="The file of an animation of the game, e.g. game.gif.")
+    parser.add_argument('--fps', type=float, default=2, help="The frames per second of the animation.")
+    args = parser.parse_args(argv)
+    if not args.frames and not args.animation:
+        parser.error("Give --frames or --animation.")
+
+    for i, game in enumerate(pgn.read_games(args.pgn)):
+        if i == args.game:
+            break
+    else:
+        parser.error(f"The file has no game {args.game}.")
+
+    def positions():
+        yield Board.from_fen(game.headers.get('FEN', START_FEN)).snapshot()
+        yield from pgn.replay(game)
+
+    with BoardRenderer() as renderer:
+        if args.frames:
+            n = renderer.export_frames(positions(), args.frames)
+            print(f"{n} frames in {args.frames}")
+        if args.animation:
+            n = renderer.export_animation(positions(), args.animation, args.fps)
+            print(f"{n} frames in {args.animation}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Search for the best move of a position.
+
+Negamax with alpha-beta pruning and a quiescence search of the captures at the leaves, driven by iterative
+deepening: the position is searched to depth 1, 2, 3, ... until the depth, node or time budget is used up,
+and the result of the deepest finished iteration is returned. The moves are made and taken back with
+Board.push and Board.pop and ordered such that the cutoffs come early: the move of the principal variation
+of the previous iteration first, then the captures (most valuable victim, least valuable attacker), then the
+killer moves of the ply and then the quiet moves by their history score. The positions searched are kept in
+a transposition table (see transposition.TranspositionTable), which cuts off the positions reached again and
+gives the best move found before. With a tablebase (see tablebase.Tablebase) the endgames in it are not
+searched but looked up.
+
+Usage:
+    python search.py --fen "<fen>" --depth 5
+    python search.py --movetime 2 --bitboard
+"""
+
+import argparse
+import threading
+import time
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import pieces
+from board import Board
+from evaluation import VALUES
+from bits import square
+from fen import START_FEN
+from perft import move_name
+from pieces import PAWN
+from tablebase import Tablebase, MAX_PIECES
+from movecodes import pack_move, unpack_move
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+MATE = 100000
+INFINITY = MATE + 1
+MAX_PLY = 64
+# The scores beyond are mates, the distance to mate may come from the tablebases and exceed MAX_PLY.
+MATE_BOUND = MATE - 1024
+# How many nodes are searched between two looks at the clock.
+CHECK_EVERY = 1024
+
+_KILLER, _CAPTURE, _PV = 1 << 20, 1 << 21, 1 << 22
+
+
+class SearchResult(NamedTuple):
+    """The result of the deepest finished iteration."""
+    move: Optional[Tuple[pieces.Position, ...]]  # None if there is no legal move.
+    score: int  # In centipawns for the team to move, +-(MATE - plies) for a mate.
+    pv: List[Tuple[pieces.Position, ...]]
+    depth: int
+    nodes: int
+    time: float
+    nps: float
+
+    def info(self) -> str:
+        """The result as an info line of the Universal Chess Interface."""
+        if abs(self.score) >= MATE_BOUND:
+            plies = MATE - abs(self.score)
+            score = f"mate {(plies + 1) // 2 if self.score > 0 else -((plies + 1) // 2)}"
+        else:
+            score = f"cp {self.score}"
+        return (f"info depth {self.depth} score {score} nodes {self.nodes} nps {self.nps:.0f} "
+                f"time {self.time * 1000:.0f} pv {' '.join(move_name(m) for m in self.pv)}")
+
+
+def _to_table(score: int, ply: int) -> int:
+    """The mate scores count the plies from the root, in the table they count from the position."""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when the budget is used up or stop has been called."""
+
+
+class Search:
+    """The search of one board. The board is changed during the search and restored afterwards, the killer
+    moves, the history scores and the transposition table are kept from one search to the next.
+
+    Usage:
+        result = Search(board).run(depth=6, movetime=5.0)
+        board.push(result.move)
+    """
+
+    def __init__(self, board: Board, evaluate: Callable[[Board], int] = Board.evaluate,
+                 table: TranspositionTable = None, tablebase: Tablebase = None):
+        self.board = board
+        self.evaluate = evaluate
+        self.table = table if table is not None else TranspositionTable()
+        self.tablebase = tablebase
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[0]*64 for _ in range(13)]  # [code of the moving piece][target square]
+        self.nodes = 0
+        self.stopped = False
+        self._deadline = None
+        self._max_nodes = None
+        self._pv = [[] for _ in range(MAX_PLY + 1)]
+        self._previous_pv = []
+        # Set by run when it has taken its limits. A thread which starts a search in another thread waits for
+        # it before calling stop or set_movetime, which would be undone otherwise.
+        self.started = threading.Event()
+
+    def stop(self):
+        """Stops the search as soon as possible, e.g. from another thread: the flag is looked at in every node.
+        run returns the result of the deepest finished iteration."""
+        self.stopped = True
+
+    def set_movetime(self, movetime: Optional[float]):
+        """Limits the running search to movetime seconds from now (None removes the limit), e.g. from another
+        thread when pondering turns into the search of the own move."""
+        self._deadline = None if movetime is None else time.perf_counter() + movetime
+
+    def run(self, depth: int = MAX_PLY, movetime: float = None, nodes: int = None,
+            info: Callable[[SearchResult], None] = None) -> SearchResult:
+        """Searches the position with iterative deepening until one of the limits is reached.
+
+        Args:
+            depth (int, optional): The maximal depth. Defaults to MAX_PLY.
+            movetime (float, optional): The time in seconds. Defaults to None (no limit).
+            nodes (int, optional): The maximal number of nodes. Defaults to None (no limit).
+            info (Callable[[SearchResult], None], optional): Called with the result of every finished
+                iteration. Defaults to None.
+
+        Returns:
+            SearchResult: The result of the deepest finished iteration, of depth 1 at least if there is a
+                legal move.
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        self.stopped = False
+        self._deadline = None if movetime is None else start + movetime
+        self._max_nodes = nodes
+        self._previous_pv = []
+        self.table.new_search()
+        self.started.set()
+        depth = min(depth, MAX_PLY)
+        result = SearchResult(None, 0, [], 0, 0, 0.0, 0.0)
+        for d in range(1, depth + 1):
+            aborted = False
+            try:
+                score = self._negamax(d, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                # The moves are taken back in _negamax, the position is as it was.
+                if result.move is not None:
+                    break
+                # Without a finished iteration there is no move yet, finish depth 1 without limits.
+                self._deadline = self._max_nodes = None
+                self.stopped, aborted = False, True
+                score = self._negamax(1, -INFINITY, INFINITY, 0)
+                d = 1
+            elapsed = time.perf_counter() - start
+            pv = list(self._pv[0])
+            result = SearchResult(pv[0] if pv else None, score, pv, d, self.nodes, elapsed,
+                                  self.nodes / max(elapsed, 1e-9))
+            self._previous_pv = pv
+            if info is not None:
+                info(result)
+            if aborted or not pv or abs(score) >= MATE_BOUND:
+                break
+            # The next iteration takes several times as long, it would hardly finish in the remaining time.
+            if self._deadline is not None and time.perf_counter() + elapsed > self._deadline:
+                break
+            if self.stopped or (self._max_nodes is not None and self.nodes >= self._max_nodes):
+                break
+        return result
+
+    def _check_budget(self):
+        if self.stopped:
+            raise SearchAborted
+        if self._max_nodes is not None and self.nodes >= self._max_nodes:
+            raise SearchAborted
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchAborted
+
+    def _order(self, moves: List[Tuple[pieces.Position, ...]], ply: int,
+               hash_move: Tuple[pieces.Position, ...] = None) -> List[Tuple[pieces.Position, ...]]:
+        squares, board = self.board.squares, self.board
+        pv_move = self._previous_pv[ply] if ply < len(self._previous_pv) else None
+        killers = self.killers[ply]
+        history = self.history
+
+        def score(move):
+            if move == pv_move or move == hash_move:
+                return _PV
+            frm, to = square(*move[0]), square(*move[1])
+            code, victim = squares[frm], squares[to]
+            if victim or len(move) > 2 or ((code - 1) % 6 == PAWN and to == board._ep):
+                value = VALUES[(victim - 1) % 6] if victim else VALUES[PAWN] if len(move) < 3 else 0
+                if len(move) > 2:
+                    value += VALUES[move[2].kind]
+                return _CAPTURE + 16*value - VALUES[(code - 1) % 6] // 100
+            if move == killers[0] or move == killers[1]:
+                return _KILLER
+            return history[code][to]
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def _negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        # The flag of stop is cheap to read, it is looked at in every node, the clock only now and then.
+        if self.stopped or self.nodes % CHECK_EVERY == 0:
+            self._check_budget()
+        self._pv[ply] = []
+        board = self.board
+        if ply and self.tablebase is not None and board.occupied.bit_count() <= MAX_PIECES:
+            found = self.tablebase.probe(board)
+            if found is not None:
+                wdl, dtm = found
+                return wdl * (MATE - ply - dtm)
+        if depth <= 0 or ply >= MAX_PLY:
+            return self._quiescence(alpha, beta, ply)
+        key = board.zobrist
+        entry = self.table.probe(key)
+        hash_move = None
+        if entry is not None:
+            hash_move = unpack_move(entry.move) if entry.move else None
+            # The root is always searched, it has to give a move.
+            if ply and entry.depth >= depth:
+                score = _from_table(entry.score, ply)
+                if (entry.bound == EXACT or (entry.bound == LOWER and score >= beta)
+                        or (entry.bound == UPPER and score <= alpha)):
+                    return score
+        moves = list(board.iter_moves())
+        if not moves:
+            return -(MATE - ply) if board.is_check(board.turn) else 0
+        alpha0, best = alpha, None
+        for move in self._order(moves, ply, hash_move):
+            frm, to = square(*move[0]), square(*move[1])
+            code, quiet = board.squares[frm], not board.squares[to] and len(move) < 3
+            board.push(move)
+            try:
+                score = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if score > alpha:
+                alpha, best = score, move
+                self._pv[ply] = [move] + self._pv[ply + 1]
+                if alpha >= beta:
+                    if quiet:
+                        killers = self.killers[ply]
+                        if killers[0] != move:
+                            killers[1], killers[0] = killers[0], move
+                        self.history[code][to] += depth * depth
+                    break
+        bound = UPPER if best is None else LOWER if alpha >= beta else EXACT
+        self.table.store(key, depth, bound, _to_table(alpha, ply), pack_move(best) if best else 0)
+        return alpha
+
+    def _quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        """Searches the captures and promotions only, the team to move may as well stand pat."""
+        board = self.board
+        stand_pat = self.evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        squares = board.squares
+        captures = [move for move in board.iter_moves()
+                    if squares[square(*move[1])] or len(move) > 2
+                    or (square(*move[1]) == board._ep and (squares[square(*move[0])] - 1) % 6 == PAWN)]
+        for move in self._order(captures, ply):
+            self.nodes += 1
+            if self.stopped or self.nodes % CHECK_EVERY == 0:
+                self._check_budget()
+            board.push(move)
+            try:
+                score = -self._quiescence(-beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        return alpha
+
+
+def search(board: Board, depth: int = MAX_PLY, movetime: float = None, nodes: int = None,
+           info: Callable[[SearchResult], None] = None) -> SearchResult:
+    """Searches the position of the board, see Search.run."""
+    return Search(board).run(depth, movetime, nodes, info)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Searches the best move of a position.")
+    parser.add_argument('--fen', default=START_FEN, help="The position to search.")
+    parser.add_argument('--depth', type=int, default=MAX_PLY, help="The maximal depth.")
+    parser.add_argument('--movetime', type=float, default=None, help="The time for the search in seconds.")
+    parser.add_argument('--nodes', type=int, default=None, help="The maximal number of nodes.")
+    parser.add_argument('--hash', type=float, default=16, help="The size of the transposition table in MB.")
+    parser.add_argument('--tablebases', help="The directory of the endgame tablebases, see tablebase.py.")
+    parser.add_argument('--bitboard', action='store_true', help="Use the bitboard engine.")
+    args = parser.parse_args(argv)
+    if args.depth == MAX_PLY and args.movetime is None and args.nodes is None:
+        args.movetime = 5.0
+
+    board = Board.from_fen(args.fen, bitboard=args.bitboard)
+    tablebase = Tablebase(args.tablebases) if args.tablebases else None
+    engine = Search(board, table=TranspositionTable(args.hash), tablebase=tablebase)
+    result = engine.run(args.depth, args.movetime, args.nodes, info=lambda r: print(r.info(), flush=True))
+    stats = engine.table.stats()
+    print(f"hash {stats['mb']:.1f} MB, hit rate {stats['hit rate']:.1%}, {stats['collisions']} collisions, "
+          f"{stats['replacements']} replacements, hashfull {stats['hashfull']}")
+    print(f"bestmove {move_name(result.move) if result.move else '(none)'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+A server of many games at once, over a local TCP or Unix socket.
+
+The games are boards kept in memory by the server, which runs on one asyncio event loop. The protocol is
+line based: every request is a JSON object on one line and is answered by one line, in the order of the
+requests of the connection. A request has an op, the game it is about and the arguments of the op. The
+answer has "ok": true and the results, or "ok": false and an "error". The "id" of a request is copied into
+its answer.
+
+    {"op": "new", "fen": "<fen>"}                     -> {"ok": true, "game": "1", "fen": "..."}
+    {"op": "move", "game": "1", "move": "e2e4"}        -> {"ok": true, "fen": "...", "status": "ongoing"}
+    {"op": "undo", "game": "1"}                       -> {"ok": true, "fen": "..."}
+    {"op": "moves", "game": "1"}                      -> {"ok": true, "moves": ["a2a3", ...]}
+    {"op": "status", "game": "1"}                     -> {"ok": true, "fen": "...", "turn": "w", "status": ...}
+    {"op": "close", "game": "1"}                      -> {"ok": true}
+    {"op": "analyze", "game": "1", "depth": 4, "movetime": 1.0}  -> {"ok": true, "move": "e2e4", "score": ...}
+    {"op": "perft", "game": "1", "depth": 4}          -> {"ok": true, "nodes": 197281}
+    {"op": "stats"}                                   -> {"ok": true, "games": 1, "latency": {"move": {"p50": ...}}}
+
+The moves are given in coordinate notation (see perft.move_name) and checked against Board.legal_moves.
+The light requests are answered on the event loop, they take a few 10 µs. The heavy ones (analyze and
+perft) run in a pool of a bounded number of processes (or threads) on a snapshot of the position, so the
+event loop never waits for them and the game may go on meanwhile; at most max_pending of them are submitted
+at once, the others wait for their turn. The time of every request is recorded, and "stats" reports the
+percentiles of the latest ones per op in µs, see loadgen.py to measure the throughput.
+
+Usage:
+    python server.py --port 8765
+    python server.py --unix /tmp/chess.sock --workers 4 --threads
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Optional, Sequence
+
+from board import Board, Snapshot
+from fen import START_FEN
+from perft import move_name, parse_move, perft
+from pieces import PAWN, KING
+from search import Search
+from bits import WHITE, BLACK, square
+
+logger = logging.getLogger(__name__)
+
+# The number of latencies kept per op for the percentiles.
+LATENCY_SAMPLES = 10000
+# The requests which are sent to the pool.
+HEAVY_OPS = ('analyze', 'perft')
+# The limits of the heavy requests, a request cannot take the pool for longer.
+MAX_DEPTH = {'analyze': 8, 'perft': 6}
+MAX_MOVETIME = 10.0
+
+
+class RequestError(Exception):
+    """An invalid request, it is answered with the message as error."""
+
+
+def percentiles(samples: Iterable[float], points: Sequence[float] = (50, 90, 99, 99.9)) -> Dict[str, float]:
+    """Returns the percentiles of the samples by name, e.g. {'p50': ..., 'p99': ...}, by the nearest rank."""
+    ordered = sorted(samples)
+    if not ordered:
+        return dict()
+    return {f"p{p:g}": ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] for p in points}
+
+
+def _analyze(snapshot: Snapshot, bitboard: bool, depth: int, movetime: Optional[float]) -> Dict[str, Any]:
+    """Searches the position, in a worker of the pool."""
+    result = Search(Board.from_snapshot(snapshot, bitboard)).run(depth, movetime)
+    return {'move': move_name(result.move) if result.move else None, 'score': result.score,
+            'pv': [move_name(m) for m in result.pv], 'depth': result.depth, 'nodes': result.nodes}
+
+
+def _perft(snapshot: Snapshot, bitboard: bool, depth: int) -> Dict[str, Any]:
+    """Counts the leaf nodes of the position, in a worker of the pool."""
+    return {'nodes': perft(Board.from_snapshot(snapshot, bitboard), depth)}
+
+
+class GameServer:
+    """The games and the handling of the requests, independent of the connections.
+
+    Args:
+        max_games (int, optional): The maximal number of games at once. Defaults to 100000.
+        workers (int, optional): The number of workers of the pool for the heavy requests. Defaults to the
+            number of CPUs.
+        threads (bool, optional): Whether the pool has threads instead of processes. The threads share the
+            interpreter with the event loop, so they only keep it free but do not search in parallel.
+            Defaults to False.
+        max_pending (int, optional): The maximal number of heavy requests in the pool, queued ones included.
+            Defaults to twice the number of workers.
+        bitboard (bool, optional): Whether the games use the bitboard engine. Defaults to False.
+    """
+
+    def __init__(self, max_games: int = 100000, workers: int = None, threads: bool = False,
+                 max_pending: int = None, bitboard: bool = False):
+        self.games: Dict[str, Board] = dict()
+        self.max_games = max_games
+        self.bitboard = bitboard
+        workers = workers or os.cpu_count() or 1
+        self.pool: Executor = ThreadPoolExecutor(workers) if threads else ProcessPoolExecutor(workers)
+        self._pending = asyncio.Semaphore(max_pending or 2*workers)
+        self._next_id = 0
+        self.latencies: Dict[str, Deque[float]] = dict()
+        self.requests = 0
+        self.errors = 0
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _game(self, request: Dict[str, Any]) -> Board:
+        board = self.games.get(str(request.get('game')))
+        if board is None:
+            raise RequestError(f"There is no game {request.get('game')!r}.")
+        return board
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Answers the request, see the module for the ops. The time it takes is recorded per op."""
+        start = time.perf_counter()
+        op = request.get('op')
+        method = getattr(self, f'op_{op}', None) if isinstance(op, str) else None
+        try:
+            if op in HEAVY_OPS:
+                answer = await self._heavy(op, request)
+            elif method is None:
+                raise RequestError(f"Unknown op {op!r}.")
+            else:
+                answer = method(request)
+            answer['ok'] = True
+        except (RequestError, ValueError, TypeError) as error:
+            answer = {'ok': False, 'error': str(error)}
+            self.errors += 1
+        except Exception as error:
+            # A bug must not cost the client its connection, the request is answered and the error logged.
+            logger.exception("The request %r failed.", request)
+            answer = {'ok': False, 'error': f"Internal error: {error!r}"}
+            self.errors += 1
+        if 'id' in request:
+            answer['id'] = request['id']
+        self.requests += 1
+        # The unknown ops share one entry, so the requests cannot make up any number of them.
+        key = op if op in HEAVY_OPS or method is not None else 'unknown'
+        latencies = self.latencies.get(key)
+        if latencies is None:
+            latencies = self.latencies[key] = deque(maxlen=LATENCY_SAMPLES)
+        latencies.append(time.perf_counter() - start)
+        return answer
+
+    def op_new(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if len(self.games) >= self.max_games:
+            raise RequestError(f"There are already {self.max_games} games.")
+        # parse_fen rejects malformed FENs and impossible en passant squares with a ValueError.
+        board = Board.from_fen(request.get('fen') or START_FEN, bitboard=self.bitboard)
+        if any(board.squares.count(6*t + KING + 1) != 1 for t in (WHITE, BLACK)):
+            raise RequestError("Both teams need one king.")
+        # The king of the team which is not to move could be captured.
+        if board.is_check(~board.turn):
+            raise RequestError(f"The team which is not to move is in check in {board.to_fen()}.")
+        if any((code - 1) % 6 == PAWN for code in board.squares[:8] + board.squares[56:] if code):
+            raise RequestError(f"There is a pawn on the first or last row in {board.to_fen()}.")
+        self._next_id += 1
+        game = str(self._next_id)
+        self.games[game] = board
+        return {'game': game, 'fen': board.to_fen()}
+
+    def op_move(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        board = self._game(request)
+        move = parse_move(str(request.get('move')))
+        frm, to = move[0], move[1]
+        turn = board.turn
+        if to not in board.legal_moves(turn).get(frm, ()):
+            raise RequestError(f"{request['move']} is not legal in {board.to_fen()}.")
+        if len(move) > 2 and not ((board.squares[square(*frm)] - 1) % 6 == PAWN and to[1] in (0, 7)):
+            raise RequestError(f"{request['move']} is not a promotion.")
+        board.push(move)
+        return {'fen': board.to_fen(), 'status': board.status(board.turn)}
+
+    def op_undo(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        board = self._game(request)
+        try:
+            board.pop()
+        except IndexError:
+            raise RequestError("There is no move to take back.") from None
+        return {'fen': board.to_fen()}
+
+    def op_moves(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {'moves': [move_name(move) for move in self._game(request).iter_moves()]}
+
+    def op_status(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        board = self._game(request)
+        turn = board.turn
+        return {'fen': board.to_fen(), 'turn': str(turn), 'status': board.status(turn)}
+
+    def op_close(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self._game(request)
+        del self.games[str(request['game'])]
+        return dict()
+
+    def op_stats(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return {'games': len(self.games), 'requests': self.requests, 'errors': self.errors,
+                'latency': {op: {'count': len(samples), **{p: round(v * 1e6, 1) for p, v in
+                                                           percentiles(samples).items()}}
+                            for op, samples in self.latencies.items()}}
+
+    async def _heavy(self, op: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        snapshot = self._game(request).snapshot()
+        depth = int(request.get('depth', 4))
+        if not 1 <= depth <= MAX_DEPTH[op]:
+            raise RequestError(f"The depth of {op} has to be between 1 and {MAX_DEPTH[op]}.")
+        if op == 'analyze':
+            movetime = request.get('movetime')
+            movetime = None if movetime is None else min(float(movetime), MAX_MOVETIME)
+            args = _analyze, snapshot, self.bitboard, depth, movetime
+        else:
+            args = _perft, snapshot, self.bitboard, depth
+        async with self._pending:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, *args)
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answers the requests of one connection until it is closed."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("A request has to be a JSON object.")
+                except ValueError as error:
+                    self.errors += 1
+                    answer = {'ok': False, 'error': f"Invalid request: {error}"}
+                else:
+                    answer = await self.handle(request)
+                writer.write(json.dumps(answer).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(server: GameServer, host: str = '127.0.0.1', port: int = 8765, unix: str = None):
+    """Serves the games on the TCP port of the host or on the Unix socket until the task is cancelled."""
+    if unix:
+        listener = await asyncio.start_unix_server(server.serve_connection, unix)
+    else:
+        listener = await asyncio.start_server(server.serve_connection, host, port)
+    async with listener:
+        print(f"Serving on {unix or f'{host}:{port}'}", flush=True)
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serves many games over a local socket, see server.py.")
+    parser.add_argument('--host', default='127.0.0.1', help="The host of the TCP socket.")
+    parser.add_argument('--port', type=int, default=8765, help="The TCP port.")
+    parser.add_argument('--unix', help="The path of a Unix socket to serve on instead of TCP.")
+    parser.add_argument('--workers', type=int, default=None, help="The size of the pool for analyze and perft.")
+    parser.add_argument('--threads', action='store_true', help="Use a pool of threads instead of processes.")
+    parser.add_argument('--max-games', type=int, default=100000, help="The maximal number of games.")
+    parser.add_argument('--bitboard', action='store_true', help="Use the bitboard engine.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+
+    async def run():
+        server = GameServer(args.max_games, args.workers, args.threads, bitboard=args.bitboard)
+        try:
+            await serve(server, args.host, args.port, args.unix)
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Packed binary positions and a file of them which is read through a memory map.
+
+A position is packed into a record of 32 bytes (see PACKED_DTYPE):
+
+    occupied   8 bytes   the mask of the occupied squares (bit sq is set if there is a piece on sq)
+    pieces    16 bytes   the piece codes (see pieces.FLYWEIGHTS) of the occupied squares in the order of
+                         the squares, two codes of 4 bits per byte (the lower half first)
+    turn       1 byte    the team to move, 0 for white and 1 for black
+    ep         1 byte    the en passant square, -1 if there is none
+    castling   1 byte    the castling rights, see bits.CASTLINGS
+               5 bytes   reserved, zero
+
+So a position may have at most 32 pieces. The records have a fixed width, which is why a file of them can
+be mapped with numpy.memmap and sliced or indexed without reading or copying anything.
+"""
+
+import os
+import struct
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+
+from bits import iter_bits
+from board import Board
+from fen import POSITION_DTYPE
+
+PACKED_DTYPE = np.dtype([('occupied', '<u8'), ('pieces', np.uint8, 16), ('turn', np.uint8), ('ep', np.int8),
+                         ('castling', np.uint8), ('reserved', np.uint8, 5)])
+RECORD_SIZE = PACKED_DTYPE.itemsize
+MAX_PIECES = 32
+
+_RECORD = struct.Struct('<Q16sBbB5x')
+# The header of a store, padded to the size of a record so the records stay aligned.
+_MAGIC = b'CHESSPOS'
+_VERSION = 1
+_HEADER = struct.Struct(f'<8sI{RECORD_SIZE - 12}x')
+# The binary digit of a square in the mask of the occupied squares for every piece code.
+_OCCUPIED_DIGITS = b'0' + b'1'*255
+# The two codes packed into every byte.
+_NIBBLES = [(byte & 15, byte >> 4) for byte in range(256)]
+
+
+def pack(board: Board) -> bytes:
+    """Packs the position of the board into a record of 32 bytes.
+
+    Raises:
+        ValueError: If there are more than 32 pieces on the board.
+    """
+    squares, turn, ep, castling = board.snapshot()
+    codes = squares.replace(b'\0', b'')
+    if len(codes) > MAX_PIECES:
+        raise ValueError(f"A position with {len(codes)} pieces cannot be packed, at most {MAX_PIECES} can.")
+    if len(codes) & 1:
+        codes += b'\0'
+    pieces = bytes([codes[i] | codes[i + 1] << 4 for i in range(0, len(codes), 2)])
+    # The codes of the empty squares are zero bytes, their binary digits make the mask of the occupied squares.
+    occupied = int(squares.translate(_OCCUPIED_DIGITS)[::-1], 2)
+    return _RECORD.pack(occupied, pieces, turn, ep, castling)
+
+
+def unpack(record: Union[bytes, np.void], board: Board = None) -> Board:
+    """Loads a record made by pack into the board.
+
+    Args:
+        record (Union[bytes, np.void]): The record, e.g. an element of a PositionStore.
+        board (Board, optional): The board to load the position into. Defaults to a new board.
+
+    Returns:
+        Board: The board.
+    """
+    occupied, pieces, turn, ep, castling = _RECORD.unpack(bytes(record))
+    squares = bytearray(64)
+    codes = [code for byte in pieces for code in _NIBBLES[byte]]
+    for i, sq in enumerate(iter_bits(occupied)):
+        squares[sq] = codes[i]
+    if board is None:
+        board = Board()
+    board.set_position(squares, turn, ep, castling)
+    return board
+
+
+def pack_positions(positions: np.ndarray) -> np.ndarray:
+    """Packs an array of positions (see fen.POSITION_DTYPE, e.g. made by fen.load_fens) at once.
+
+    Raises:
+        ValueError: If a position has more than 32 pieces.
+
+    Returns:
+        np.ndarray: The records, see PACKED_DTYPE.
+    """
+    squares = positions['squares']
+    occupied = squares != 0
+    if len(positions) and occupied.sum(axis=1).max() > MAX_PIECES:
+        raise ValueError(f"A position with more than {MAX_PIECES} pieces cannot be packed.")
+    # A stable sort moves the codes of the occupied squares to the front and keeps their order.
+    order = np.argsort(~occupied, axis=1, kind='stable')[:, :MAX_PIECES]
+    codes = np.take_along_axis(squares, order, axis=1)
+    records = np.zeros(len(positions), PACKED_DTYPE)
+    records['occupied'] = np.packbits(occupied, axis=1, bitorder='little').view('<u8')[:, 0]
+    records['pieces'] = codes[:, 0::2] | codes[:, 1::2] << 4
+    for field in ('turn', 'ep', 'castling'):
+        records[field] = positions[field]
+    return records
+
+
+def unpack_positions(records: np.ndarray) -> np.ndarray:
+    """Unpacks an array of records (see PACKED_DTYPE) at once, the inverse of pack_positions.
+
+    Returns:
+        np.ndarray: The positions, see fen.POSITION_DTYPE.
+    """
+    count = len(records)
+    pieces = records['pieces']
+    codes = np.empty((count, MAX_PIECES), np.uint8)
+    codes[:, 0::2] = pieces & 15
+    codes[:, 1::2] = pieces >> 4
+    occupied = np.unpackbits(np.ascontiguousarray(records['occupied'], '<u8').view(np.uint8).reshape(count, 8),
+                             axis=1, bitorder='little').astype(bool)
+    # The code of an occupied square is the one with the index of the number of occupied squares before it.
+    rank = np.clip(np.cumsum(occupied, axis=1) - 1, 0, MAX_PIECES - 1)
+    positions = np.empty(count, POSITION_DTYPE)
+    positions['squares'] = np.where(occupied, np.take_along_axis(codes, rank, axis=1), 0)
+    for field in ('turn', 'ep', 'castling'):
+        positions[field] = records[field]
+    return positions
+
+
+class PositionStore:
+    """A file of packed positions. New positions are appended to the end of the file, the positions in the
+    file are read through a memory map: indexing and slicing return views of the file, nothing is copied.
+
+    Usage:
+        with PositionStore('positions.bin') as store:
+            store.append(board)
+            store.extend(boards)
+            records = store[1000:2000]  # a view of the records
+            board = store.board(1234)
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], readonly: bool = False):
+        """Opens the store, it is created if it does not exist (unless readonly).
+
+        Raises:
+            ValueError: If the file is not a store of this version or ends with an incomplete record.
+        """
+        self.path = os.fspath(path)
+        self.readonly = readonly
+        self._file = None
+        self._map = None
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            if readonly:
+                raise FileNotFoundError(self.path)
+            with open(self.path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, _VERSION))
+        with open(self.path, 'rb') as f:
+            magic, version = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{self.path} is not a position store of version {_VERSION}.")
+        size = os.path.getsize(self.path) - _HEADER.size
+        if size % RECORD_SIZE:
+            raise ValueError(f"{self.path} ends with an incomplete record.")
+        self._length = size // RECORD_SIZE
+        if not readonly:
+            self._file = open(self.path, 'ab')
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __enter__(self) -> 'PositionStore':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Writes the appended positions to the file and closes it."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._map = None
+
+    def append(self, board: Board):
+        """Appends the position of the board."""
+        self._write(pack(board))
+
+    def extend(self, boards: Iterable[Board]):
+        """Appends the positions of the boards, e.g. the positions of pgn.replay."""
+        self._write(b"".join([pack(board) for board in boards]))
+
+    def extend_positions(self, positions: np.ndarray):
+        """Appends an array of positions (see fen.POSITION_DTYPE), packed at once with pack_positions."""
+        self._write(pack_positions(positions).tobytes())
+
+    def _write(self, data: bytes):
+        if self._file is None:
+            raise ValueError(f"{self.path} is not opened for writing.")
+        self._file.write(data)
+        self._length += len(data) // RECORD_SIZE
+
+    @property
+    def records(self) -> np.ndarray:
+        """All records of the store as a memory map, see PACKED_DTYPE. It is mapped again when positions
+        have been appended since."""
+        if self._map is None or len(self._map) != self._length:
+            if self._file is not None:
+                self._file.flush()
+            if self._length == 0:
+                return np.zeros(0, PACKED_DTYPE)
+            self._map = np.memmap(self.path, PACKED_DTYPE, 'r', offset=_HEADER.size, shape=(self._length,))
+        return self._map
+
+    def __getitem__(self, index: Union[int, slice, np.ndarray]) -> np.ndarray:
+        """The record(s) at the index, a view of the memory map for an integer or a slice."""
+        return self.records[index]
+
+    def board(self, index: int, board: Board = None) -> Board:
+        """Loads the position at the index into the board (defaults to a new board)."""
+        return unpack(self.records[index], board)
+
+    def positions(self, index: slice = slice(None)) -> np.ndarray:
+        """Unpacks the records at the index into an array of positions, see fen.POSITION_DTYPE."""
+        return unpack_positions(np.atleast_1d(self.records[index]))
+
+    def iter_boards(self, board: Board = None) -> Iterator[Board]:
+        """Loads the positions one after another into the same board (defaults to a new board)."""
+        board = board if board is not None else Board()
+        for record in self.records:
+            yield unpack(record, board)
@@ -0,0 +1,428 @@
+# -*- coding: utf-8 -*-
+"""
+Endgame tablebases of the king and one or two pieces against the lone king (KQK, KRK, KBNK and KPK).
+
+The generator enumerates every placement of the pieces and solves all of them at once by retrograde
+analysis: starting from the checkmates, the positions in which white wins in n plies are the ones with a
+move into a position in which black loses in n - 1 plies, and the positions in which black loses in n plies
+are the ones in which every move leads into a position in which white wins in at most n - 1 plies. The
+moves are taken back in bulk with NumPy, the geometry of the moves comes from the move sets of the pieces
+(see pieces.MOVES).
+
+A table stores one byte per placement and team to move, 0 for a draw (or an illegal placement) and the
+distance to mate in plies plus one otherwise. With white to move the stronger side wins, with black to move
+it loses, so the byte holds both the win/draw/loss and the distance to mate. The index of a placement is
+((wk*64 + bk)*64 + p1)*64 + p2 for the squares of the white king, the black king and the pieces, so a probe
+is a lookup in the memory mapped file.
+
+Generating a table takes memory of a few times its size: the two bytes of values per placement, a byte of
+escapes and three flags. The legality and the escapes are calculated one white king square after the other,
+and every ply scans the table for the positions of the last ply in chunks and marks their predecessors in
+place. KQK, KRK and KPK (0.5 MB each) take about a second, KBNK (33 MB) about 30 s and 150 MB of peak RSS.
+
+Usage:
+    python tablebase.py                     # generates all tables into the directory tablebases
+    python tablebase.py KQK KRK --dir /tmp/tb
+    python tablebase.py --probe "8/8/8/4k3/8/8/8/4K2Q w - - 0 1"
+"""
+
+import argparse
+import os
+import struct
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import pieces
+from board import Board
+from bits import WHITE, BLACK, BETWEEN, RAN64, iter_bits
+from pieces import FLYWEIGHTS, MOVES, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING
+
+# The pieces of the stronger side next to its king, in the order of the index.
+MATERIALS = {
+    'KQK': (QUEEN,),
+    'KRK': (ROOK,),
+    'KBNK': (BISHOP, KNIGHT),
+    'KPK': (PAWN,),
+}
+# The tables the pawn promotes into, they have to be generated first.
+PROMOTION_TABLES = {QUEEN: 'KQK', ROOK: 'KRK'}
+MAX_PIECES = 4
+# The number of positions of the last ply whose predecessors are calculated at once, see _Material.generate.
+CHUNK = 1 << 16
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tablebases')
+
+_MAGIC = b'CHESSTB\0'
+_VERSION = 1
+_HEADER = struct.Struct('<8sI8s12x')
+_BY_KINDS = {tuple(sorted(kinds)): name for name, kinds in MATERIALS.items()}
+_SLIDERS = (BISHOP, ROOK, QUEEN)
+
+
+def _targets(kind: int) -> np.ndarray:
+    """The squares a white piece of the kind moves to on an empty board, TARGETS[sq] padded with -1."""
+    rows = []
+    for sq in RAN64:
+        piece = FLYWEIGHTS[kind + 1][sq]
+        moves = piece.move_set[piece.position]
+        if kind != PAWN:
+            moves = [pos for ray in moves for pos in ray]
+        rows.append([col + 8*row for col, row in moves])
+    targets = np.full((64, max(map(len, rows))), -1, dtype=np.intp)
+    for sq, row in enumerate(rows):
+        targets[sq, :len(row)] = row
+    return targets
+
+
+TARGETS = {kind: _targets(kind) for kind in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING)}
+# ATTACKS[kind][a, b] is whether a white piece of the kind on a attacks b on an empty board.
+ATTACKS = dict()
+for _kind, _targets_of in TARGETS.items():
+    ATTACKS[_kind] = np.zeros((64, 64), dtype=bool)
+    if _kind == PAWN:
+        for _sq in RAN64:
+            for _col, _row in MOVES['wPtake'][_sq % 8, _sq // 8]:
+                ATTACKS[PAWN][_sq, _col + 8*_row] = True
+    else:
+        for _sq in RAN64:
+            ATTACKS[_kind][_sq, _targets_of[_sq][_targets_of[_sq] >= 0]] = True
+# IN_BETWEEN[a, b, x] is whether x is one of the squares strictly between a and b on a line.
+IN_BETWEEN = np.array([[[BETWEEN[a][b] >> x & 1 for x in RAN64] for b in RAN64] for a in RAN64], dtype=bool)
+
+
+class _Material:
+    """The placements of a material and the generation of its table."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.kinds = (KING, KING) + MATERIALS[name]
+        self.teams = (WHITE, BLACK) + (WHITE,)*len(MATERIALS[name])
+        self.n = len(self.kinds)
+        self.size = 64**self.n
+        self.strides = [64**(self.n - 1 - j) for j in range(self.n)]
+
+    def grids(self, wk: int) -> List[np.ndarray]:
+        """The square of every piece over the placements with the white king on wk, as arrays which broadcast to
+        the shape of the slice (64,)*(n - 1)."""
+        m = self.n - 1
+        return [np.array(wk)] + [np.arange(64).reshape([64 if i == j else 1 for i in range(m)]) for j in range(m)]
+
+    def encode(self, c: Sequence[np.ndarray]) -> np.ndarray:
+        index = 0
+        for cj, stride in zip(c, self.strides):
+            index = index + cj*stride
+        return index
+
+    def decode(self, index: np.ndarray) -> List[np.ndarray]:
+        return [index // stride % 64 for stride in self.strides]
+
+    def attacked(self, c: Sequence[np.ndarray], target: int, team: int, captured: int = None) -> np.ndarray:
+        """Whether the piece target is attacked by the pieces of the team, the piece captured is off the board."""
+        result = False
+        for j, kind in enumerate(self.kinds):
+            if self.teams[j] != team or j == target or j == captured:
+                continue
+            hit = ATTACKS[kind][c[j], c[target]]
+            if kind in _SLIDERS:
+                for x in range(self.n):
+                    if x not in (j, target, captured):
+                        hit = hit & ~IN_BETWEEN[c[j], c[target], c[x]]
+            result = result | hit
+        return result
+
+    def distinct(self, c: Sequence[np.ndarray]) -> np.ndarray:
+        result = True
+        for i in range(self.n):
+            for j in range(i + 1, self.n):
+                result = result & (c[i] != c[j])
+            if self.kinds[i] == PAWN:
+                result = result & (c[i] >= 8) & (c[i] < 56)
+        return result
+
+    def generate(self, directory: str, verbose: bool = True) -> np.ndarray:
+        """Solves all placements and returns the table, values[team to move, index]."""
+        t0 = time.perf_counter()
+        valid_w, valid_b, in_check = self._legal()
+        counts = self._escapes(valid_w)
+        values = np.zeros((2, self.size), dtype=np.uint8)
+        values[BLACK, valid_b & in_check & (counts == 0)] = 1
+        seeds = self._promotions(directory, valid_w) if PAWN in self.kinds else dict()
+        found = np.count_nonzero(values[BLACK])
+        if verbose:
+            print(f"{self.name}: {np.count_nonzero(valid_w)} + {np.count_nonzero(valid_b)} placements, "
+                  f"{found} mates, {time.perf_counter() - t0:.1f} s")
+
+        # The positions of the last ply are found by their value in the table, and the predecessors of a chunk
+        # of them are marked in place, so no list of all the positions of a ply is built.
+        ply = 0
+        while found or any(level > ply for level in seeds):
+            ply += 1
+            found = 0
+            if ply % 2:
+                # White wins in ply plies with a move into the positions black loses in ply - 1 plies.
+                for index in self._frontier(values[BLACK], ply):
+                    found += self._mark(values[WHITE], self._white_predecessors(index), valid_w, ply + 1)
+                if ply in seeds:
+                    found += self._mark(values[WHITE], seeds.pop(ply), valid_w, ply + 1)
+            else:
+                # Every position before a win of white loses one escape, the ones without escapes are lost.
+                for index in self._frontier(values[WHITE], ply):
+                    before = self._black_predecessors(index)
+                    before, times = np.unique(before[valid_b[before] & (values[BLACK, before] == 0)],
+                                              return_counts=True)
+                    counts[before] -= times.astype(np.uint8)
+                    lost = before[counts[before] == 0]
+                    values[BLACK, lost] = ply + 1
+                    found += len(lost)
+        if verbose:
+            wins = np.count_nonzero(values[WHITE])
+            print(f"{self.name}: {wins} wins with white to move, {np.count_nonzero(values[BLACK])} losses with "
+                  f"black to move, longest mate {int(values.max()) - 1} plies, {time.perf_counter() - t0:.1f} s")
+        return values
+
+    def _legal(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Whether every placement is legal with white to move and with black to move, and whether the black
+        king is in check. The placements are handled one white king square after the other."""
+        valid_w, valid_b, in_check = (np.empty(self.size, dtype=bool) for _ in range(3))
+        shape, part = (64,)*(self.n - 1), self.size // 64
+        for wk in RAN64:
+            c = self.grids(wk)
+            rows = slice(wk*part, (wk + 1)*part)
+            check = np.broadcast_to(self.attacked(c, 1, WHITE), shape).ravel()
+            valid_b[rows] = np.broadcast_to(self.distinct(c) & ~self.attacked(c, 0, BLACK), shape).ravel()
+            valid_w[rows] = valid_b[rows] & ~check
+            in_check[rows] = check
+        return valid_w, valid_b, in_check
+
+    def _escapes(self, valid_w: np.ndarray) -> np.ndarray:
+        """The number of moves of black which are not refuted yet. A capture can never be refuted (the remaining
+        material is a draw) and counts as a hundred, at most two pieces can be captured so it fits a byte."""
+        counts = np.zeros(self.size, dtype=np.uint8)
+        king = TARGETS[KING]
+        shape, part = (64,)*(self.n - 1), self.size // 64
+        for wk in RAN64:
+            c = self.grids(wk)
+            rows = counts[wk*part:(wk + 1)*part]
+            for slot in range(king.shape[1]):
+                to = king[c[1], slot]
+                moved = list(c)
+                moved[1] = np.maximum(to, 0)
+                free = to >= 0
+                for j in range(2, self.n):
+                    free = free & (to != c[j])
+                quiet = valid_w[np.broadcast_to(self.encode(moved), shape).ravel()]
+                rows += np.broadcast_to(free, shape).ravel() & quiet
+                for j in range(2, self.n):
+                    capture = (to == c[j]) & ~self.attacked(moved, 1, WHITE, captured=j)
+                    rows += 100*np.broadcast_to(capture, shape).ravel().astype(np.uint8)
+        return counts
+
+    @staticmethod
+    def _frontier(column: np.ndarray, level: int) -> Iterator[np.ndarray]:
+        """Yields the indices of the positions with the value level in chunks of at most CHUNK positions."""
+        for start in range(0, len(column), CHUNK):
+            index = np.flatnonzero(column[start:start + CHUNK] == level)
+            if len(index):
+                yield index + start
+
+    @staticmethod
+    def _mark(column: np.ndarray, index: np.ndarray, valid: np.ndarray, value: int) -> int:
+        """Sets the value of the valid positions of the index which have none yet, returns how many there were."""
+        index = index[valid[index] & (column[index] == 0)]
+        column[index] = value
+        return len(index)
+
+    def _white_predecessors(self, index: np.ndarray) -> np.ndarray:
+        """The positions with white to move from which a move of white leads to the positions of the index."""
+        c = self.decode(index)
+        found = []
+        for j, kind in enumerate(self.kinds):
+            if self.teams[j] != WHITE:
+                continue
+            if kind == PAWN:
+                single = c[j] - 8
+                double = np.where(c[j] // 8 == 3, c[j] - 16, -1)
+                sources = [(single, single >= 8)]
+                jumped = True
+                for x in range(self.n):
+                    if x != j:
+                        jumped = jumped & (c[x] != single)
+                sources.append((double, (double >= 0) & jumped))
+            else:
+                sources = [(TARGETS[kind][c[j], slot], None) for slot in range(TARGETS[kind].shape[1])]
+            for source, ok in sources:
+                ok = (source >= 0) if ok is None else ok & (source >= 0)
+                source = np.maximum(source, 0)
+                for x in range(self.n):
+                    if x != j:
+                        ok = ok & (c[x] != source) & ~IN_BETWEEN[source, c[j], c[x]]
+                moved = list(c)
+                moved[j] = source
+                found.append(self.encode(moved)[ok])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def _black_predecessors(self, index: np.ndarray) -> np.ndarray:
+        """The positions with black to move from which a move of the black king leads to the positions of the
+        index, once for every such move."""
+        c = self.decode(index)
+        found = []
+        for slot in range(TARGETS[KING].shape[1]):
+            source = TARGETS[KING][c[1], slot]
+            ok = source >= 0
+            for x in range(self.n):
+                if x != 1:
+                    ok = ok & (c[x] != source)
+            moved = list(c)
+            moved[1] = np.maximum(source, 0)
+            found.append(self.encode(moved)[ok])
+        return np.concatenate(found)
+
+    def _promotions(self, directory: str, valid_w: np.ndarray) -> Dict[int, np.ndarray]:
+        """The positions with white to move in which the pawn promotes into a win, by the plies to mate."""
+        p = self.kinds.index(PAWN)
+        index = np.flatnonzero(valid_w)
+        c = self.decode(index)
+        to = c[p] + 8
+        ok = (c[p] >= 48) & (to != c[0]) & (to != c[1])
+        index, c, to = index[ok], [cj[ok] for cj in c], to[ok]
+        best = np.zeros(len(index), dtype=np.int64)
+        for kind, name in PROMOTION_TABLES.items():
+            table = load_table(name, directory)
+            other = _Material(name)
+            value = table[BLACK, other.encode([c[0], c[1], to])].astype(np.int64)
+            best = np.where((value > 0) & ((best == 0) | (value < best)), value, best)
+        return {int(level): index[best == level] for level in np.unique(best[best > 0])}
+
+
+def table_path(name: str, directory: str = DEFAULT_DIRECTORY) -> str:
+    return os.path.join(directory, f"{name}.tb")
+
+
+def generate(name: str, directory: str = DEFAULT_DIRECTORY, verbose: bool = True) -> str:
+    """Generates the table of the material (see MATERIALS) and writes it into the directory. The tables a pawn
+    promotes into are generated first if they do not exist.
+
+    Returns:
+        str: The path of the table.
+    """
+    if name not in MATERIALS:
+        raise ValueError(f"There is no tablebase of {name}, only of {', '.join(MATERIALS)}.")
+    os.makedirs(directory, exist_ok=True)
+    if PAWN in MATERIALS[name]:
+        for dependency in PROMOTION_TABLES.values():
+            if not os.path.exists(table_path(dependency, directory)):
+                generate(dependency, directory, verbose)
+    values = _Material(name).generate(directory, verbose)
+    path = table_path(name, directory)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, name.encode()))
+        f.write(values.tobytes())
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def load_table(name: str, directory: str = DEFAULT_DIRECTORY) -> np.ndarray:
+    """Maps the table of the material into memory, values[team to move, index].
+
+    Raises:
+        FileNotFoundError: If the table has not been generated.
+        ValueError: If the file is not a table of this version.
+    """
+    path = table_path(name, directory)
+    with open(path, 'rb') as f:
+        magic, version, material = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != _MAGIC or version != _VERSION or material.rstrip(b'\0').decode() != name:
+        raise ValueError(f"{path} is not a tablebase of {name} of version {_VERSION}.")
+    size = 64**(2 + len(MATERIALS[name]))
+    return np.memmap(path, np.uint8, 'r', offset=_HEADER.size, shape=(2, size))
+
+
+class Tablebase:
+    """Probes the generated tables. The tables are mapped into memory when they are needed first.
+
+    Usage:
+        tablebase = Tablebase()
+        wdl, dtm = tablebase.probe(board)  # None if the material has no table
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        self.directory = directory
+        self._tables = dict()
+        self.hits = self.misses = 0
+
+    def _table(self, name: str) -> Optional[np.ndarray]:
+        if name not in self._tables:
+            try:
+                self._tables[name] = load_table(name, self.directory)
+            except FileNotFoundError:
+                self._tables[name] = None
+        return self._tables[name]
+
+    def probe(self, board: Board) -> Optional[Tuple[int, int]]:
+        """Looks the position up.
+
+        Returns:
+            Optional[Tuple[int, int]]: 1 if the team to move wins, 0 for a draw and -1 if it loses, and the
+                distance to mate in plies (0 for a draw). None if there is no table of the material or the
+                position has castling rights.
+        """
+        occupied = board.occupied
+        if occupied.bit_count() > MAX_PIECES or board.castling:
+            return None
+        squares = board.squares
+        kings, kinds, strong = [-1, -1], [], None
+        for sq in iter_bits(occupied):
+            code = squares[sq] - 1
+            team, kind = code // 6, code % 6
+            if kind == KING:
+                kings[team] = sq
+            else:
+                if strong is not None and team != strong:
+                    return None
+                strong = team
+                kinds.append((kind, sq))
+        name = _BY_KINDS.get(tuple(sorted(kind for kind, _ in kinds)))
+        table = self._table(name) if name is not None and -1 not in kings else None
+        if table is None:
+            self.misses += 1
+            return None
+        # The stronger side is white in the table, if it is black the board is mirrored.
+        flip = 56 if strong == BLACK else 0
+        index = (kings[strong] ^ flip) * 64 + (kings[1 - strong] ^ flip)
+        for kind in MATERIALS[name]:
+            for i, (k, sq) in enumerate(kinds):
+                if k == kind:
+                    index = index*64 + (sq ^ flip)
+                    del kinds[i]
+                    break
+        side = 0 if board._turn == strong else 1
+        value = int(table[side, index])
+        self.hits += 1
+        if value == 0:
+            return 0, 0
+        return (1 if side == 0 else -1), value - 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates and probes the endgame tablebases.")
+    parser.add_argument('materials', nargs='*', default=list(MATERIALS), help="The tables to generate.")
+    parser.add_argument('--dir', default=DEFAULT_DIRECTORY, help="The directory of the tables.")
+    parser.add_argument('--probe', help="Probes the position of the FEN instead of generating tables.")
+    args = parser.parse_args(argv)
+    if args.probe:
+        result = Tablebase(args.dir).probe(Board.from_fen(args.probe))
+        if result is None:
+            print("not in the tablebases")
+        else:
+            wdl, dtm = result
+            print({1: f"win, mate in {dtm} plies", 0: "draw", -1: f"loss, mated in {dtm} plies"}[wdl])
+        return
+    for name in args.materials:
+        t = time.perf_counter()
+        path = generate(name, args.dir)
+        print(f"{path}: {os.path.getsize(path) / 2**20:.1f} MB in {time.perf_counter() - t:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+A cache of precomputed tables in binary files which are mapped into memory.
+
+The tables of the moves (see pieces.MOVES) and of the sliding pieces (see sliders) are built by Python code
+which takes a while. Instead of building them in every process (every worker of a process pool did it
+again) they are built once, written as flat NumPy arrays into a file and mapped into memory by every later
+import. This saves the time of building, not memory: the pages of the mapped file are shared, but the
+modules copy the arrays into Python dictionaries and lists for their lookups, which every process holds
+on its own (see sliders.py).
+
+A file holds named arrays:
+
+    header    16 bytes   magic, version of the tables, number of arrays
+    entries   40 bytes   per array: name, dtype, offset in the file, number of elements
+    arrays               the data of the arrays, each aligned to 8 bytes
+
+The version belongs to the module which builds the tables and has to be increased when they change, a file
+of another version is built again. If the cache directory cannot be written the tables are built in memory.
+The directory is __tablecache__ next to this module, the environment variable CHESS_TABLE_CACHE replaces it.
+"""
+
+import os
+import struct
+from typing import Callable, Dict
+
+import numpy as np
+
+CACHE_DIRECTORY = os.environ.get('CHESS_TABLE_CACHE') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '__tablecache__')
+
+_MAGIC = b'CHESSTAB'
+_HEADER = struct.Struct('<8sII')
+_ENTRY = struct.Struct('<16s8sQQ')
+
+
+def cache_path(name: str, directory: str = CACHE_DIRECTORY) -> str:
+    return os.path.join(directory, f"{name}.tables")
+
+
+def save_arrays(path: str, version: int, arrays: Dict[str, np.ndarray]):
+    """Writes the arrays into the file, which is replaced at once so other processes never read half of it."""
+    offset = _HEADER.size + _ENTRY.size*len(arrays)
+    entries, data = [], []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        offset += -offset % 8
+        entries.append(_ENTRY.pack(name.encode(), array.dtype.str.encode(), offset, array.size))
+        data.append((offset, array.tobytes()))
+        offset += array.nbytes
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, version, len(arrays)))
+        f.write(b''.join(entries))
+        for offset, raw in data:
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(raw)
+    os.replace(tmp, path)
+
+
+def load_arrays(path: str, version: int) -> Dict[str, np.ndarray]:
+    """Maps the arrays of the file into memory, they are read-only.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        ValueError: If the file is not a cache of the tables of this version.
+    """
+    with open(path, 'rb') as f:
+        magic, found, count = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or found != version:
+            raise ValueError(f"{path} is not a cache of tables of version {version}.")
+        entries = [_ENTRY.unpack(f.read(_ENTRY.size)) for _ in range(count)]
+    data = np.memmap(path, np.uint8, 'r')
+    arrays = dict()
+    for name, dtype, offset, size in entries:
+        dtype = np.dtype(dtype.rstrip(b'\0').decode())
+        arrays[name.rstrip(b'\0').decode()] = data[offset:offset + size*dtype.itemsize].view(dtype)
+    return arrays
+
+
+def cached_arrays(name: str, version: int, build: Callable[[], Dict[str, np.ndarray]],
+                  directory: str = CACHE_DIRECTORY) -> Dict[str, np.ndarray]:
+    """Returns the arrays of the tables from the cache, they are built and written into it first if they are
+    missing or of another version.
+
+    Args:
+        name (str): The name of the tables, e.g. the module which uses them.
+        version (int): The version of the tables.
+        build (Callable[[], Dict[str, np.ndarray]]): Builds the arrays by their names.
+        directory (str, optional): The cache directory. Defaults to CACHE_DIRECTORY.
+
+    Returns:
+        Dict[str, np.ndarray]: The arrays by their names.
+    """
+    path = cache_path(name, directory)
+    try:
+        return load_arrays(path, version)
+    except (OSError, ValueError, struct.error):
+        pass
+    arrays = build()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        save_arrays(path, version, arrays)
+        return load_arrays(path, version)
+    except OSError:
+        return arrays
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Tests of the rules and the state of the board on both engines, see board.py and bitboard.py."""
+
+import pytest
+
+from board import Board
+from movecache import MoveCache
+from movecodes import new_buffer
+from perft import REFERENCE, perft
+from pieces import Queen
+import store
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+# Positions with castlings, en passant captures and promotions among the moves.
+POSITIONS = [fen for _, fen, _ in REFERENCE] + ["rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3"]
+# The depths of the reference positions which are checked, the deeper ones take too long for a test.
+MAX_NODES = 20000
+
+
+@pytest.fixture(params=[False, True], ids=['object', 'bitboard'])
+def bitboard(request) -> bool:
+    return request.param
+
+
+def state(board: Board) -> tuple:
+    """Everything a move changes, to compare the state before and after it."""
+    return (bytes(board.squares), board.occupied, bytes(board.attack_counts), board.zobrist, board.score,
+            board._ep, board._castling, board._turn, len(board._stack), list(getattr(board, 'bbs', ())),
+            list(getattr(board, 'occupancy', ())))
+
+
+def assert_consistent(board: Board):
+    """The incremental state equals the one calculated from scratch."""
+    fresh = Board.from_fen(board.to_fen(), bitboard=type(board) is not Board)
+    assert board.key() == board.key(recompute=True) == fresh.key()
+    assert board.evaluate() == board.evaluate(recompute=True) == fresh.evaluate()
+    assert board.occupied == fresh.occupied
+    assert board.attack_counts == fresh.attack_counts
+
+
+@pytest.mark.parametrize('name, fen, counts', REFERENCE, ids=[name for name, _, _ in REFERENCE])
+def test_perft_reference(name, fen, counts, bitboard):
+    board = Board.from_fen(fen, bitboard=bitboard)
+    for depth, expected in counts.items():
+        if expected > MAX_NODES:
+            break
+        assert perft(board, depth) == expected
+    assert board.to_fen() == Board.from_fen(fen).to_fen()
+
+
+@pytest.mark.parametrize('fen', POSITIONS)
+def test_push_pop_restores_the_state(fen, bitboard):
+    board = Board.from_fen(fen, bitboard=bitboard)
+    before = state(board)
+    for move in list(board.iter_moves()):
+        board.push(move)
+        assert_consistent(board)
+        for reply in list(board.iter_moves())[:8]:
+            board.push(reply)
+            assert_consistent(board)
+            board.pop()
+        board.pop()
+        assert state(board) == before
+
+
+@pytest.mark.parametrize('fen', POSITIONS)
+def test_push_pop_of_encoded_moves(fen, bitboard):
+    board = Board.from_fen(fen, bitboard=bitboard)
+    before = state(board)
+    buffer = new_buffer()
+    n = board.generate(buffer)
+    assert n == board.count_moves() == len(list(board.iter_moves()))
+    for move in buffer[:n]:
+        board.push(move)
+        assert_consistent(board)
+        board.pop()
+        assert state(board) == before
+
+
+def test_pop_without_moves(bitboard):
+    with pytest.raises(IndexError):
+        Board.from_fen(KIWIPETE, bitboard=bitboard).pop()
+
+
+@pytest.mark.parametrize('fen', POSITIONS)
+def test_fen_round_trip(fen, bitboard):
+    # The clocks of the FEN are not kept by the board.
+    assert Board.from_fen(fen, bitboard=bitboard).to_fen().split()[:4] == fen.split()[:4]
+
+
+@pytest.mark.parametrize('fen', POSITIONS)
+def test_pack_unpack_round_trip(fen, bitboard):
+    board = Board.from_fen(fen, bitboard=bitboard)
+    record = store.pack(board)
+    assert len(record) == store.RECORD_SIZE
+    restored = store.unpack(record, Board(bitboard=bitboard))
+    assert restored.to_fen() == board.to_fen()
+    assert restored.key() == board.key()
+    assert store.unpack(record).snapshot() == board.snapshot()
+
+
+def test_move_cache_follows_the_changes(bitboard):
+    board = Board.from_fen(KIWIPETE, bitboard=bitboard)
+    board.move_cache = cache = MoveCache(maxsize=16)
+
+    def check():
+        uncached = Board.from_fen(board.to_fen(), bitboard=bitboard)
+        assert board.legal_moves(board.turn) == uncached.legal_moves(uncached.turn)
+
+    check()
+    assert cache.stats()['misses'] == 1
+    check()
+    assert cache.stats()['hits'] == 1
+    board.move(board['e', 1], ('f', 1))
+    check()
+    board.remove((1, 3))  # The pawn on b4.
+    check()
+    board['d', 4] = Queen('b', (3, 3))
+    check()
+    assert cache.stats()['misses'] == 4
+
+
+def test_copy_on_write_clone_is_isolated(bitboard):
+    board = Board.from_fen(KIWIPETE, bitboard=bitboard)
+    board.push((('e', 5), ('f', 7)))
+    before = state(board)
+    clone = board.clone(copy_on_write=True)
+    assert state(clone) == before
+    clone.push((('e', 8), ('f', 7)))
+    assert state(board) == before
+    # The clone has the moves of the board and can take them back.
+    clone.pop()
+    clone.pop()
+    assert state(board) == before
+    assert clone.to_fen() == KIWIPETE
+    board.pop()
+    assert clone.to_fen() == board.to_fen() == KIWIPETE
+    assert_consistent(board)
+    assert_consistent(clone)
+
+
+def test_clone_is_isolated(bitboard):
+    board = Board.from_fen(KIWIPETE, bitboard=bitboard)
+    clone = board.clone()
+    clone.push((('e', 1), ('g', 1)))
+    assert board.to_fen() == KIWIPETE
+    assert_consistent(clone)
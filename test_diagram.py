@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Tests of the text and SVG diagrams, see diagram.py, and of the import budget, see import_budget.py."""
+
+import xml.etree.ElementTree as ElementTree
+
+import pytest
+
+import import_budget
+from board import Board
+from diagram import EMPTY, ICONS, to_svg, to_unicode
+from fen import LETTERS, START_FEN
+from misc import load_settings
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+SVG = '{http://www.w3.org/2000/svg}'
+
+
+def test_to_unicode():
+    board = Board.from_fen(START_FEN)
+    lines = to_unicode(board, highlighted=[(4, 1)]).splitlines()
+    assert len(lines) == 9
+    assert lines[0] == "8 " + ''.join(f" {ICONS[LETTERS.index(ch)]} " for ch in "rnbqkbnr")
+    assert lines[3] == "5 " + f" {EMPTY} " * 8
+    assert lines[6] == "2 " + f" {ICONS[1]} " * 4 + f"[{ICONS[1]}]" + f" {ICONS[1]} " * 3
+    assert lines[8] == "   a  b  c  d  e  f  g  h "
+    plain = to_unicode(board, coordinates=False).splitlines()
+    assert plain == [line[2:] for line in to_unicode(board).splitlines()[:8]]
+
+
+@pytest.mark.parametrize('fen', [START_FEN, KIWIPETE])
+def test_to_svg(fen):
+    board = Board.from_fen(fen)
+    colors = load_settings()['colors']
+    highlighted = [(0, 0), (3, 4)]
+    root = ElementTree.fromstring(to_svg(board, highlighted=highlighted, size=20))
+    assert root.get('width') == root.get('height') == '160'
+    rects, texts = root.findall(f'{SVG}rect'), root.findall(f'{SVG}text')
+    assert len(rects) == 64
+    fill = '#{:02x}{:02x}{:02x}'.format
+    # a1 is a dark square, d5 a light one.
+    assert rects[0].get('fill') == fill(*colors['black_highlighted'])
+    assert rects[35].get('fill') == fill(*colors['white_highlighted'])
+    assert rects[1].get('fill') == fill(*colors['white_field']) and rects[8].get('fill') == fill(*colors['white_field'])
+    assert rects[9].get('fill') == fill(*colors['black_field'])
+    # One text per piece at the center of its square, the eighth row on top.
+    pieces = {(int(float(t.get('x')) // 20), 7 - int(float(t.get('y')) // 20)): t.text for t in texts}
+    assert pieces == {(sq % 8, sq // 8): ICONS[code] for sq, code in enumerate(board.squares) if code}
+
+
+def test_to_svg_with_other_settings():
+    colors = dict(load_settings()['colors'], white_pieces=[1, 2, 3], black_pieces=[4, 5, 6])
+    svg = to_svg(Board.from_fen(START_FEN), settings={'colors': colors})
+    assert svg.count('fill="#010203"') == svg.count('fill="#040506"') == 16
+
+
+@pytest.mark.parametrize('module', import_budget.BUDGETS)
+def test_import_budget(module):
+    # The best of a few imports, the median of import_budget.py is too noisy for a test.
+    runs = [import_budget.measure(module) for _ in range(3)]
+    assert min(ms for ms, _ in runs) <= import_budget.BUDGETS[module]
+    assert runs[0][1] == []
+
+
+def test_forbidden_modules_are_found():
+    assert 'matplotlib' in import_budget.measure('render')[1]
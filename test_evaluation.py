@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Tests of the evaluation, see evaluation.py."""
+
+import numpy as np
+import pytest
+
+from board import Board
+from evaluation import evaluate_many, evaluate_squares
+from fen import START_FEN, load_fens
+from perft import REFERENCE
+
+
+def game_fens() -> list:
+    """The reference positions and the positions after their first two plies, both teams to move."""
+    fens = []
+    for _, fen, _ in REFERENCE:
+        board = Board.from_fen(fen)
+        fens.append(board.to_fen())
+        for move in list(board.iter_moves()):
+            board.push(move)
+            fens.append(board.to_fen())
+            for reply in list(board.iter_moves())[:3]:
+                board.push(reply)
+                fens.append(board.to_fen())
+                board.pop()
+            board.pop()
+    return fens
+
+
+FENS = game_fens()
+
+
+@pytest.mark.parametrize('bitboard', [False, True], ids=['object', 'bitboard'])
+def test_evaluate_many_equals_evaluate(bitboard):
+    positions = load_fens(FENS)
+    boards = [Board.from_fen(fen, bitboard=bitboard) for fen in FENS]
+    relative = [board.evaluate() for board in boards]
+    assert evaluate_many(positions, relative=True).tolist() == relative
+    absolute = [-score if board._turn else score for board, score in zip(boards, relative)]
+    assert evaluate_many(positions).tolist() == absolute
+    assert [evaluate_squares(bytes(squares)) for squares in positions['squares']] == absolute
+
+
+def test_evaluate_many_of_the_squares():
+    positions = load_fens(FENS)
+    squares = np.ascontiguousarray(positions['squares'])
+    assert evaluate_many(squares).tolist() == evaluate_many(positions).tolist()
+    assert evaluate_many(squares[:1]).tolist() == evaluate_many(positions[:1]).tolist()
+    assert evaluate_many(load_fens([])).tolist() == []
+
+
+def test_mirrored_positions_have_the_negated_score():
+    positions = load_fens(FENS)
+    squares = positions['squares'].reshape(-1, 8, 8)[:, ::-1].reshape(-1, 64)
+    # Swap the colors: codes 1..6 are white, 7..12 black.
+    swapped = np.where(squares == 0, 0, np.where(squares > 6, squares - 6, squares + 6)).astype(np.uint8)
+    assert evaluate_many(swapped).tolist() == (-evaluate_many(positions)).tolist()
+    assert evaluate_many(load_fens([START_FEN])).tolist() == [0]
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Tests of reading and writing FEN, see fen.py."""
+
+import pytest
+
+from fen import START_FEN, parse_fen, format_fen, load_fens, SQUARE_NAMES
+
+
+@pytest.mark.parametrize('fen', [
+    START_FEN,
+    "rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3",
+    "rnbqkbnr/pppp1ppp/8/8/3Pp3/8/PPP1PPPP/RNBQKBNR b Kq d3 0 3",
+    "8/8/8/8/8/8/8/k6K b - - 0 1",
+])
+def test_round_trip(fen):
+    assert format_fen(*parse_fen(fen)) == fen.rsplit(' ', 2)[0] + " 0 1"
+
+
+def test_load_fens():
+    positions = load_fens([START_FEN, "rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3"])
+    assert positions['turn'].tolist() == [0, 0]
+    assert SQUARE_NAMES[positions['ep'][1]] == 'd6'
+    assert bytes(positions['squares'][0]) == parse_fen(START_FEN)[0]
+
+
+@pytest.mark.parametrize('fen', [
+    "4k3/8/8/8/3P4/8/8/4K3 w - e5 0 1",  # not on the sixth row
+    "4k3/8/8/8/3P4/8/8/4K3 w - e6 0 1",  # no black pawn in front of it
+    "4k3/4p3/8/4p3/8/8/8/4K3 w - e6 0 1",  # the square behind it is not empty
+    "4k3/8/4n3/4p3/8/8/8/4K3 w - e6 0 1",  # the square itself is not empty
+    "4k3/8/8/4p3/8/8/8/4K3 b - e6 0 1",  # black is to move, a black pawn cannot have skipped it
+    "4k3/8/8/8/4P3/8/8/4K3 b - e9 0 1",  # no square
+    "4k3/8/8/8/8/8/4K3",  # seven rows
+    "4k3/8/8/8/8/8/8/4K3/8 w",  # nine rows
+    "4k3/8/8/8/8/8/8/4K3 x",  # no team
+])
+def test_invalid_fens_are_rejected(fen):
+    with pytest.raises(ValueError):
+        parse_fen(fen)
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Tests of the cache of the legal moves, see movecache.py."""
+
+import pytest
+
+from board import Board
+from fen import START_FEN
+from movecache import MoveCache, freeze, thaw
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MoveCache(maxsize=3)
+    for key in 'abc':
+        cache.put((key, 0), (key,))
+    assert cache.get(('a', 0)) == ('a',)  # a is now the most recently used.
+    cache.put(('d', 0), ('d',))
+    assert cache.get(('b', 0)) is None
+    assert [cache.get((key, 0)) for key in 'acd'] == [('a',), ('c',), ('d',)]
+    cache.put(('e', 0), ('e',))
+    assert cache.get(('a', 0)) is None
+    assert len(cache) == 3 and cache.evictions == 2
+
+
+def test_put_of_a_cached_key_does_not_evict():
+    cache = MoveCache(maxsize=2)
+    cache.put(('a', 0), ('a',))
+    cache.put(('b', 0), ('b',))
+    cache.put(('a', 0), ('A',))
+    cache.put(('c', 0), ('c',))
+    # Putting a again made it the most recently used one, b is evicted.
+    assert cache.get(('a', 0)) == ('A',) and cache.get(('b', 0)) is None
+    assert len(cache) == 2 and cache.evictions == 1
+
+
+def test_maxsize_of_at_least_one():
+    with pytest.raises(ValueError):
+        MoveCache(maxsize=0)
+
+
+@pytest.mark.parametrize('fen', [START_FEN, KIWIPETE])
+def test_freeze_thaw_round_trip(fen):
+    board = Board.from_fen(fen)
+    moves = board.legal_moves(board.turn)
+    assert thaw(freeze(moves)) == moves
+
+
+def test_cache_is_shared_by_boards():
+    cache = MoveCache(maxsize=8)
+    boards = [Board.from_fen(KIWIPETE) for _ in range(2)]
+    for board in boards:
+        board.move_cache = cache
+    first = boards[0].legal_moves(boards[0].turn)
+    # The caller may change the moves it got, the entry stays as it was.
+    first.clear()
+    assert boards[1].legal_moves(boards[1].turn) == Board.from_fen(KIWIPETE).legal_moves(boards[1].turn)
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+
+
+def test_stats_and_clear():
+    cache = MoveCache(maxsize=1)
+    cache.put((1, 0), ())
+    cache.get((1, 0))
+    cache.get((1, 1))
+    cache.put((2, 0), ())
+    assert cache.stats() == {'size': 1, 'maxsize': 1, 'hits': 1, 'misses': 1, 'hit rate': 0.5, 'evictions': 1}
+    cache.clear()
+    assert cache.stats() == {'size': 0, 'maxsize': 1, 'hits': 0, 'misses': 0, 'hit rate': 0.0, 'evictions': 0}
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Tests of the perft tools, see perft.py. The counts of the reference positions are checked in test_board."""
+
+import pytest
+
+from board import Board
+from fen import START_FEN
+from perft import divide, perft, parallel_divide, parallel_perft
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+
+def test_divide_sums_up_to_perft():
+    board = Board.from_fen(START_FEN)
+    result = divide(board, 3)
+    assert len(result) == 20 and sum(result.values()) == perft(board, 3) == 8902
+    assert result[(4, 1), (4, 3)] == 600  # e2e4
+    assert divide(board, 1) == dict.fromkeys(board.iter_moves(), 1)
+    assert board.to_fen() == START_FEN
+
+
+@pytest.mark.parametrize('depth', [0, -1])
+def test_divide_needs_a_move(depth):
+    with pytest.raises(ValueError):
+        divide(Board.from_fen(START_FEN), depth)
+
+
+
+@pytest.mark.parametrize('bitboard', [False, True], ids=['object', 'bitboard'])
+@pytest.mark.parametrize('split_depth', [1, 2])
+def test_parallel_divide_equals_divide(bitboard, split_depth):
+    board = Board.from_fen(KIWIPETE, bitboard=bitboard)
+    expected = divide(board, 3)
+    result = parallel_divide(board, 3, workers=2, split_depth=split_depth)
+    assert result == expected and list(result) == list(expected)
+    assert parallel_perft(board, 3, workers=2, split_depth=split_depth) == 97862
+    assert board.to_fen() == KIWIPETE
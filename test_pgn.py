@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Tests of the PGN reader and the replay of the games, see pgn.py."""
+
+import pytest
+
+from board import Board
+from pgn import read_games, parse_san, replay, iter_positions, parallel_replay
+from pieces import Knight
+
+OPERA = """[Event "Paris"]
+[White "Morphy, Paul"]
+[Black "Duke Karl / Count Isouard"]
+
+1. e4 e5 2. Nf3 d6 3. d4 Bg4 {This is a weak move} 4. dxe5 Bxf3 5. Qxf3 dxe5
+6. Bc4 Nf6 7. Qb3 Qe7 8. Nc3 c6 9. Bg5 b5 (9... Qb4+ 10. Qxb4) 10. Nxb5 cxb5 $2
+11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7 14. Rd1 Qe6 15. Bxd7+ Nxd7 16. Qb8+ Nxb8 17. Rd8# 1-0
+"""
+OPERA_FEN = "1n1Rkb1r/p4ppp/4q3/4p1B1/4P3/8/PPP2PPP/2K5 b k - 0 1"
+BAD = """[Event "bad"]
+
+1. e4 e5 2. Ke3 Nc6 *
+"""
+
+
+def test_read_games():
+    games = list(read_games((OPERA + "\n" + BAD).splitlines()))
+    assert [game.headers['Event'] for game in games] == ['Paris', 'bad']
+    opera = games[0]
+    assert opera.headers['White'] == "Morphy, Paul" and opera.result == '1-0'
+    # The comment, the variation, the glyph and the move numbers are skipped.
+    assert len(opera.moves) == 33 and opera.moves[:3] == ['e4', 'e5', 'Nf3'] and opera.moves[-1] == 'Rd8#'
+    assert games[1].moves == ['e4', 'e5', 'Ke3', 'Nc6'] and games[1].result == '*'
+
+
+@pytest.mark.parametrize('bitboard', [False, True], ids=['object', 'bitboard'])
+def test_replay(bitboard):
+    game = next(read_games(OPERA.splitlines()))
+    fens = [board.to_fen() for board in replay(game, bitboard=bitboard)]
+    assert len(fens) == 33 and fens[-1] == OPERA_FEN
+
+
+@pytest.mark.parametrize('fen, san, move', [
+    ("4k3/P7/8/8/8/8/8/4K3 w - - 0 1", 'a8=N', ((0, 6), (0, 7), Knight)),
+    ("rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3", 'exd6', ((4, 4), (3, 5))),
+    ("r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1", 'O-O-O', ((4, 7), (2, 7))),
+    ("4k3/8/8/8/8/8/8/R3K2R w - - 0 1", 'Rad1', ((0, 0), (3, 0))),
+    ("4k3/8/8/8/8/8/8/R3K2R w - - 0 1", 'Rhf1', ((7, 0), (5, 0))),
+])
+def test_parse_san(fen, san, move):
+    assert parse_san(Board.from_fen(fen), san) == move
+
+
+@pytest.mark.parametrize('san', ['Rd1', 'O-O', 'Ke4', 'Zz9', 'e5'])
+def test_parse_san_rejects(san):
+    # Ambiguous, without castling rights, out of reach, not SAN and without a pawn.
+    with pytest.raises(ValueError):
+        parse_san(Board.from_fen("4k3/8/8/8/8/8/4K3/R6R w - - 0 1"), san)
+
+
+def test_iter_positions_stops_at_a_bad_move():
+    plies = [(index, ply) for index, ply, _ in iter_positions((BAD + "\n" + OPERA).splitlines())]
+    assert plies == [(0, 1), (0, 2)] + [(1, ply) for ply in range(1, 34)]
+
+
+def test_iter_positions_does_not_hide_errors_of_the_features():
+    def features(board):
+        raise ValueError("a bug of the caller")
+
+    with pytest.raises(ValueError, match="a bug of the caller"):
+        list(iter_positions(OPERA.splitlines(), features))
+
+
+def test_parallel_replay():
+    results = list(parallel_replay((OPERA + "\n" + BAD).splitlines(), workers=1, chunk_size=1))
+    (opera, fens, error), (bad, bad_fens, bad_error) = results
+    assert opera.headers['Event'] == 'Paris' and error is None and fens[-1] == OPERA_FEN
+    assert bad.headers['Event'] == 'bad' and len(bad_fens) == 2 and 'Ke3' in bad_error
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Tests of the rendering of boards, see render.py."""
+
+import random
+
+import numpy as np
+import pytest
+
+from board import Board
+from fen import START_FEN
+from render import BoardRenderer
+
+
+def game(plies: int = 40, seed: int = 1) -> list:
+    """The snapshots of a random game from the start position, with captures and pieces moving back."""
+    rng = random.Random(seed)
+    board = Board.from_fen(START_FEN)
+    positions = [board.snapshot()]
+    for _ in range(plies):
+        moves = list(board.iter_moves())
+        if not moves:
+            break
+        board.push(rng.choice(moves))
+        positions.append(board.snapshot())
+    return positions
+
+
+def full_redraw(position, highlighted=None) -> np.ndarray:
+    with BoardRenderer(size=3) as renderer:
+        return renderer.render(position, highlighted).copy()
+
+
+def test_incremental_frames_equal_a_full_redraw():
+    positions = game()
+    with BoardRenderer(size=3) as renderer:
+        for i, position in enumerate(positions):
+            frame = renderer.render(position)
+            if i % 10 == 0 or i == len(positions) - 1:
+                assert np.array_equal(frame, full_redraw(position)), i
+
+
+def test_highlighted_squares():
+    first, second = game(2)[1:]
+    with BoardRenderer(size=3) as renderer:
+        renderer.render(first)
+        frame = renderer.render(second, highlighted=[(4, 1), (4, 3)])
+        assert np.array_equal(frame, full_redraw(second, [(4, 1), (4, 3)]))
+        assert not np.array_equal(frame, full_redraw(second))
+        frame = renderer.render(first)
+        assert np.array_equal(frame, full_redraw(first))
+
+
+def test_update_counts_the_changed_squares():
+    start, after = game(1)
+    with BoardRenderer(size=3) as renderer:
+        assert renderer.update(start) == 32
+        assert renderer.update(start) == 0
+        assert renderer.update(after) == 2
+        assert renderer.update(after, highlighted=[(0, 0)]) == 1
+
+
+def test_export_frames(tmp_path):
+    pytest.importorskip('PIL')
+    positions = game(3)
+    with BoardRenderer(size=2) as renderer:
+        assert renderer.export_frames(positions, tmp_path / 'frames') == len(positions)
+    assert sorted(p.name for p in (tmp_path / 'frames').iterdir()) == [f"frame_{i:04d}.png" for i in range(4)]
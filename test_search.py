@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Tests of the search, see search.py."""
+
+import threading
+
+import pytest
+
+from board import Board
+from search import CHECK_EVERY, MATE, MAX_PLY, Search, search
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+# Positions with a mate in so many moves of the team to move.
+MATES = [
+    ("6k1/5ppp/8/8/8/8/5PPP/4R1K1 w - - 0 1", 1),
+    ("4r1k1/5ppp/8/8/8/8/5PPP/6K1 b - - 0 1", 1),
+    ("2r3k1/5ppp/8/8/8/8/4RPPP/4R1K1 w - - 0 1", 2),
+]
+
+
+@pytest.fixture(params=[False, True], ids=['object', 'bitboard'])
+def bitboard(request) -> bool:
+    return request.param
+
+
+def play(board: Board, moves: list):
+    """Pushes the moves, every one has to be legal."""
+    for move in moves:
+        assert move in list(board.iter_moves())
+        board.push(move)
+
+
+@pytest.mark.parametrize('fen, moves', MATES)
+def test_finds_the_mate(fen, moves, bitboard):
+    board = Board.from_fen(fen, bitboard=bitboard)
+    result = search(board, depth=2*moves)
+    assert result.score == MATE - (2*moves - 1)
+    assert result.info().split(' score ')[1].startswith(f"mate {moves} ")
+    # The quiescence search does not look for mates, the iteration one ply deeper than the mating move finds
+    # it. The search stops there and the PV is the mate.
+    assert result.depth == 2*moves and len(result.pv) == 2*moves - 1 and result.move == result.pv[0]
+    assert board.to_fen() == Board.from_fen(fen).to_fen()
+    play(board, result.pv)
+    assert not list(board.iter_moves()) and board.is_check(board.turn)
+
+
+@pytest.mark.parametrize('fen, score', [
+    ("6k1/5ppp/8/8/8/8/5PPP/4R1K1 w - - 0 1", None),  # the side to move has moves
+    ("4R1k1/5ppp/8/8/8/8/5PPP/6K1 b - - 0 1", -MATE),
+    ("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", 0),
+])
+def test_positions_without_moves(fen, score, bitboard):
+    result = Search(Board.from_fen(fen, bitboard=bitboard)).run(depth=3)
+    if score is None:
+        assert result.move is not None
+    else:
+        assert (result.move, result.score, result.pv, result.depth) == (None, score, [], 1)
+
+
+def test_pv_is_legal_and_the_board_restored(bitboard):
+    board = Board.from_fen(KIWIPETE, bitboard=bitboard)
+    results = []
+    result = Search(board).run(depth=3, info=results.append)
+    assert [r.depth for r in results] == [1, 2, 3] and results[-1] == result
+    assert board.to_fen() == KIWIPETE
+    for r in results:
+        assert r.move == r.pv[0] and 1 <= len(r.pv) <= r.depth + 8
+        clone = board.clone()
+        play(clone, r.pv)
+    assert result.info().startswith("info depth 3 score cp ")
+
+
+def test_stop_ends_after_the_finished_iteration(bitboard):
+    board = Board.from_fen(KIWIPETE, bitboard=bitboard)
+    searcher = Search(board)
+
+    def stop_after_two(result):
+        if result.depth == 2:
+            searcher.stop()
+
+    result = searcher.run(info=stop_after_two)
+    assert result.depth == 2 and result.move is not None
+    # stop does not stick, the next search runs to its depth.
+    assert searcher.run(depth=3).depth == 3
+    assert board.to_fen() == KIWIPETE
+
+
+def test_stop_from_another_thread(bitboard):
+    board = Board.from_fen(KIWIPETE, bitboard=bitboard)
+    searcher = Search(board)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(searcher.run()))
+    thread.start()
+    assert searcher.started.wait(5)
+    searcher.stop()
+    thread.join(10)
+    assert not thread.is_alive()
+    result, = results
+    assert result.move is not None and 1 <= result.depth < MAX_PLY
+    assert board.to_fen() == KIWIPETE
+
+
+def test_node_limit(bitboard):
+    result = Search(Board.from_fen(KIWIPETE, bitboard=bitboard)).run(nodes=3000)
+    assert result.move is not None and result.depth >= 1
+    # The limit is looked at together with the clock, every CHECK_EVERY nodes.
+    assert result.nodes < 3000 + CHECK_EVERY
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Tests of the game server, see server.py."""
+
+import asyncio
+
+import pytest
+
+from perft import REFERENCE
+from server import GameServer
+
+
+@pytest.fixture
+def server():
+    server = GameServer(workers=1, threads=True)
+    yield server
+    server.close()
+
+
+def request(server: GameServer, **args) -> dict:
+    return asyncio.run(server.handle(args))
+
+
+def test_moves_are_validated(server):
+    game = request(server, op='new')['game']
+    assert request(server, op='move', game=game, move='e2e5')['ok'] is False
+    answer = request(server, op='move', game=game, move='e2e4')
+    assert answer['ok'] and answer['fen'].startswith('rnbqkbnr/pppppppp/8/8/4P3/')
+    assert request(server, op='move', game=game, move='e7e5q')['ok'] is False
+    assert request(server, op='undo', game=game)['ok']
+    assert request(server, op='undo', game=game)['ok'] is False
+
+
+@pytest.mark.parametrize('fen', [
+    '4k3/8/8/8/8/8/4R3/4K3 w - - 0 1',  # the king of black, which is not to move, can be captured
+    '4k3/8/8/8/8/8/8/4K2P w - - 0 1',  # a pawn on the first row
+    '3Pk3/8/8/8/8/8/8/4K3 b - - 0 1',  # a pawn on the last row
+    '8/8/8/8/8/8/8/4K3 w - - 0 1',  # no black king
+    '4k3/8/8/8/3P4/8/8/4K3 w - e5 0 1',  # no pawn can have skipped the en passant square
+])
+def test_invalid_positions_are_rejected(server, fen):
+    answer = request(server, op='new', fen=fen, id=3)
+    assert answer['ok'] is False and answer['id'] == 3
+    assert not server.games
+
+
+def test_a_failing_request_is_answered(server, monkeypatch):
+    def fail(request):
+        raise IndexError("broken")
+
+    monkeypatch.setattr(server, 'op_moves', fail)
+    game = request(server, op='new')['game']
+    answer = request(server, op='moves', game=game, id=7)
+    assert answer == {'ok': False, 'error': "Internal error: IndexError('broken')", 'id': 7}
+    assert request(server, op='status', game=game)['ok']
+
+
+def test_heavy_requests(server):
+    game = request(server, op='new')['game']
+    assert request(server, op='perft', game=game, depth=2) == {'nodes': 400, 'ok': True}
+    answer = request(server, op='analyze', game=game, depth=2)
+    assert answer['ok'] and answer['depth'] == 2 and answer['move']
+
+
+def test_concurrent_perft_in_threads():
+    # Every thread of the pool counts with its own move buffers.
+    server = GameServer(workers=4, threads=True)
+    try:
+        games = [(request(server, op='new', fen=fen)['game'], counts[3]) for _, fen, counts in REFERENCE[:2]] * 2
+
+        async def count():
+            return await asyncio.gather(*(server.handle({'op': 'perft', 'game': game, 'depth': 3})
+                                          for game, _ in games))
+
+        answers = asyncio.run(count())
+        assert answers == [{'nodes': nodes, 'ok': True} for _, nodes in games]
+    finally:
+        server.close()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Tests of the packed positions and the position store, see store.py."""
+
+import pytest
+
+from board import Board
+from fen import load_fens
+from perft import REFERENCE
+from pieces import Pawn
+import store
+
+FENS = [fen for _, fen, _ in REFERENCE]
+
+
+def test_pack_equals_pack_positions():
+    records = store.pack_positions(load_fens(FENS))
+    assert [store.pack(Board.from_fen(fen)) for fen in FENS] == [record.tobytes() for record in records]
+    assert [store.unpack(record).to_fen() for record in records] == [Board.from_fen(fen).to_fen() for fen in FENS]
+    assert store.unpack_positions(records).tobytes() == load_fens(FENS).tobytes()
+
+
+def test_too_many_pieces():
+    board = Board.from_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+    board['d', 4] = Pawn('w', (3, 3))
+    with pytest.raises(ValueError):
+        store.pack(board)
+
+
+def test_store(tmp_path):
+    path = tmp_path / 'positions.bin'
+    boards = [Board.from_fen(fen, bitboard=True) for fen in FENS]
+    with store.PositionStore(path) as positions:
+        positions.append(boards[0])
+        positions.extend(boards[1:5])
+        assert len(positions) == 5 and positions.board(4).to_fen() == boards[4].to_fen()
+        positions.extend_positions(load_fens(FENS[5:]))
+    with store.PositionStore(path, readonly=True) as positions:
+        assert len(positions) == len(FENS)
+        assert [board.to_fen() for board in positions.iter_boards()] == [board.to_fen() for board in boards]
+        assert positions.positions(slice(2, 4)).tobytes() == load_fens(FENS[2:4]).tobytes()
+    with open(path, 'ab') as f:
+        f.write(b'\0')
+    with pytest.raises(ValueError):
+        store.PositionStore(path)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Tests of the generation and the probes of the endgame tablebases, see tablebase.py."""
+
+import pytest
+
+from board import Board
+import tablebase
+
+# KPK needs KQK and KRK, the three take a few seconds together. KBNK takes too long for a test.
+MATERIALS = ['KQK', 'KRK', 'KPK']
+# A position, its result and the same position with the colors swapped and the board mirrored.
+MIRRORED = [
+    ("7k/8/6K1/8/8/8/8/1Q6 w - - 0 1", (1, 1), "1q6/8/8/8/8/6k1/8/7K b - - 0 1"),
+    ("7k/6Q1/6K1/8/8/8/8/8 b - - 0 1", (-1, 0), "8/8/8/8/8/6k1/6q1/7K w - - 0 1"),
+    ("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", (0, 0), "8/8/8/8/8/6k1/5q2/7K w - - 0 1"),
+    ("7k/6Q1/8/8/8/8/8/K7 b - - 0 1", (0, 0), "k7/8/8/8/8/8/6q1/7K w - - 0 1"),
+    ("8/8/8/3k4/8/8/2R5/3K4 w - - 0 1", (1, 27), "3k4/2r5/8/8/3K4/8/8/8 b - - 0 1"),
+    ("4k3/8/4K3/4P3/8/8/8/8 w - - 0 1", (1, 21), "8/8/8/8/4p3/4k3/8/4K3 b - - 0 1"),
+    ("4k3/4P3/4K3/8/8/8/8/8 b - - 0 1", (0, 0), "8/8/8/8/8/4k3/4p3/4K3 w - - 0 1"),
+]
+
+
+@pytest.fixture(scope='module')
+def tables(tmp_path_factory) -> tablebase.Tablebase:
+    directory = str(tmp_path_factory.mktemp('tablebases'))
+    tablebase.generate('KPK', directory, verbose=False)
+    return tablebase.Tablebase(directory)
+
+
+def test_promotion_tables_are_generated_first(tables):
+    for name in MATERIALS:
+        assert tablebase.load_table(name, tables.directory).shape == (2, 64**3)
+
+
+@pytest.mark.parametrize('fen, result, mirrored', MIRRORED)
+def test_probe(fen, result, mirrored, tables):
+    assert tables.probe(Board.from_fen(fen)) == result
+
+
+@pytest.mark.parametrize('fen, result, mirrored', MIRRORED)
+def test_probe_mirrors_black_as_the_stronger_side(fen, result, mirrored, tables):
+    assert tables.probe(Board.from_fen(mirrored)) == result
+
+
+@pytest.mark.parametrize('fen', [fen for fen, (_, dtm), mirrored in MIRRORED if dtm for fen in (fen, mirrored)])
+def test_distance_to_mate_follows_the_best_move(fen, tables):
+    board = Board.from_fen(fen)
+    wdl, dtm = tables.probe(board)
+    replies = []
+    for move in list(board.iter_moves()):
+        board.push(move)
+        replies.append(tables.probe(board) or (0, 0))
+        board.pop()
+    if wdl == 1:
+        # The winner mates as fast as possible, one of its moves leads into the loss one ply closer to mate.
+        assert min(d for w, d in replies if w == -1) == dtm - 1
+    elif wdl == -1:
+        # The loser delays the mate as long as possible, every move leads into a win.
+        assert all(w == 1 for w, _ in replies) and max(d for _, d in replies) == dtm - 1
+
+
+@pytest.mark.parametrize('fen', [
+    "4k3/8/8/8/8/8/8/R3K3 w Q - 0 1",  # castling rights
+    "4k3/8/8/8/8/8/8/3QK2q w - - 0 1",  # a piece on both sides
+    "4k3/8/8/8/8/8/8/2RRK3 w - - 0 1",  # no table of the material
+    "4k3/8/8/8/8/8/8/1QRRK3 w - - 0 1",  # too many pieces
+])
+def test_probe_without_table(fen, tables):
+    assert tables.probe(Board.from_fen(fen)) is None
+
+
+def test_missing_tables(tmp_path):
+    tables = tablebase.Tablebase(str(tmp_path))
+    assert tables.probe(Board.from_fen(MIRRORED[0][0])) is None
+    assert (tables.hits, tables.misses) == (0, 1)
+    with pytest.raises(FileNotFoundError):
+        tablebase.load_table('KQK', str(tmp_path))
+    with pytest.raises(ValueError):
+        tablebase.generate('KQQK', str(tmp_path))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Tests of the cache of the precomputed tables, see tables.py."""
+
+import numpy as np
+import pytest
+
+import tables
+
+
+def build():
+    return {'squares': np.arange(64, dtype=np.uint64), 'codes': np.arange(13, dtype=np.uint8)}
+
+
+def fail():
+    raise AssertionError("The tables were built again.")
+
+
+def assert_tables(arrays):
+    assert arrays['squares'].tolist() == list(range(64)) and arrays['squares'].dtype == np.uint64
+    assert arrays['codes'].tolist() == list(range(13)) and arrays['codes'].dtype == np.uint8
+
+
+def test_the_tables_are_built_once(tmp_path):
+    assert_tables(tables.cached_arrays('test', 1, build, str(tmp_path)))
+    arrays = tables.cached_arrays('test', 1, fail, str(tmp_path))
+    assert_tables(arrays)
+    assert isinstance(arrays['squares'].base, np.memmap)
+
+
+def test_another_version_is_built_again(tmp_path):
+    tables.cached_arrays('test', 1, build, str(tmp_path))
+    built = []
+    assert_tables(tables.cached_arrays('test', 2, lambda: built.append(1) or build(), str(tmp_path)))
+    assert built == [1]
+    assert_tables(tables.cached_arrays('test', 2, fail, str(tmp_path)))
+    with pytest.raises(ValueError):
+        tables.load_arrays(tables.cache_path('test', str(tmp_path)), 1)
+
+
+@pytest.mark.parametrize('damage', [b'NOTTABLE', b''], ids=['magic', 'truncated'])
+def test_a_damaged_file_is_built_again(tmp_path, damage):
+    tables.cached_arrays('test', 1, build, str(tmp_path))
+    path = tables.cache_path('test', str(tmp_path))
+    with open(path, 'r+b') as f:
+        if damage:
+            f.write(damage)
+        else:
+            f.truncate(10)
+    assert_tables(tables.cached_arrays('test', 1, build, str(tmp_path)))
+    assert_tables(tables.cached_arrays('test', 1, fail, str(tmp_path)))
+
+
+def test_the_tables_are_kept_in_memory_without_cache(tmp_path):
+    # A file where the directory should be, nothing can be written into it.
+    blocked = tmp_path / 'file'
+    blocked.write_bytes(b'')
+    assert_tables(tables.cached_arrays('test', 1, build, str(blocked)))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Tests of the transposition table, see transposition.py."""
+
+import pytest
+
+from transposition import BUCKET, ENTRY_SIZE, EXACT, LOWER, UPPER, Entry, TranspositionTable
+
+
+def small_table(buckets: int = 4) -> TranspositionTable:
+    return TranspositionTable(mb=buckets * BUCKET * ENTRY_SIZE / 2**20)
+
+
+def same_bucket(table: TranspositionTable, count: int, bucket: int = 1) -> list:
+    """count keys which fall into the same bucket."""
+    return [bucket + i * (len(table) // BUCKET) for i in range(1, count + 1)]
+
+
+@pytest.mark.parametrize('mb, entries', [(1, 1 << 16), (1.5, 1 << 16), (16, 1 << 20), (0, BUCKET)])
+def test_size_is_a_power_of_two_within_the_budget(mb, entries):
+    table = TranspositionTable(mb=mb)
+    assert len(table) == entries
+    assert table.nbytes == entries * ENTRY_SIZE
+
+
+def test_store_and_probe():
+    table = small_table()
+    assert table.probe(0) is None  # The zero keys of the empty entries are no positions.
+    table.store(12345, 3, LOWER, -250, 77)
+    assert table.probe(12345) == Entry(3, LOWER, -250, 77)
+    # Without a move the one stored before is kept.
+    table.store(12345, 4, EXACT, 10)
+    assert table.probe(12345) == Entry(4, EXACT, 10, 77)
+    table.store(12345, 200, UPPER, 10, 5)
+    assert table.probe(12345) == Entry(127, UPPER, 10, 5)
+    assert table.probe(12345 + len(table)) is None
+
+
+def test_depth_preferred_and_always_replace():
+    table = small_table()
+    deep, shallow, other, deeper = same_bucket(table, 4)
+    table.store(deep, 5, EXACT, 1)
+    table.store(shallow, 3, EXACT, 2)
+    # The shallower search takes the always-replace entry, the next one replaces it.
+    table.store(other, 2, EXACT, 3)
+    assert table.probe(shallow) is None
+    assert table.probe(deep).score == 1 and table.probe(other).score == 3
+    # A deeper search takes the depth-preferred entry, the position it held moves to the other one.
+    table.store(deeper, 6, EXACT, 4)
+    assert table.probe(other) is None
+    assert table.probe(deeper).score == 4 and table.probe(deep).score == 1
+    assert (table.stores, table.replacements) == (4, 2)
+
+
+def test_entries_of_older_searches_are_replaced_first():
+    table = small_table()
+    old, new = same_bucket(table, 2)
+    table.store(old, 9, EXACT, 1)
+    table.new_search()
+    table.store(new, 1, EXACT, 2)
+    i = (new & (len(table) // BUCKET - 1)) * BUCKET
+    assert int(table.keys[i]) == new and int(table.keys[i + 1]) == old
+    # Within the same search the deeper entry stays.
+    table.store(same_bucket(table, 3)[2], 0, EXACT, 3)
+    assert int(table.keys[i]) == new
+
+
+def test_stats_and_clear():
+    table = small_table()
+    first, second, third = same_bucket(table, 3)
+    table.store(first, 1, EXACT, 0)
+    table.probe(first)
+    table.probe(second)  # A miss on a used bucket is a collision.
+    table.probe(third + 1)  # A miss on an empty bucket is not.
+    stats = table.stats()
+    assert {k: stats[k] for k in ('entries', 'probes', 'hits', 'collisions', 'stores', 'replacements')} == {
+        'entries': len(table), 'probes': 3, 'hits': 1, 'collisions': 1, 'stores': 1, 'replacements': 0}
+    assert stats['hit rate'] == pytest.approx(1 / 3)
+    assert stats['hashfull'] == table.hashfull() == 1000 // len(table)
+    table.clear()
+    assert table.probe(first) is None
+    assert (table.hits, table.stores, table.generation, table.hashfull()) == (0, 0, 0, 0)
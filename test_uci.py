@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Tests of the UCI engine, see uci.py."""
+
+import threading
+import time
+
+from bits import WHITE, BLACK
+from uci import UciEngine, allotted_time
+
+
+def test_allotted_time_uses_the_clock_of_the_team():
+    limits = {'wtime': 1000, 'btime': 60000, 'winc': 0, 'binc': 1000}
+    assert allotted_time(limits, WHITE) < 0.05
+    assert allotted_time(limits, BLACK) > 2
+    assert allotted_time({'movetime': 500}, BLACK) == 0.45
+    assert allotted_time(dict(), WHITE) is None
+
+
+def test_ponderhit_uses_the_clock_of_the_engine():
+    """The board of the search changes between the teams while it searches, the time of ponderhit has to come
+    from the team of the position of go, also with very different clocks."""
+    lines = []
+    engine = UciEngine(write=lines.append, bitboard=True)
+    limits = {'wtime': 1000, 'btime': 120000, 'winc': 0, 'binc': 2000}
+    times = []
+    engine.search.set_movetime = times.append
+    searching = threading.Event()
+    # The search is in the tree after its first iteration, where its board has either team to move.
+    engine._info = lambda result: searching.set()
+    for moves, turn in (('e2e4', BLACK), ('e2e4 e7e5', WHITE)) * 3:
+        times.clear()
+        searching.clear()
+        engine.handle(f"position startpos moves {moves}")
+        engine.handle(f"go ponder wtime {limits['wtime']} btime {limits['btime']} winc 0 binc {limits['binc']}")
+        assert searching.wait(5)
+        engine.handle("ponderhit")
+        engine.handle("stop")
+        assert times == [allotted_time(limits, turn)]
+        assert lines[-1].startswith("bestmove ")
+
+
+def test_ponderhit_before_the_search_starts():
+    lines = []
+    engine = UciEngine(write=lines.append, bitboard=True)
+    run = engine.search.run
+
+    def late_run(*args, **kwargs):
+        time.sleep(0.05)
+        return run(*args, **kwargs)
+
+    engine.search.run = late_run
+    engine.handle("position startpos")
+    engine.handle("go ponder wtime 2000 btime 2000")
+    engine.handle("ponderhit")
+    engine._thread.join(3)
+    assert not engine._thread.is_alive()
+    assert lines[-1].startswith("bestmove ")
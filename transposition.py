@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Transposition table of a fixed size.
+
+The table caches what is known about a position (the depth it has been searched to, the score with its
+bound and the best move) under the Zobrist hash of the position (see Board.key). The entries are kept in
+NumPy columns of a fixed length, 16 bytes per entry, which is chosen from a memory budget in MB and never
+grows.
+
+The entries are grouped in buckets of two. The bucket of a position is given by the lower bits of its hash,
+the first entry of a bucket is replaced only by a search of at least the same depth (or by a newer search),
+the second entry is always replaced. So the deep and expensive results stay while the many shallow ones
+still find a place.
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# The bound of a score: exact, at least (the search failed high) or at most (failed low). 0 marks an empty entry.
+EXACT, LOWER, UPPER = 1, 2, 3
+ENTRY_SIZE = 16  # bytes: key 8, score 4, move 2, depth 1, flags 1
+BUCKET = 2
+_GENERATIONS = 64  # The generation is kept in the upper six bits of the flags.
+
+
+class Entry(NamedTuple):
+    depth: int
+    bound: int
+    score: int
+    move: int  # The move encoded with movecodes.pack_move, 0 if there is none.
+
+
+class TranspositionTable:
+    """A transposition table with a fixed number of entries.
+
+    Usage:
+        table = TranspositionTable(mb=64)
+        entry = table.probe(board.key())
+        table.store(board.key(), depth, LOWER, score, movecodes.pack_move(move))
+    """
+
+    def __init__(self, mb: float = 16):
+        """Allocates the table, the number of buckets is the largest power of two within the budget of mb MB."""
+        buckets = max(1, int(mb * 2**20) // (ENTRY_SIZE * BUCKET))
+        buckets = 1 << (buckets.bit_length() - 1)
+        size = buckets * BUCKET
+        self._mask = buckets - 1
+        self.keys = np.zeros(size, dtype=np.uint64)
+        self.scores = np.zeros(size, dtype=np.int32)
+        self.moves = np.zeros(size, dtype=np.uint16)
+        self.depths = np.zeros(size, dtype=np.int8)
+        self.flags = np.zeros(size, dtype=np.uint8)  # bound | generation << 2
+        self.generation = 0
+        self.probes = self.hits = self.collisions = 0
+        self.stores = self.replacements = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def nbytes(self) -> int:
+        """The memory taken by the entries in bytes."""
+        return self.keys.nbytes + self.scores.nbytes + self.moves.nbytes + self.depths.nbytes + self.flags.nbytes
+
+    def clear(self):
+        """Empties the table and resets the statistics."""
+        for column in (self.keys, self.scores, self.moves, self.depths, self.flags):
+            column.fill(0)
+        self.generation = 0
+        self.probes = self.hits = self.collisions = 0
+        self.stores = self.replacements = 0
+
+    def new_search(self):
+        """Starts a new generation, the entries of older searches are replaced first."""
+        self.generation = (self.generation + 1) % _GENERATIONS
+
+    def probe(self, key: int) -> Optional[Entry]:
+        """Returns the entry of the position with the hash key, None if there is none.
+
+        A miss on a bucket which holds other positions is counted as a collision.
+        """
+        self.probes += 1
+        i = (key & self._mask) * BUCKET
+        keys = self.keys
+        for j in range(i, i + BUCKET):
+            if keys[j] == key and self.flags[j]:
+                self.hits += 1
+                return Entry(int(self.depths[j]), int(self.flags[j]) & 3, int(self.scores[j]), int(self.moves[j]))
+        if self.flags[i] or self.flags[i + 1]:
+            self.collisions += 1
+        return None
+
+    def store(self, key: int, depth: int, bound: int, score: int, move: int = 0):
+        """Stores what the search found out about the position with the hash key.
+
+        Args:
+            key (int): The hash of the position.
+            depth (int): The depth of the search.
+            bound (int): EXACT, LOWER or UPPER.
+            score (int): The score, which has to fit into 32 bits.
+            move (int, optional): The best move encoded with movecodes.pack_move. Defaults to 0 (none),
+                which keeps the move stored for the position before.
+        """
+        self.stores += 1
+        i = (key & self._mask) * BUCKET
+        flags, keys = self.flags, self.keys
+        if keys[i] == key and flags[i]:
+            j = i
+        elif keys[i + 1] == key and flags[i + 1]:
+            j = i + 1
+        else:
+            j = i + 1
+            if not flags[i] or depth >= self.depths[i] or flags[i] >> 2 != self.generation:
+                # The depth-preferred entry goes to the deeper (or newer) search, the position it held moves
+                # to the always-replace entry.
+                if flags[i]:
+                    if flags[i + 1]:
+                        self.replacements += 1
+                    for column in (keys, self.scores, self.moves, self.depths, flags):
+                        column[i + 1] = column[i]
+                j = i
+            elif flags[i + 1]:
+                self.replacements += 1
+            self.moves[j] = 0
+        if move:
+            self.moves[j] = move
+        keys[j] = key
+        self.scores[j] = score
+        self.depths[j] = min(depth, 127)
+        flags[j] = bound | self.generation << 2
+
+    def hashfull(self) -> int:
+        """The permille of the used entries, as reported by the Universal Chess Interface."""
+        return int(np.count_nonzero(self.flags) * 1000 // len(self.flags))
+
+    def stats(self) -> dict:
+        """The statistics of the probes and stores since the table was created or cleared."""
+        return {'entries': len(self), 'mb': self.nbytes / 2**20, 'probes': self.probes, 'hits': self.hits,
+                'hit rate': self.hits / max(self.probes, 1), 'collisions': self.collisions,
+                'stores': self.stores, 'replacements': self.replacements, 'hashfull': self.hashfull()}
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+The engine behind the Universal Chess Interface (UCI), so it can be run by chess GUIs and tournament tools.
+
+The commands are read from stdin on the main thread and the search runs on a worker thread, which is how the
+engine stays responsive while it searches: isready is answered at once and stop ends the search within a
+few milliseconds (the search looks at its flag in every node), after which the best move
+of the deepest finished iteration is sent. With "go ponder" the engine searches the position after the
+expected move of the opponent during the opponent's time, without a limit, until the GUI sends ponderhit
+(the expected move was played, the search goes on with the time of the own move) or stop. The transposition
+table is kept from one search to the next, so pondering fills it for the following search as well.
+
+Supported: uci, isready, ucinewgame, setoption (Hash, Ponder), position [startpos | fen <fen>] [moves ...],
+go [depth | movetime | nodes | wtime btime winc binc movestogo | infinite | ponder], stop, ponderhit, quit.
+Every finished iteration is reported as an info line with depth, score, nodes, nps, time and pv.
+
+Usage:
+    python uci.py --bitboard
+"""
+
+import argparse
+import sys
+import threading
+from typing import Callable, Dict, List, Optional
+
+from board import Board
+from bits import WHITE, TEAM_INDEX
+from fen import START_FEN
+from perft import move_name, parse_move
+from search import Search, SearchResult, MAX_PLY
+from transposition import TranspositionTable
+
+NAME = "chess-fun"
+AUTHOR = "anton"
+# The time kept back from every move for the communication with the GUI, in seconds.
+MOVE_OVERHEAD = 0.05
+# The number of moves the remaining time is divided by if the GUI does not send movestogo.
+DEFAULT_MOVES_TO_GO = 30
+_GO_INTEGERS = ('depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc', 'movestogo')
+
+
+def allotted_time(limits: Dict[str, int], turn: int) -> Optional[float]:
+    """Returns the time for the move in seconds from the limits of go (in milliseconds), None if there is no
+    limit of time."""
+    if 'movetime' in limits:
+        return max(limits['movetime'] / 1000 - MOVE_OVERHEAD, 0.001)
+    remaining = limits.get('btime' if turn else 'wtime')
+    if remaining is None:
+        return None
+    increment = limits.get('binc' if turn else 'winc', 0)
+    share = remaining / max(limits.get('movestogo', DEFAULT_MOVES_TO_GO), 1) + 0.8*increment
+    # Never use more than half of the remaining time, the GUI's clock runs on while the answer is sent.
+    return max(min(share, remaining / 2) / 1000 - MOVE_OVERHEAD, 0.001)
+
+
+class UciEngine:
+    """The state of the engine between the commands: the position, the search and its thread.
+
+    Args:
+        write (Callable[[str], None], optional): Sends a line to the GUI. Defaults to printing to stdout.
+        bitboard (bool, optional): Whether the bitboard engine is used. Defaults to False.
+        hash_mb (float, optional): The size of the transposition table in MB. Defaults to 16.
+    """
+
+    def __init__(self, write: Callable[[str], None] = None, bitboard: bool = False, hash_mb: float = 16):
+        self._write = write or (lambda line: print(line, flush=True))
+        self._lock = threading.Lock()
+        self.bitboard = bitboard
+        self.board = Board.from_fen(START_FEN, bitboard=bitboard)
+        self.search = Search(self.board, table=TranspositionTable(hash_mb))
+        self.ponder = True
+        self._thread: Optional[threading.Thread] = None
+        # Set when the result may be sent, a search of go infinite or go ponder has to wait for it.
+        self._release = threading.Event()
+        self._limits: Dict[str, int] = dict()
+        self._turn = WHITE  # The team to move in the position of the last go, which is the engine's team.
+
+    def send(self, line: str):
+        with self._lock:
+            self._write(line)
+
+    def handle(self, line: str) -> bool:
+        """Executes the command of the line.
+
+        Returns:
+            bool: False after quit, else True.
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'quit':
+            self.stop()
+            return False
+        method = getattr(self, f'cmd_{command}', None)
+        if method is None:
+            self.send(f"info string unknown command {command}")
+        else:
+            try:
+                method(args)
+            except ValueError as error:
+                self.send(f"info string {error}")
+        return True
+
+    def cmd_uci(self, args: List[str]):
+        self.send(f"id name {NAME}")
+        self.send(f"id author {AUTHOR}")
+        self.send(f"option name Hash type spin default {round(self.search.table.stats()['mb'])} min 1 max 4096")
+        self.send("option name Ponder type check default true")
+        self.send("uciok")
+
+    def cmd_isready(self, args: List[str]):
+        self.send("readyok")
+
+    def cmd_ucinewgame(self, args: List[str]):
+        self.stop()
+        self.search = Search(self.board, table=TranspositionTable(self.search.table.stats()['mb']))
+
+    def cmd_setoption(self, args: List[str]):
+        # setoption name <name> [value <value>], the name may have several words.
+        words = ' '.join(args)
+        name, _, value = words.partition(' value ')
+        name = name.removeprefix('name ').strip().lower()
+        if name == 'hash':
+            self.stop()
+            self.search = Search(self.board, table=TranspositionTable(float(value)))
+        elif name == 'ponder':
+            self.ponder = value.strip().lower() == 'true'
+        else:
+            raise ValueError(f"unknown option {name}")
+
+    def cmd_position(self, args: List[str]):
+        self.stop()
+        if 'moves' in args:
+            i = args.index('moves')
+            args, moves = args[:i], args[i + 1:]
+        else:
+            moves = []
+        if args[:1] == ['startpos']:
+            fen = START_FEN
+        elif args[:1] == ['fen']:
+            fen = ' '.join(args[1:])
+        else:
+            raise ValueError("position needs startpos or fen")
+        board = Board.from_fen(fen, bitboard=self.bitboard)
+        for name in moves:
+            move = parse_move(name)
+            if move[1] not in board.legal_moves(board.turn).get(move[0], ()):
+                raise ValueError(f"illegal move {name} in {board.to_fen()}")
+            board.push(move)
+        self.board = board
+
+    def cmd_go(self, args: List[str]):
+        self.stop()
+        limits, pondering, infinite = dict(), False, False
+        i = 0
+        while i < len(args):
+            if args[i] in _GO_INTEGERS and i + 1 < len(args):
+                limits[args[i]] = int(args[i + 1])
+                i += 2
+                continue
+            pondering |= args[i] == 'ponder'
+            infinite |= args[i] == 'infinite'
+            i += 1
+        self._limits = limits
+        self._turn = turn = TEAM_INDEX[str(self.board.turn)]
+        movetime = None if pondering or infinite else allotted_time(limits, turn)
+        depth = min(limits.get('depth', MAX_PLY), MAX_PLY)
+        self._release.clear()
+        if not pondering and not infinite:
+            self._release.set()
+        # The search changes its board, the position is kept for the next go.
+        self.search.board = self.board.clone()
+        self.search.started.clear()
+        self._thread = threading.Thread(target=self._run, args=(depth, movetime, limits.get('nodes')),
+                                        name='search', daemon=True)
+        self._thread.start()
+        # A ponderhit or stop right after go must not be undone by the search starting later.
+        self.search.started.wait()
+
+    def cmd_ponderhit(self, args: List[str]):
+        # The expected move was played, the search goes on as the search of the own move. The board of the
+        # search changes all the time, the team is the one of the position of go.
+        movetime = allotted_time(self._limits, self._turn)
+        if movetime is not None:
+            self.search.set_movetime(movetime)
+        self._release.set()
+
+    def cmd_stop(self, args: List[str]):
+        self.stop()
+
+    def stop(self):
+        """Stops the search if there is one and waits for its best move to be sent."""
+        if self._thread is not None:
+            # Search.run clears the flag when it starts, so it is set again until the thread has ended.
+            while self._thread.is_alive():
+                self.search.stop()
+                self._release.set()
+                self._thread.join(0.01)
+            self._thread = None
+
+    def _info(self, result: SearchResult):
+        self.send(result.info())
+
+    def _run(self, depth: int, movetime: Optional[float], nodes: Optional[int]):
+        try:
+            result = self.search.run(depth, movetime, nodes, info=self._info)
+        except Exception as error:  # The GUI has to get a bestmove in any case.
+            self.send(f"info string search failed: {error!r}")
+            self.search.started.set()
+            result = None
+        # With go infinite or go ponder the best move may only be sent after stop or ponderhit.
+        self._release.wait()
+        if result is None or result.move is None:
+            self.send("bestmove 0000")
+        elif self.ponder and len(result.pv) > 1:
+            self.send(f"bestmove {move_name(result.move)} ponder {move_name(result.pv[1])}")
+        else:
+            self.send(f"bestmove {move_name(result.move)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the engine with the Universal Chess Interface.")
+    parser.add_argument('--bitboard', action='store_true', help="Use the bitboard engine.")
+    parser.add_argument('--hash', type=float, default=16, help="The size of the transposition table in MB.")
+    args = parser.parse_args(argv)
+
+    engine = UciEngine(bitboard=args.bitboard, hash_mb=args.hash)
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+
+
+if __name__ == '__main__':
+    main()
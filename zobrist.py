@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Zobrist hashing of positions.
+
+Every piece on every square, the side to move, every en passant square and every castling right get a
+random 64-bit key. The hash of a position is the XOR of the keys of everything present, so a move changes
+it by XOR-ing only the keys of the pieces and states it changed. The keys are drawn from a fixed seed,
+hence a hash is the same in every process.
+"""
+
+import random
+from typing import Dict, Optional, Tuple
+
+from bits import RAN64, square
+from pieces import piece_index
+
+_rng = random.Random(0x5C4E55)
+
+# PIECE_KEYS[idx][sq] is the key of the piece with index idx (see pieces.piece_index) on the square sq.
+PIECE_KEYS = [[_rng.getrandbits(64) for _ in RAN64] for _ in range(12)]
+# Key of an en passant square, only the squares on the third and sixth row are used.
+EP_KEYS = [_rng.getrandbits(64) for _ in RAN64]
+# XOR-ed into the hash if black is to move.
+SIDE_KEY = _rng.getrandbits(64)
+# CASTLING_KEYS[rights] is the XOR of the keys of the castling rights (see bits.CASTLINGS) in rights.
+_RIGHT_KEYS = [_rng.getrandbits(64) for _ in range(4)]
+CASTLING_KEYS = [0]*16
+for _rights in range(16):
+    for _i in range(4):
+        if _rights >> _i & 1:
+            CASTLING_KEYS[_rights] ^= _RIGHT_KEYS[_i]
+
+
+def hash_position(pieces: Dict[Tuple[int, int], object], turn, en_passant: Optional[Tuple[int, int]],
+                  castling: int = 0) -> int:
+    """Calculates the hash of a position from scratch.
+
+    Args:
+        pieces (Dict[Position, Piece]): A dictionary mapping positions to pieces.
+        turn (Union[str, pieces.Team]): The team which is to move.
+        en_passant (Optional[Position]): The en passant square, None if there is none.
+        castling (int, optional): The castling rights, see bits.CASTLINGS. Defaults to 0.
+
+    Returns:
+        int: The 64-bit hash of the position.
+    """
+    key = 0
+    for (c, r), piece in pieces.items():
+        key ^= PIECE_KEYS[piece_index(piece)][square(c, r)]
+    if str(turn) == 'b':
+        key ^= SIDE_KEY
+    if en_passant is not None:
+        key ^= EP_KEYS[square(*en_passant)]
+    return key ^ CASTLING_KEYS[castling]